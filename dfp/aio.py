@@ -0,0 +1,134 @@
+
+import asyncio
+import functools
+import logging
+
+import dfp.associate_line_items_and_creatives
+import dfp.create_creatives
+import dfp.create_custom_targeting
+import dfp.create_line_items
+import dfp.create_orders
+import dfp.get_ad_units
+import dfp.get_advertisers
+import dfp.get_custom_targeting
+import dfp.get_placements
+import dfp.get_users
+from dfp import executor, transport
+
+
+logger = logging.getLogger(__name__)
+
+# The number of line items to create per request.
+LINE_ITEM_BATCH_SIZE = 200
+
+
+async def run(func, *args, **kwargs):
+  """
+  Runs a blocking function on the DFP thread pool (`dfp.executor`).
+
+  Args:
+    func (function): the function to run
+    args: positional arguments for `func`
+    kwargs: keyword arguments for `func`
+  Returns:
+    what `func` returns
+  """
+  loop = asyncio.get_running_loop()
+  return await loop.run_in_executor(executor.get_executor(),
+    functools.partial(func, *args, **kwargs))
+
+async def gather(awaitables, limit=None):
+  """
+  Awaits many awaitables, at most `limit` at a time.
+
+  Args:
+    awaitables (arr): an array of coroutines or futures
+    limit (int): the most to await at once. Defaults to
+      `DFP_MAX_CONCURRENCY`.
+  Returns:
+    an array: the results, in the order of `awaitables`
+  """
+  semaphore = asyncio.Semaphore(limit or transport.get_max_concurrency())
+
+  async def limited(awaitable):
+    async with semaphore:
+      return await awaitable
+
+  return await asyncio.gather(*[limited(awaitable) for awaitable in
+    awaitables])
+
+def _batches(items, batch_size):
+  return [items[i:i+batch_size] for i in range(0, len(items), batch_size)]
+
+def _wrap(func):
+  """
+  Returns an async version of a blocking DFP function.
+  """
+  @functools.wraps(func)
+  async def wrapper(*args, **kwargs):
+    return await run(func, *args, **kwargs)
+  return wrapper
+
+
+create_creatives = _wrap(dfp.create_creatives.create_creatives)
+create_order = _wrap(dfp.create_orders.create_order)
+create_targeting_key = _wrap(dfp.create_custom_targeting.create_targeting_key)
+create_targeting_value = _wrap(
+  dfp.create_custom_targeting.create_targeting_value)
+create_targeting_values = _wrap(
+  dfp.create_custom_targeting.create_targeting_values)
+get_ad_unit_ids_by_name = _wrap(dfp.get_ad_units.get_ad_unit_ids_by_name)
+get_advertiser_id_by_name = _wrap(
+  dfp.get_advertisers.get_advertiser_id_by_name)
+get_key_id_by_name = _wrap(dfp.get_custom_targeting.get_key_id_by_name)
+get_placement_ids_by_name = _wrap(
+  dfp.get_placements.get_placement_ids_by_name)
+get_targeting_by_key_name = _wrap(
+  dfp.get_custom_targeting.get_targeting_by_key_name)
+get_targeting_by_key_names = _wrap(
+  dfp.get_custom_targeting.get_targeting_by_key_names)
+get_user_id_by_email = _wrap(dfp.get_users.get_user_id_by_email)
+
+
+async def create_line_items(line_items, batch_size=LINE_ITEM_BATCH_SIZE,
+  limit=None):
+  """
+  Creates line items in DFP, sending batches concurrently.
+
+  Args:
+    line_items (arr): an array of objects, each a line item configuration
+    batch_size (int): the number of line items per request
+    limit (int): the most requests in flight at once
+  Returns:
+    an array: an array of created line item IDs, in the order of
+      `line_items`
+  """
+  batches = _batches(line_items, batch_size)
+  results = await gather([run(dfp.create_line_items.create_line_items, batch)
+    for batch in batches], limit)
+  return [line_item_id for ids in results for line_item_id in ids]
+
+async def make_licas(line_item_ids, creative_ids, size_overrides=[],
+  limit=None):
+  """
+  Attaches creatives to line items in DFP, sending batches concurrently.
+
+  Args:
+    line_item_ids (arr): an array of line item IDs
+    creative_ids (arr): an array of creative IDs
+    size_overrides (arr): an array of sizes to override the creatives' sizes
+    limit (int): the most requests in flight at once
+  Returns:
+    None
+  """
+  module = dfp.associate_line_items_and_creatives
+  licas = module.build_licas(line_item_ids, creative_ids, size_overrides)
+  batches = _batches(licas, module.LICA_BATCH_SIZE)
+  results = await gather([run(module.create_licas, batch)
+    for batch in batches], limit)
+
+  if any(results):
+    logger.info('Created {0} line item <> creative associations.'.format(
+      len(licas)))
+  else:
+    logger.info('No line item <> creative associations created.')
@@ -2,25 +2,24 @@
 import logging
 from googleads import ad_manager
 
-from dfp.client import get_client
+from dfp.client import get_service
 
 
 logger = logging.getLogger(__name__)
 
-def make_licas(line_item_ids, creative_ids, size_overrides=[]):
+# The number of associations to create per request.
+LICA_BATCH_SIZE = 500
+
+def build_licas(line_item_ids, creative_ids, size_overrides=[]):
   """
-  Attaches creatives to line items in DFP.
+  Returns the line item creative associations to create in DFP.
 
   Args:
     line_item_ids (arr): an array of line item IDs
     creative_ids (arr): an array of creative IDs
   Returns:
-    None
+    an array: an array of association objects
   """
-  dfp_client = get_client()
-  lica_service = dfp_client.GetService(
-    'LineItemCreativeAssociationService', version='v202508')
-
   sizes = []
 
   for size_override in size_overrides:
@@ -41,14 +40,39 @@ def make_licas(line_item_ids, creative_ids, size_overrides=[]):
         # settings, as recommended: http://prebid.org/adops/step-by-step.html
         'sizes': sizes
       })
+  return licas
+
+def create_licas(licas):
+  """
+  Creates one batch of line item creative associations in DFP.
+
+  Args:
+    licas (arr): an array of association objects
+  Returns:
+    an array: the created associations
+  """
+  lica_service = get_service('LineItemCreativeAssociationService')
+  return lica_service.createLineItemCreativeAssociations(licas)
+
+def make_licas(line_item_ids, creative_ids, size_overrides=[]):
+  """
+  Attaches creatives to line items in DFP.
+
+  Args:
+    line_item_ids (arr): an array of line item IDs
+    creative_ids (arr): an array of creative IDs
+  Returns:
+    None
+  """
+  licas = build_licas(line_item_ids, creative_ids, size_overrides)
 
-  batchsize = 500
+  batchsize = LICA_BATCH_SIZE
   for i in range(0, len(licas), batchsize):
     batch = licas[i:i+batchsize] # select a portion of licas array to process in batches
-    batch = lica_service.createLineItemCreativeAssociations(batch)
+    batch = create_licas(batch)
 
     if batch:
       current_total = i+batchsize if i+batchsize < len(licas) else len(licas)
       logger.info('Created {0} line items of {1} <> for creative associations.'.format(current_total, len(licas)))
     else:
-      logger.info('No line item <> creative associations created.')
\ No newline at end of file
+      logger.info('No line item <> creative associations created.')
@@ -0,0 +1,216 @@
+
+import collections
+import logging
+import threading
+import time
+
+import settings
+from dfp.client import get_client, register_reset_hook
+from dfp.singleflight import SingleFlight
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 10000
+
+# Seconds to keep a found object of each type. Orders are created by these
+# scripts, so they get a shorter default than objects we only read.
+DEFAULT_TTLS = {
+  'Companies': 3600,
+  'CustomTargetingKeys': 3600,
+  'Orders': 300,
+  'Users': 3600,
+}
+DEFAULT_TTL = 300
+
+# Seconds to remember that no object has a name.
+DEFAULT_NEGATIVE_TTL = 60
+
+
+class LookupCache(object):
+  """
+  A read-through cache of DFP lookups, e.g. of user IDs by email. Found
+  objects are kept for their type's TTL, and names with no object (`None`)
+  for the negative TTL, so misses are not re-queried either. The least
+  recently used entries are evicted past `max_size`. Concurrent lookups of
+  the same object share one call.
+  """
+
+  def __init__(self, max_size=DEFAULT_MAX_SIZE, ttls=None,
+    default_ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL):
+    """
+    Args:
+      max_size (int): the most entries to keep
+      ttls (dict): seconds to keep found objects, by type. A TTL of 0 turns
+        caching off for the type.
+      default_ttl (float): seconds to keep found objects of other types
+      negative_ttl (float): seconds to keep names with no object
+    """
+    self.max_size = max_size
+    self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+    self.default_ttl = default_ttl
+    self.negative_ttl = negative_ttl
+    self.hits = 0
+    self.negative_hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self._entries = collections.OrderedDict()
+    self._lock = threading.Lock()
+    self._flights = SingleFlight()
+
+  @property
+  def shared(self):
+    """
+    The number of lookups that waited for an identical one in progress.
+    """
+    return self._flights.shared
+
+  def __len__(self):
+    return len(self._entries)
+
+  def _key(self, entity, key):
+    return (str(get_client().network_code), entity, key)
+
+  def _get_ttl(self, entity, value):
+    ttl = self.ttls.get(entity, self.default_ttl)
+    if value is None and ttl:
+      return min(ttl, self.negative_ttl)
+    return ttl
+
+  def get(self, entity, key):
+    """
+    Returns a cached lookup.
+
+    Args:
+      entity (str): the object type, e.g. 'Users'
+      key: what the object was looked up by, e.g. an email address
+    Returns:
+      a tuple: whether the lookup is cached, and its value (None for a
+        cached miss)
+    """
+    cache_key = self._key(entity, key)
+    with self._lock:
+      entry = self._entries.get(cache_key)
+      if entry is None or entry[0] <= time.monotonic():
+        if entry is not None:
+          del self._entries[cache_key]
+        self.misses += 1
+        return False, None
+      self._entries.move_to_end(cache_key)
+      if entry[1] is None:
+        self.negative_hits += 1
+      else:
+        self.hits += 1
+      return True, entry[1]
+
+  def put(self, entity, key, value):
+    """
+    Caches a lookup.
+
+    Args:
+      entity (str): the object type
+      key: what the object was looked up by
+      value: the result, or None if there is no such object
+    Returns:
+      None
+    """
+    ttl = self._get_ttl(entity, value)
+    if not ttl or self.max_size < 1:
+      return
+    cache_key = self._key(entity, key)
+    with self._lock:
+      self._entries[cache_key] = (time.monotonic() + ttl, value)
+      self._entries.move_to_end(cache_key)
+      while len(self._entries) > self.max_size:
+        self._entries.popitem(last=False)
+        self.evictions += 1
+
+  def get_or_load(self, entity, key, loader):
+    """
+    Returns a cached lookup, or runs and caches it.
+
+    Args:
+      entity (str): the object type
+      key: what the object is looked up by
+      loader (function): looks the object up, returning None if there is
+        no such object
+    Returns:
+      what `loader` returns
+    """
+    cached, value = self.get(entity, key)
+    if cached:
+      return value
+
+    def load():
+      # A call that finished while we waited for the lock has cached it.
+      cache_key = self._key(entity, key)
+      with self._lock:
+        entry = self._entries.get(cache_key)
+      if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+      value = loader()
+      self.put(entity, key, value)
+      return value
+
+    return self._flights.call(self._key(entity, key), load)
+
+  def invalidate(self, entity, key):
+    """
+    Forgets a lookup, e.g. after creating the object it would find.
+
+    Args:
+      entity (str): the object type
+      key: what the object is looked up by
+    Returns:
+      None
+    """
+    cache_key = self._key(entity, key)
+    with self._lock:
+      self._entries.pop(cache_key, None)
+
+  def summary(self):
+    """
+    Returns a one-line summary of the cache's use.
+    """
+    return (u'Lookup cache: {hits} hits, {negative_hits} cached misses, '
+      '{misses} lookups ({shared} shared with a concurrent one), '
+      '{evictions} evictions.'.format(hits=self.hits,
+        negative_hits=self.negative_hits, misses=self.misses,
+        shared=self.shared, evictions=self.evictions))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+  """
+  Returns the lookup cache configured by `DFP_CACHE_MAX_SIZE`,
+  `DFP_CACHE_TTLS` and `DFP_CACHE_NEGATIVE_TTL`.
+
+  Returns:
+    a LookupCache
+  """
+  global _cache
+  with _cache_lock:
+    if _cache is None:
+      max_size = getattr(settings, 'DFP_CACHE_MAX_SIZE', DEFAULT_MAX_SIZE)
+      _cache = LookupCache(
+        max_size=DEFAULT_MAX_SIZE if max_size is None else max_size,
+        ttls=getattr(settings, 'DFP_CACHE_TTLS', None),
+        negative_ttl=getattr(settings, 'DFP_CACHE_NEGATIVE_TTL',
+          DEFAULT_NEGATIVE_TTL))
+    return _cache
+
+def reset():
+  """
+  Discards the lookup cache.
+
+  Returns:
+    None
+  """
+  global _cache
+  with _cache_lock:
+    _cache = None
+
+register_reset_hook(reset)
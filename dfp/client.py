@@ -1,8 +1,257 @@
 
+import os
+import threading
+
 from googleads import ad_manager
 
 import settings
+from dfp.exceptions import BadSettingException, MissingSettingException
+from dfp import (memory_backend, rate_limit, recording, retry, token_cache,
+  transport, wsdl_cache)
+
+
+# The Ad Manager API version used by every service in this project.
+API_VERSION = 'v202508'
+
+# The backends `get_client` can load. 'soap' talks to DFP, 'memory' simulates
+# a network in this process, 'record' talks to DFP and saves every call to
+# `DFP_RECORDING_FILE`, and 'replay' answers calls from that file.
+BACKENDS = ('soap', 'memory', 'record', 'replay')
+
+# Process-wide registry of loaded clients, their HTTP sessions and their
+# service proxies. Clients and sessions are keyed by (yaml file, network code)
+# and services by (client key, service name, version).
+_clients = {}
+_sessions = {}
+_services = {}
+_key_locks = {}
+_registry_lock = threading.Lock()
+_reset_hooks = []
+
+
+def _get_key_lock(key):
+  """
+  Returns the lock guarding the creation of the registry entry `key`, so
+  concurrent callers wait for one load instead of each doing their own.
+  """
+  with _registry_lock:
+    lock = _key_locks.get(key)
+    if lock is None:
+      lock = threading.Lock()
+      _key_locks[key] = lock
+    return lock
+
+def _client_key(yaml_file, network_code):
+  if yaml_file is None:
+    yaml_file = settings.GOOGLEADS_YAML_FILE
+  return (yaml_file, network_code)
+
+def get_backend():
+  """
+  Returns the name of the backend to use: the `DFP_BACKEND` environment
+  variable if set, otherwise the `DFP_BACKEND` setting.
+
+  Returns:
+    a string, one of `BACKENDS`
+  """
+  backend = (os.environ.get('DFP_BACKEND') or
+    getattr(settings, 'DFP_BACKEND', None) or 'soap')
+  if backend not in BACKENDS:
+    raise BadSettingException(u'DFP_BACKEND must be one of {0}.'.format(
+      ', '.join(BACKENDS)))
+  return backend
+
+def _get_recording():
+  recording_file = getattr(settings, 'DFP_RECORDING_FILE', None)
+  if not recording_file:
+    raise MissingSettingException('DFP_RECORDING_FILE')
+  return recording.Recording(recording_file)
+
+def _load_client(yaml_file, network_code):
+  backend = get_backend()
+  if backend == 'memory':
+    return memory_backend.load_client(network_code)
+  if backend == 'replay':
+    replayed = _get_recording()
+    replayed.load()
+    return recording.ReplayClient(replayed, network_code)
+
+  client = None
+
+  # Optionally reuse OAuth access tokens minted by earlier runs.
+  token_cache_file = getattr(settings, 'DFP_OAUTH_TOKEN_CACHE_FILE', None)
+  if token_cache_file:
+    client = token_cache.load_client(yaml_file,
+      token_cache.TokenCache(token_cache_file))
+
+  if client is None:
+    client = ad_manager.AdManagerClient.LoadFromStorage(yaml_file)
+  if network_code is not None:
+    client.network_code = network_code
+  if getattr(settings, 'DFP_GZIP_RESPONSES', False):
+    transport.enable_response_compression(client)
+
+  # Reuse service definitions downloaded by earlier runs.
+  cache = wsdl_cache.get_cache()
+  if cache is not None:
+    client.cache = cache
+
+  if backend == 'record':
+    client = recording.RecordingClient(client, _get_recording())
+
+  return client
+
+def get_client(yaml_file=None, network_code=None):
+  """
+  Returns the DFP client for a googleads YAML file, loading it only the first
+  time it is requested in this process. The client comes from the backend
+  chosen by `get_backend`.
+
+  Args:
+    yaml_file (str): the path to the googleads YAML file. Defaults to
+      `settings.GOOGLEADS_YAML_FILE`.
+    network_code (str): overrides the network code from the YAML file
+  Returns:
+    an AdManagerClient
+  """
+  key = _client_key(yaml_file, network_code)
+  client = _clients.get(key)
+  if client is None:
+    with _get_key_lock(key):
+      client = _clients.get(key)
+      if client is None:
+        client = _load_client(key[0], network_code)
+        _clients[key] = client
+  return client
+
+def get_session(yaml_file=None, network_code=None):
+  """
+  Returns the pooled keep-alive HTTP session shared by every service of a
+  client.
+
+  Args:
+    yaml_file (str): the path to the googleads YAML file
+    network_code (str): overrides the network code from the YAML file
+  Returns:
+    a requests.Session
+  """
+  key = _client_key(yaml_file, network_code)
+  session = _sessions.get(key)
+  if session is None:
+    client = get_client(yaml_file, network_code)
+    with _get_key_lock(('session',) + key):
+      session = _sessions.get(key)
+      if session is None:
+        session = transport.create_session(
+          getattr(client, 'proxy_config', None))
+        _sessions[key] = session
+  return session
+
+def get_service(service_name, version=API_VERSION, yaml_file=None,
+  network_code=None):
+  """
+  Returns a DFP service proxy, creating it only the first time it is
+  requested for this client and API version. Every call through the proxy
+  waits for the rate limiter of the client's network, and transient
+  failures are retried.
+
+  Args:
+    service_name (str): the name of the DFP service, e.g. 'OrderService'
+    version (str): the DFP API version
+    yaml_file (str): the path to the googleads YAML file
+    network_code (str): overrides the network code from the YAML file
+  Returns:
+    a DFP service proxy
+  """
+  client_key = _client_key(yaml_file, network_code)
+  key = (client_key, service_name, version)
+  service = _services.get(key)
+  if service is None:
+    client = get_client(yaml_file, network_code)
+    with _get_key_lock(key):
+      service = _services.get(key)
+      if service is None:
+        service = client.GetService(service_name, version=version)
+        transport.attach_session(service,
+          get_session(yaml_file, network_code))
+        service = rate_limit.RateLimitedService(service,
+          rate_limit.get_bucket(client.network_code))
+        # Retry outside the rate limiter so each attempt waits for a token.
+        service = retry.RetryingService(service, service_name,
+          retry.get_policy())
+        _services[key] = service
+  return service
+
+def get_transfer_stats():
+  """
+  Returns the bytes transferred by every session in this process.
+
+  Returns:
+    a transport.TransferStats
+  """
+  stats = transport.TransferStats()
+  with _registry_lock:
+    sessions = list(_sessions.values())
+  for session in sessions:
+    session_stats = getattr(session, 'stats', None)
+    if session_stats is not None:
+      stats.add(session_stats)
+  return stats
+
+def reload_client(yaml_file=None, network_code=None):
+  """
+  Discards the cached client (and its session and services) for a YAML file
+  and network code, then loads it again. Use this after changing credentials
+  or the googleads YAML file.
+
+  Args:
+    yaml_file (str): the path to the googleads YAML file
+    network_code (str): overrides the network code from the YAML file
+  Returns:
+    an AdManagerClient
+  """
+  key = _client_key(yaml_file, network_code)
+  with _registry_lock:
+    _clients.pop(key, None)
+    session = _sessions.pop(key, None)
+    if session is not None:
+      session.close()
+    for service_key in list(_services):
+      if service_key[0] == key:
+        del _services[service_key]
+  return get_client(yaml_file, network_code)
+
+def register_reset_hook(hook):
+  """
+  Registers a function to call whenever `reset_clients` runs. Modules that
+  cache data fetched through a client use this to drop it with the client.
+
+  Args:
+    hook (function): a function taking no arguments
+  Returns:
+    None
+  """
+  if hook not in _reset_hooks:
+    _reset_hooks.append(hook)
 
+def reset_clients():
+  """
+  Discards every cached client, session and service proxy in this process,
+  every rate limiter, the retry budget and every simulated network of the
+  in-memory backend.
 
-def get_client():
-  return ad_manager.AdManagerClient.LoadFromStorage(settings.GOOGLEADS_YAML_FILE)
+  Returns:
+    None
+  """
+  with _registry_lock:
+    _clients.clear()
+    for session in _sessions.values():
+      session.close()
+    _sessions.clear()
+    _services.clear()
+    _key_locks.clear()
+  memory_backend.reset()
+  rate_limit.reset()
+  retry.reset()
+  for hook in _reset_hooks:
+    hook()
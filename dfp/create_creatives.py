@@ -5,7 +5,7 @@ import pprint
 
 from googleads import ad_manager
 
-from dfp.client import get_client
+from dfp.client import get_service
 
 
 logger = logging.getLogger(__name__)
@@ -19,9 +19,7 @@ def create_creatives(creatives):
   Returns:
     an array: an array of created creative IDs
   """
-  dfp_client = get_client()
-  creative_service = dfp_client.GetService('CreativeService',
-    version='v202508')
+  creative_service = get_service('CreativeService')
   creatives = creative_service.createCreatives(creatives)
 
   # Return IDs of created line items.
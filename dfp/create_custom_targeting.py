@@ -4,11 +4,16 @@ import logging
 
 from googleads import ad_manager
 
-from dfp.client import get_client
+from dfp import executor
+from dfp.cache import get_cache
+from dfp.client import get_service
 
 
 logger = logging.getLogger(__name__)
 
+# The number of targeting values to create per request.
+VALUE_BATCH_SIZE = 500
+
 def create_targeting_key(name, display_name=None, key_type='FREEFORM'):
   """
   Creates a custom targeting key in DFP.
@@ -21,9 +26,7 @@ def create_targeting_key(name, display_name=None, key_type='FREEFORM'):
     an integer: the ID of the created key
   """
 
-  dfp_client = get_client()
-  custom_targeting_service = dfp_client.GetService('CustomTargetingService',
-    version='v202508')
+  custom_targeting_service = get_service('CustomTargetingService')
 
   if display_name is None:
     display_name = name
@@ -39,6 +42,7 @@ def create_targeting_key(name, display_name=None, key_type='FREEFORM'):
 
   # Add custom targeting keys.
   keys = custom_targeting_service.createCustomTargetingKeys(keys)
+  get_cache().invalidate('CustomTargetingKeys', name)
   key = keys[0]
 
   logger.info(u'Created a custom targeting key with name "{name}" '
@@ -58,9 +62,7 @@ def create_targeting_value(name, key_id):
     None
   """
 
-  dfp_client = get_client()
-  custom_targeting_service = dfp_client.GetService('CustomTargetingService',
-    version='v202508')
+  custom_targeting_service = get_service('CustomTargetingService')
 
   values_config = [
     {
@@ -85,3 +87,40 @@ def create_targeting_value(name, key_id):
       display_name=created_value['displayName']))
 
   return created_value['id']
+
+def _create_targeting_value_batch(names, key_id):
+  custom_targeting_service = get_service('CustomTargetingService')
+
+  values = custom_targeting_service.createCustomTargetingValues([
+    {
+      'customTargetingKeyId': key_id,
+      'displayName': str(name),
+      'name': str(name),
+      'matchType': 'EXACT'
+    } for name in names
+  ])
+
+  logger.info(u'Created {count} custom targeting values for key ID '
+    '{key_id}.'.format(count=len(values), key_id=key_id))
+
+  return [value['id'] for value in values]
+
+def create_targeting_values(names, key_id, batch_size=VALUE_BATCH_SIZE):
+  """
+  Creates many custom targeting values for a specific key in DFP, sending up
+  to `batch_size` values per request and up to `DFP_MAX_CONCURRENCY` requests
+  at once.
+
+  Args:
+    names (arr): the names of the values
+    key_id (int): the ID of the associated DFP key
+    batch_size (int): the number of values per request
+  Returns:
+    an array of integers: the IDs of the created values, in the order of
+      `names`
+  """
+  names = list(names)
+  batches = [names[i:i+batch_size] for i in range(0, len(names), batch_size)]
+  results = executor.map_ordered(
+    lambda batch: _create_targeting_value_batch(batch, key_id), batches)
+  return [value_id for ids in results for value_id in ids]
@@ -1,7 +1,7 @@
 
 from googleads import ad_manager
 
-from dfp.client import get_client
+from dfp.client import get_service
 
 
 def create_line_items(line_items):
@@ -13,8 +13,7 @@ def create_line_items(line_items):
   Returns:
     an array: an array of created line item IDs
   """
-  dfp_client = get_client()
-  line_item_service = dfp_client.GetService('LineItemService', version='v202508')
+  line_item_service = get_service('LineItemService')
   line_items = line_item_service.createLineItems(line_items)
 
   # Return IDs of created line items.
@@ -6,7 +6,8 @@ from googleads import ad_manager
 
 import settings
 import dfp.get_orders
-from dfp.client import get_client
+from dfp.cache import get_cache
+from dfp.client import get_service
 from dfp.exceptions import BadSettingException, MissingSettingException
 
 
@@ -40,8 +41,6 @@ def create_order(order_name, advertiser_id, trafficker_id):
     an integer: the ID of the created order
   """
 
-  dfp_client = get_client()
-
   # Check to make sure an order does not exist with this name.
   # Otherwise, DFP will throw an exception.
   existing_order = dfp.get_orders.get_order_by_name(order_name)
@@ -65,8 +64,9 @@ def create_order(order_name, advertiser_id, trafficker_id):
       create_order_config(name=order_name, advertiser_id=advertiser_id,
         trafficker_id=trafficker_id)
     ]
-    order_service = dfp_client.GetService('OrderService', version='v202508')
+    order_service = get_service('OrderService')
     orders = order_service.createOrders(orders)
+    get_cache().invalidate('Orders', order_name)
 
     order = orders[0]
     logger.info(u'Created an order with name "{name}".'.format(name=order['name']))
@@ -17,3 +17,15 @@ class BadSettingException(Exception):
   """
   pass
 
+
+class DFPLookupErrors(Exception):
+  """
+  When more than one of a set of independent DFP lookups fails. `errors` maps
+  the name of each failed lookup to its exception.
+  """
+  def __init__(self, errors, *args):
+    self.errors = errors
+    detailed_message = '{0} DFP lookups failed:\n{1}'.format(len(errors),
+      '\n'.join('  {0}: {1}'.format(name, error)
+        for name, error in errors.items()))
+    super(DFPLookupErrors, self).__init__(detailed_message, *args)
@@ -0,0 +1,103 @@
+
+import concurrent.futures
+import threading
+
+from dfp import transport
+from dfp.client import register_reset_hook
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Marks the threads of the pool, so work they submit runs in place.
+_local = threading.local()
+
+
+def _mark_worker():
+  _local.worker = True
+
+def in_worker():
+  """
+  Returns whether the calling thread is one of the pool's.
+
+  Returns:
+    a boolean
+  """
+  return getattr(_local, 'worker', False)
+
+def get_executor():
+  """
+  Returns the thread pool that runs every concurrent DFP call in this
+  process: page prefetches, batched creates and concurrent lookups. It has
+  one thread per call we allow in flight (`DFP_MAX_CONCURRENCY`), as does
+  the HTTP connection pool, so the calls never wait on each other for a
+  connection.
+
+  Returns:
+    a concurrent.futures.ThreadPoolExecutor
+  """
+  global _executor
+  with _executor_lock:
+    if _executor is None:
+      _executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=transport.get_max_concurrency(),
+        thread_name_prefix='dfp', initializer=_mark_worker)
+    return _executor
+
+def submit(func, *args, **kwargs):
+  """
+  Runs a function on the thread pool. Called from one of the pool's own
+  threads, the function runs right away instead: a thread waiting on work
+  queued behind it could otherwise deadlock the pool, e.g. a lookup on the
+  pool that pages through its results.
+
+  Args:
+    func (function): the function to run
+    args: positional arguments for `func`
+    kwargs: keyword arguments for `func`
+  Returns:
+    a concurrent.futures.Future of what `func` returns
+  """
+  if not in_worker():
+    return get_executor().submit(func, *args, **kwargs)
+
+  future = concurrent.futures.Future()
+  try:
+    future.set_result(func(*args, **kwargs))
+  except Exception as error:
+    future.set_exception(error)
+  return future
+
+def map_ordered(func, items):
+  """
+  Calls a function with each item on the thread pool.
+
+  Args:
+    func (function): takes one item
+    items (arr): the items
+  Returns:
+    an array: what `func` returned for each item, in order
+  Raises:
+    the first exception `func` raised, by item order
+  """
+  futures = [submit(func, item) for item in items]
+  try:
+    return [future.result() for future in futures]
+  finally:
+    for future in futures:
+      future.cancel()
+
+def shutdown():
+  """
+  Stops the thread pool. A new one starts with the next call.
+
+  Returns:
+    None
+  """
+  global _executor
+  with _executor_lock:
+    executor, _executor = _executor, None
+  if executor is not None:
+    executor.shutdown(wait=True)
+
+register_reset_hook(shutdown)
@@ -5,12 +5,14 @@ import logging
 from googleads import ad_manager
 
 import settings
-from dfp.client import get_client
+from dfp.client import get_service
 from dfp.exceptions import (
   BadSettingException,
   DFPObjectNotFound,
   MissingSettingException
 )
+from dfp.inventory import PATH_SEPARATOR, get_index
+from dfp.lookup import find_objects_by_name
 
 
 logger = logging.getLogger(__name__)
@@ -25,9 +27,7 @@ def get_ad_unit_by_name(ad_unit_name):
     a DFP ad unit object
   """
 
-  dfp_client = get_client()
-  ad_unit_service = dfp_client.GetService('InventoryService',
-    version='v202508')
+  ad_unit_service = get_service('InventoryService')
 
   query = 'WHERE name = :name'
   values = [
@@ -57,17 +57,52 @@ def get_ad_unit_by_name(ad_unit_name):
 
 def get_ad_unit_ids_by_name(ad_unit_names):
   """
-  Gets ad unit IDs from DFP based on their names.
+  Gets ad unit IDs from DFP based on their names. A name containing a slash,
+  such as 'site/section/leaderboard', that matches no ad unit name is a path
+  in the ad unit hierarchy, and a name several ad units share must be given
+  as a path instead. Both are resolved with the inventory index. Loading the
+  index fetches every ad unit in the network, so paths are only worth using
+  for names that aren't unique.
 
   Args:
     ad_unit_names (arr): an array of ad unit name strings
   Returns:
     an array: an array of ad unit IDs
+  Raises:
+    DFPObjectNotFound: listing every name that is missing or ambiguous
   """  
-  ad_unit_ids = []
-  for ad_unit_name in ad_unit_names:
-    ad_unit_ids.append(get_ad_unit_by_name(ad_unit_name)['id'])
-  return ad_unit_ids
+  ad_unit_service = get_service('InventoryService')
+  ad_units_by_name = find_objects_by_name(
+    ad_unit_service.getAdUnitsByStatement, ad_unit_names, 'ad unit',
+    snapshot_entity='AdUnits')
+
+  missing_names = []
+  index_names = []
+  for name, ad_units in ad_units_by_name.items():
+    if len(ad_units) == 1:
+      ad_units_by_name[name] = ad_units[0]
+    elif ad_units or PATH_SEPARATOR in name:
+      index_names.append(name)
+    else:
+      missing_names.append(name)
+
+  errors = []
+  if missing_names:
+    errors.append(u'No DFP ad unit found with name {names}'.format(
+      names=', '.join(missing_names)))
+  if index_names:
+    index = get_index()
+    for name in index_names:
+      try:
+        ad_units_by_name[name] = index.resolve(name)
+      except DFPObjectNotFound as error:
+        errors.append(str(error))
+  if errors:
+    raise DFPObjectNotFound('\n'.join(errors))
+
+  for name in ad_units_by_name:
+    logger.info(u'Found ad unit with name "{name}".'.format(name=name))
+  return [ad_units_by_name[name]['id'] for name in ad_unit_names]
 
 def main():
   """
@@ -5,27 +5,28 @@ import logging
 from googleads import ad_manager
 
 import settings
-from dfp.client import get_client
+from dfp.cache import get_cache
+from dfp.client import get_service
 from dfp.exceptions import (
   BadSettingException,
   DFPObjectNotFound,
   MissingSettingException
 )
+from dfp.snapshot import get_snapshot
 
 
 logger = logging.getLogger(__name__)
 
 def create_advertiser(name):
   """
-  Creates a DFP advertiser with name `name` and returns its ID.
+  Creates a DFP advertiser with name `name` and returns it.
 
   Args:
     name (str): the name of the DFP advertiser
   Returns:
-    an integer: the advertiser's DFP ID
+    the created DFP advertiser
   """
-  dfp_client = get_client()
-  company_service = dfp_client.GetService('CompanyService', version='v202508')
+  company_service = get_service('CompanyService')
 
   advertisers_config = [
     {
@@ -35,6 +36,7 @@ def create_advertiser(name):
   ]
   advertisers = company_service.createCompanies(advertisers_config)
   advertiser = advertisers[0]
+  get_cache().invalidate('Companies', name)
 
   # Display results.
   for advertiser in advertisers:
@@ -45,15 +47,42 @@ def create_advertiser(name):
 
 def get_advertiser_id_by_name(name):
   """
-  Returns a DFP company ID from company name.
+  Returns a DFP company ID from company name. Lookups, including misses, are
+  cached (see `dfp.cache`).
 
   Args:
     name (str): the name of the DFP advertiser
   Returns:
     an integer: the advertiser's DFP ID
   """
-  dfp_client = get_client()
-  company_service = dfp_client.GetService('CompanyService', version='v202508')
+  advertiser = get_cache().get_or_load('Companies', name,
+    lambda: _find_advertiser(name))
+
+  if advertiser is None:
+    if getattr(settings, 'DFP_CREATE_ADVERTISER_IF_DOES_NOT_EXIST', False):
+      advertiser = create_advertiser(name)
+    else:
+      raise DFPObjectNotFound('No advertiser found with name {0}'.format(name))
+
+  logger.info(u'Using existing advertiser with name "{name}" and '
+    'type "{type}".'.format(name=advertiser['name'], type=advertiser['type']))
+
+  return advertiser['id']
+
+def _find_advertiser(name):
+  """
+  Looks up a DFP company by name, returning None if there is no such
+  company.
+  """
+  snapshot = get_snapshot()
+  if snapshot is not None:
+    advertiser = snapshot.find_one('Companies', 'name', name)
+    if advertiser is not None:
+      logger.info(u'Found advertiser with name "{name}" in the snapshot.'
+        .format(name=name))
+      return advertiser
+
+  company_service = get_service('CompanyService')
 
   # Filter by name.
   query = 'WHERE name = :name'
@@ -76,20 +105,11 @@ def get_advertiser_id_by_name(name):
     no_company_found = True
 
   if no_company_found:
-    if getattr(settings, 'DFP_CREATE_ADVERTISER_IF_DOES_NOT_EXIST', False):
-      advertiser = create_advertiser(name)
-    else:
-      raise DFPObjectNotFound('No advertiser found with name {0}'.format(name))
+    return None
   elif len(response['results']) > 1:
     raise BadSettingException(
       'Multiple advertisers found with name {0}'.format(name))
-  else:
-    advertiser = response['results'][0]
-
-  logger.info(u'Using existing advertiser with name "{name}" and '
-    'type "{type}".'.format(name=advertiser['name'], type=advertiser['type']))
-
-  return advertiser['id']
+  return response['results'][0]
 
 def main():
   """
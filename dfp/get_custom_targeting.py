@@ -1,27 +1,48 @@
 #!/usr/bin/env python
 
 import logging
+from collections import OrderedDict
 
 from googleads import ad_manager
 
-from dfp.client import get_client
+import settings
+from dfp import executor
+from dfp.cache import get_cache
+from dfp.client import get_service
+from dfp.exceptions import BadSettingException
+from dfp.lookup import NAME_CHUNK_SIZE
+from dfp.paginator import fetch_all, get_page_size
+from dfp.snapshot import get_snapshot
 
 
 logger = logging.getLogger(__name__)
 
+# How `get_targeting_by_key_name` fetches the values of a key when told which
+# it needs: 'names' queries just those, 'all' pages through every value, and
+# 'auto' picks whichever takes fewer requests.
+VALUE_FETCH_MODES = ('auto', 'names', 'all')
+
 def get_key_id_by_name(name):
   """
-  Gets a targeting key by key name.
+  Gets a targeting key by key name. Lookups, including misses, are cached
+  (see `dfp.cache`).
 
   Args:
     name (str): the name of the targeting key
   Returns:
     an integer, or None
   """
+  return get_cache().get_or_load('CustomTargetingKeys', name,
+    lambda: _find_key_id(name))
+
+def _find_key_id(name):
+  snapshot = get_snapshot()
+  if snapshot is not None:
+    key = snapshot.find_one('CustomTargetingKeys', 'name', name)
+    if key is not None:
+      return key['id']
 
-  dfp_client = get_client()
-  custom_targeting_service = dfp_client.GetService('CustomTargetingService',
-    version='v202508')
+  custom_targeting_service = get_service('CustomTargetingService')
 
   # Get a key by name.
   query = ('WHERE name = :name')
@@ -44,70 +65,213 @@ def get_key_id_by_name(name):
   return key_id
 
 
-def get_targeting_by_key_name(name):
+def get_value_fetch_mode():
   """
-  Gets a set of custom targeting values by key name
+  Returns how to fetch the values a run needs (`DFP_TARGETING_VALUE_FETCH`):
+  'auto', 'names' or 'all'.
+
+  Returns:
+    a string
+  """
+  mode = getattr(settings, 'DFP_TARGETING_VALUE_FETCH', None) or 'auto'
+  if mode not in VALUE_FETCH_MODES:
+    raise BadSettingException('The setting "DFP_TARGETING_VALUE_FETCH" must '
+      'be one of {0}.'.format(', '.join(VALUE_FETCH_MODES)))
+  return mode
+
+def get_key_ids_by_name(names):
+  """
+  Gets many targeting keys by key name, with one `name IN (...)` statement
+  for the keys not already cached. Lookups, including misses, are cached
+  with those of `get_key_id_by_name`.
 
   Args:
-    name (str): the name of the targeting key
+    names (arr): the names of the targeting keys
   Returns:
-    an array, or None: if the key exists, return an array of objects, where
-      each object is info about a custom targeting value
+    an OrderedDict: the ID of each key, or None, by name
   """
+  cache = get_cache()
+  snapshot = get_snapshot()
 
-  dfp_client = get_client()
-  custom_targeting_service = dfp_client.GetService('CustomTargetingService',
-    version='v202508')
+  key_ids = {}
+  missing = []
+  for name in OrderedDict.fromkeys(names):
+    cached, key_id = cache.get('CustomTargetingKeys', name)
+    if not cached and snapshot is not None:
+      key = snapshot.find_one('CustomTargetingKeys', 'name', name)
+      if key is not None:
+        cached, key_id = True, key['id']
+    if cached:
+      key_ids[name] = key_id
+    else:
+      missing.append(name)
 
-  # Get a key by name.
-  query = ('WHERE name = :name')
-  values = [{
-    'key': 'name',
-    'value': {
-      'xsi_type': 'TextValue',
-      'value': name
-    }
-  }]
-  targeting_key_statement = ad_manager.FilterStatement(query, values)
+  if missing:
+    custom_targeting_service = get_service('CustomTargetingService')
+    found = {}
+    for i in range(0, len(missing), NAME_CHUNK_SIZE):
+      for key in fetch_all(
+        custom_targeting_service.getCustomTargetingKeysByStatement,
+        'name IN (:names)', {'names': missing[i:i+NAME_CHUNK_SIZE]}):
+        found[key['name']] = key['id']
+    for name in missing:
+      key_ids[name] = found.get(name)
+      cache.put('CustomTargetingKeys', name, key_ids[name])
 
-  response = custom_targeting_service.getCustomTargetingKeysByStatement(
-      targeting_key_statement.ToStatement())
+  return OrderedDict((name, key_ids[name]) for name in names)
 
-  # If the key exists, get predefined values.
-  key_values = None
-  if 'results' in response and len(response['results']) > 0:
-    key = response['results'][0]
-    key_values = []
-
-    query = "WHERE status = 'ACTIVE' AND customTargetingKeyId IN (%s)" % str(key['id'])
-    statement = ad_manager.FilterStatement(query)
-
-    response = custom_targeting_service.getCustomTargetingValuesByStatement(
-        statement.ToStatement())
-    while 'results' in response and len(response['results']) > 0:
-      for custom_val in response['results']:
-        key_values.append({
-          'id': custom_val['id'],
-          'name': custom_val['name'],
-          'displayName': custom_val['displayName'],
-          'customTargetingKeyId': custom_val['customTargetingKeyId']
-        })
-      statement.offset += ad_manager.SUGGESTED_PAGE_LIMIT
-      response = custom_targeting_service.getCustomTargetingValuesByStatement(
-        statement.ToStatement())
-
-  if key_values is None:
-    logger.info(u'Key "{key_name}"" does not exist in DFP.'. format(
-      key_name=name))
-  elif len(key_values) < 1:
-    logger.info(u'Key "{key_name}" exists but has no existing values.'. format(
-      key_name=name))
+def count_targeting_values(key_ids):
+  """
+  Gets the number of active values of some keys, without fetching them.
+
+  Args:
+    key_ids (arr): the IDs of the targeting keys
+  Returns:
+    an integer
+  """
+  custom_targeting_service = get_service('CustomTargetingService')
+  statement = ad_manager.FilterStatement(
+    "WHERE status = 'ACTIVE' AND customTargetingKeyId IN (:keyIds)",
+    ad_manager.PQLHelper.GetQueryValuesFromDict({'keyIds': list(key_ids)}),
+    limit=1)
+  response = custom_targeting_service.getCustomTargetingValuesByStatement(
+    statement.ToStatement())
+  try:
+    return response['totalResultSetSize'] or 0
+  except (AttributeError, KeyError, TypeError):
+    return 0
+
+def _should_fetch_by_name(key_ids, value_names):
+  """
+  Returns whether to query keys' values by name rather than page through
+  all of them, as `DFP_TARGETING_VALUE_FETCH` says.
+  """
+  mode = get_value_fetch_mode()
+  if mode != 'auto':
+    return mode == 'names'
+
+  chunks = -(-len(value_names) // NAME_CHUNK_SIZE)
+  if chunks <= 1:
+    # A full scan takes at least one request too, and returns more.
+    return True
+  pages = -(-count_targeting_values(key_ids) // get_page_size())
+  return chunks < pages
+
+def _to_value(custom_val):
+  return {
+    'id': custom_val['id'],
+    'name': custom_val['name'],
+    'displayName': custom_val['displayName'],
+    'customTargetingKeyId': custom_val['customTargetingKeyId']
+  }
+
+def _get_values_by_name(key_ids, value_names):
+  """
+  Fetches the active values of some keys with the given names, with one
+  `name IN (...)` statement per chunk of names, sent concurrently.
+  """
+  custom_targeting_service = get_service('CustomTargetingService')
+  query = ("status = 'ACTIVE' AND customTargetingKeyId IN (:keyIds) "
+    "AND name IN (:names)")
+
+  def fetch(chunk):
+    return list(fetch_all(
+      custom_targeting_service.getCustomTargetingValuesByStatement, query,
+      {'keyIds': list(key_ids), 'names': chunk}))
+
+  value_names = list(value_names)
+  chunks = [value_names[i:i+NAME_CHUNK_SIZE]
+    for i in range(0, len(value_names), NAME_CHUNK_SIZE)]
+  if len(chunks) <= 1:
+    return [value for chunk in chunks for value in fetch(chunk)]
+  return [value for values in executor.map_ordered(fetch, chunks)
+    for value in values]
+
+def get_targeting_by_key_names(names, value_names=None, key_ids=None):
+  """
+  Gets the custom targeting values of many keys at once: one lookup of the
+  keys, then one paged `customTargetingKeyId IN (...)` statement for all of
+  their values.
+
+  Args:
+    names (arr): the names of the targeting keys
+    value_names (dict): the names of the values needed of each key, if not
+      all of them. Depending on `DFP_TARGETING_VALUE_FETCH`, only those are
+      fetched.
+    key_ids (dict): the ID of each key by name, if already looked up
+  Returns:
+    an OrderedDict: by key name, None if the key does not exist, or else an
+      array of objects, where each object is info about a custom targeting
+      value
+  """
+  if key_ids is None:
+    key_ids = get_key_ids_by_name(names)
+  names = list(OrderedDict.fromkeys(names))
+  existing = [name for name in names if key_ids[name] is not None]
+  key_values = OrderedDict((name, [] if key_ids[name] is not None else None)
+    for name in names)
+  key_names = dict((key_ids[name], name) for name in existing)
+
+  # Fetch only the values needed if we know them for every key.
+  needed = None
+  by_name = False
+  if existing and value_names is not None and all(
+    value_names.get(name) is not None for name in existing):
+    needed = dict((name, set(value_names[name])) for name in existing)
+    all_needed = list(OrderedDict.fromkeys(value_name for name in existing
+      for value_name in value_names[name]))
+    by_name = _should_fetch_by_name(list(key_names), all_needed)
+
+  if by_name:
+    custom_vals = _get_values_by_name(list(key_names), all_needed)
+  elif existing:
+    custom_targeting_service = get_service('CustomTargetingService')
+    custom_vals = fetch_all(
+      custom_targeting_service.getCustomTargetingValuesByStatement,
+      "status = 'ACTIVE' AND customTargetingKeyId IN (:keyIds)",
+      {'keyIds': list(key_names)})
   else:
-    logger.info(u'Key "{key_name}" exists and has {num} existing values.'. format(
-      key_name=name, num=len(key_values)))
+    custom_vals = []
+
+  for custom_val in custom_vals:
+    name = key_names.get(custom_val['customTargetingKeyId'])
+    # A value named for one key may also exist on another.
+    if name is not None and (not by_name
+      or custom_val['name'] in needed[name]):
+      key_values[name].append(_to_value(custom_val))
+
+  for name in names:
+    if key_values[name] is None:
+      logger.info(u'Key "{key_name}"" does not exist in DFP.'. format(
+        key_name=name))
+    elif by_name:
+      logger.info(u'Key "{key_name}" has {num} of the {needed} values '
+        'needed.'.format(key_name=name, num=len(key_values[name]),
+          needed=len(needed[name])))
+    elif len(key_values[name]) < 1:
+      logger.info(u'Key "{key_name}" exists but has no existing values.'. format(
+        key_name=name))
+    else:
+      logger.info(u'Key "{key_name}" exists and has {num} existing values.'. format(
+        key_name=name, num=len(key_values[name])))
 
   return key_values
 
+def get_targeting_by_key_name(name, value_names=None):
+  """
+  Gets a set of custom targeting values by key name
+
+  Args:
+    name (str): the name of the targeting key
+    value_names (arr): the names of the values needed, if not all of them.
+      Depending on `DFP_TARGETING_VALUE_FETCH`, only those are fetched.
+  Returns:
+    an array, or None: if the key exists, return an array of objects, where
+      each object is info about a custom targeting value
+  """
+  return get_targeting_by_key_names([name],
+    None if value_names is None else {name: value_names})[name]
+
 def main():
   get_targeting_by_key_name('hb_bidder')
   get_targeting_by_key_name('hb_pb')
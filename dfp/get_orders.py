@@ -1,28 +1,53 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import argparse
+import collections
+import csv
+import datetime
+import json
 import logging
+import sys
+import time
 
 from googleads import ad_manager
+import zeep.helpers
 
-from dfp.client import get_client
+from dfp import executor, transport
+from dfp.cache import get_cache
+from dfp.client import get_service
+from dfp.paginator import fetch_all
 
 
 logger = logging.getLogger(__name__)
 
+# The order fields `export_orders` writes, in column order.
+EXPORT_FIELDS = ('id', 'name', 'advertiserId', 'traffickerId', 'status',
+  'isArchived', 'startDateTime', 'endDateTime', 'unlimitedEndDateTime',
+  'externalOrderId', 'currencyCode', 'totalImpressionsDelivered',
+  'totalClicksDelivered', 'lastModifiedDateTime')
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+ORDER_STATUSES = ('DRAFT', 'PENDING_APPROVAL', 'APPROVED', 'DISAPPROVED',
+  'PAUSED', 'CANCELED', 'DELETED')
+
 
 def get_order_by_name(order_name):
   """
-  Gets an order by name from DFP.
+  Gets an order by name from DFP. Lookups, including misses, are cached (see
+  `dfp.cache`).
 
   Args:
     order_name (str): the name of the DFP order
   Returns:
     a DFP order, or None
   """
+  return get_cache().get_or_load('Orders', order_name,
+    lambda: _find_order(order_name))
 
-  dfp_client = get_client()
-  order_service = dfp_client.GetService('OrderService', version='v202508')
+def _find_order(order_name):
+  order_service = get_service('OrderService')
 
   # Filter by name.
   query = 'WHERE name = :name'
@@ -49,39 +74,214 @@ def get_order_by_name(order_name):
     logger.info(u'Found an order with name "{name}".'.format(name=order['name']))
     return order
 
-def get_all_orders(print_orders=False):
+def iter_orders(advertiser_id=None, status=None, name_like=None):
   """
-  Logs all orders in DFP.
+  Yields the orders in DFP, optionally filtered. Pages are fetched ahead
+  concurrently, and only a few are held at a time, so any number of orders
+  can be read.
 
+  Args:
+    advertiser_id (int): only orders for this advertiser
+    status (str): only orders with this status, e.g. 'APPROVED'
+    name_like (str): only orders whose name matches this PQL LIKE pattern,
+      e.g. 'Prebid%'
   Returns:
-      None
+    a generator of DFP orders
+  """
+  order_service = get_service('OrderService')
+
+  conditions = []
+  values = {}
+  if advertiser_id is not None:
+    conditions.append('advertiserId = :advertiserId')
+    values['advertiserId'] = advertiser_id
+  if status is not None:
+    conditions.append('status = :status')
+    values['status'] = status
+  if name_like is not None:
+    conditions.append('name LIKE :name')
+    values['name'] = name_like
+
+  # Page through the orders, as `DFP_PAGINATION` says.
+  return fetch_all(order_service.getOrdersByStatement,
+    ' AND '.join(conditions), values or None)
+
+def count_line_items(order_id):
+  """
+  Gets the number of line items in an order, without fetching them.
+
+  Args:
+    order_id (int): the id of the DFP order
+  Returns:
+    an integer
+  """
+  line_item_service = get_service('LineItemService')
+  statement = ad_manager.FilterStatement('WHERE orderId = :orderId',
+    ad_manager.PQLHelper.GetQueryValuesFromDict({'orderId': order_id}),
+    limit=1)
+  response = line_item_service.getLineItemsByStatement(
+    statement.ToStatement())
+  try:
+    return response['totalResultSetSize'] or 0
+  except (AttributeError, KeyError, TypeError):
+    return 0
+
+def _with_line_item_counts(orders):
+  """
+  Yields (order, line item count) pairs in order, counting the line items of
+  several orders at once on the shared thread pool (`dfp.executor`), where
+  they take turns with the prefetching of order pages.
+  """
+  window = 2 * transport.get_max_concurrency()
+  pending = collections.deque()
+  try:
+    for order in orders:
+      pending.append((order, executor.submit(count_line_items, order['id'])))
+      # Keep the pool busy, but hold only a few orders at a time.
+      if len(pending) >= window:
+        order, future = pending.popleft()
+        yield order, future.result()
+    while pending:
+      order, future = pending.popleft()
+      yield order, future.result()
+  finally:
+    for _, future in pending:
+      future.cancel()
+
+def _format_date_time(value):
+  """
+  Returns a DFP DateTime as an ISO 8601 string with its time zone in
+  brackets, e.g. '2019-06-01T00:00:00[America/New_York]', or None if unset.
   """
+  if isinstance(value, datetime.datetime):
+    return value.isoformat()
+  if not value or not value.get('date'):
+    return None
+  date = value['date']
+  formatted = u'{0:04d}-{1:02d}-{2:02d}T{3:02d}:{4:02d}:{5:02d}'.format(
+    date['year'], date['month'], date['day'], value.get('hour') or 0,
+    value.get('minute') or 0, value.get('second') or 0)
+  if value.get('timeZoneId'):
+    formatted += u'[{0}]'.format(value['timeZoneId'])
+  return formatted
 
-  dfp_client = get_client()
+def _to_row(order, line_item_count=None):
+  order = zeep.helpers.serialize_object(order, target_cls=dict)
+  row = collections.OrderedDict()
+  for field in EXPORT_FIELDS:
+    value = order.get(field)
+    if field.endswith('DateTime'):
+      value = _format_date_time(value)
+    row[field] = value
+  if line_item_count is not None:
+    row['lineItemCount'] = line_item_count
+  return row
 
-  # Initialize appropriate service.
-  order_service = dfp_client.GetService('OrderService', version='v202508')
+def export_orders(out, output_format='ndjson', line_item_counts=False,
+  advertiser_id=None, status=None, name_like=None):
+  """
+  Writes the orders in DFP to a file as they are fetched, one per line, as
+  newline-delimited JSON or CSV.
+
+  Args:
+    out (file): a text file to write to
+    output_format (str): 'ndjson' or 'csv'
+    line_item_counts (bool): whether to add each order's number of line
+      items, as `lineItemCount`
+    advertiser_id (int): only orders for this advertiser
+    status (str): only orders with this status
+    name_like (str): only orders whose name matches this PQL LIKE pattern
+  Returns:
+    the number of orders written
+  """
+  if output_format not in EXPORT_FORMATS:
+    raise ValueError(u'Cannot export orders as "{0}". Use one of: {1}.'.format(
+      output_format, ', '.join(EXPORT_FORMATS)))
+
+  start = time.time()
+  orders = iter_orders(advertiser_id=advertiser_id, status=status,
+    name_like=name_like)
+  if line_item_counts:
+    rows = (_to_row(order, count) for order, count in
+      _with_line_item_counts(orders))
+  else:
+    rows = (_to_row(order) for order in orders)
+
+  if output_format == 'csv':
+    fields = list(EXPORT_FIELDS)
+    if line_item_counts:
+      fields.append('lineItemCount')
+    writer = csv.DictWriter(out, fieldnames=fields)
+    writer.writeheader()
+    write = writer.writerow
+  else:
+    write = lambda row: out.write(json.dumps(row) + '\n')
+
+  exported = 0
+  for row in rows:
+    write(row)
+    exported += 1
+
+  logger.info(u'Exported {count} orders in {seconds:.1f}s.'.format(
+    count=exported, seconds=time.time() - start))
+  return exported
+
+def get_all_orders(print_orders=False, advertiser_id=None, status=None,
+  name_like=None):
+  """
+  Logs all orders in DFP, or those matching the filters of `iter_orders`.
+
+  Returns:
+      None
+  """
 
-  # Create a statement to select orders.
-  statement = ad_manager.FilterStatement()
   print('Getting all orders...')
 
-  # Retrieve a small amount of orders at a time, paging
-  # through until all orders have been retrieved.
-  while True:
-    response = order_service.getOrdersByStatement(statement.ToStatement())
-    if 'results' in response and len(response['results']) > 0:
-      for order in response['results']:
-        msg = u'Found an order with name "{name}".'.format(name=order['name'])
-        if print_orders:
-          print(msg)
-      statement.offset += ad_manager.SUGGESTED_PAGE_LIMIT
-    else:
-      print('No additional orders found.')
-      break
-
-def main():
-  get_all_orders(print_orders=True)
+  for order in iter_orders(advertiser_id=advertiser_id, status=status,
+    name_like=name_like):
+    msg = u'Found an order with name "{name}".'.format(name=order['name'])
+    if print_orders:
+      print(msg)
+  print('No additional orders found.')
+
+def main(argv=None):
+  """
+  Prints the names of the orders in DFP, or exports the orders.
+
+  Returns:
+    None
+  """
+  parser = argparse.ArgumentParser(prog='python -m dfp.get_orders',
+    description='List or export the orders in DFP.')
+  parser.add_argument('--format', choices=EXPORT_FORMATS, default=None,
+    help='export the orders in this format, rather than print their names')
+  parser.add_argument('--output', default=None,
+    help='the file to export to (default: standard output)')
+  parser.add_argument('--line-item-counts', action='store_true',
+    help='add the number of line items in each order to the export')
+  parser.add_argument('--advertiser-id', type=int, default=None,
+    help='only orders for this advertiser')
+  parser.add_argument('--status', choices=ORDER_STATUSES, default=None,
+    help='only orders with this status')
+  parser.add_argument('--name', default=None,
+    help="only orders whose name matches this PQL LIKE pattern, e.g. 'Prebid%%'")
+  args = parser.parse_args(argv)
+
+  filters = {
+    'advertiser_id': args.advertiser_id,
+    'status': args.status,
+    'name_like': args.name,
+  }
+  if args.format is None:
+    get_all_orders(print_orders=True, **filters)
+    return
+
+  if args.output is None:
+    export_orders(sys.stdout, args.format, args.line_item_counts, **filters)
+  else:
+    with open(args.output, 'w', newline='', encoding='utf-8') as out:
+      export_orders(out, args.format, args.line_item_counts, **filters)
 
 if __name__ == '__main__':
+  logging.basicConfig(level=logging.INFO, format='%(message)s')
   main()
@@ -5,12 +5,13 @@ import logging
 from googleads import ad_manager
 
 import settings
-from dfp.client import get_client
+from dfp.client import get_service
 from dfp.exceptions import (
   BadSettingException,
   DFPObjectNotFound,
   MissingSettingException
 )
+from dfp.lookup import get_objects_by_name
 
 
 logger = logging.getLogger(__name__)
@@ -25,9 +26,7 @@ def get_placement_by_name(placement_name):
     a DFP placement object
   """
 
-  dfp_client = get_client()
-  placement_service = dfp_client.GetService('PlacementService',
-    version='v202508')
+  placement_service = get_service('PlacementService')
 
   query = 'WHERE name = :name'
   values = [
@@ -64,10 +63,10 @@ def get_placement_ids_by_name(placement_names):
   Returns:
     an array: an array of placement IDs
   """  
-  placement_ids = []
-  for placement_name in placement_names:
-    placement_ids.append(get_placement_by_name(placement_name)['id'])
-  return placement_ids
+  placement_service = get_service('PlacementService')
+  placements = get_objects_by_name(placement_service.getPlacementsByStatement,
+    placement_names, 'placement', snapshot_entity='Placements')
+  return [placement['id'] for placement in placements]
 
 def main():
   """
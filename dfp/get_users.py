@@ -5,23 +5,53 @@ import logging
 from googleads import ad_manager
 
 import settings
-from dfp.client import get_client
+from dfp import pql
+from dfp.cache import get_cache
+from dfp.client import get_service
 from dfp.exceptions import DFPObjectNotFound, MissingSettingException
+from dfp.snapshot import get_snapshot
 
 
 logger = logging.getLogger(__name__)
 
 def get_user_id_by_email(email_address):
   """
-  Returns a DFP user ID from email address.
+  Returns a DFP user ID from email address. Lookups, including misses, are
+  cached (see `dfp.cache`).
 
   Args:
     email (str): the email of the DFP user
   Returns:
     an integer: the user's DFP ID
   """
-  dfp_client = get_client()
-  user_service = dfp_client.GetService('UserService', version='v202508')
+  user_id = get_cache().get_or_load('Users', email_address,
+    lambda: _find_user_id(email_address))
+  if user_id is None:
+    raise DFPObjectNotFound('No DFP user found with given email address.')
+  return user_id
+
+def _find_user_id(email_address):
+  """
+  Looks up a DFP user ID by email address, returning None if there is no
+  such user.
+  """
+  snapshot = get_snapshot()
+  if snapshot is not None:
+    user = snapshot.find_one('Users', 'email', email_address)
+    if user is not None:
+      logger.info(u'Found user with the given email address in the snapshot.')
+      return user['id']
+
+  user_service = get_service('UserService')
+
+  if pql.is_enabled():
+    users = pql.select_objects('Users', ('id',),
+      user_service.getUsersByStatement, 'email = :email',
+      {'email': email_address})
+    if not users:
+      return None
+    logger.info(u'Found user with the given email address.')
+    return users[0]['id']
 
   # Filter by email address.
   query = 'WHERE email = :email'
@@ -44,7 +74,7 @@ def get_user_id_by_email(email_address):
     no_user_found = True
 
   if no_user_found:
-    raise DFPObjectNotFound('No DFP user found with given email address.')
+    return None
 
   # Only get the first user in case there are multiple matches.
   user = response['results'][0]
@@ -0,0 +1,190 @@
+
+import logging
+import threading
+import time
+
+from googleads import ad_manager
+
+from dfp.client import get_service, register_reset_hook
+from dfp.exceptions import DFPObjectNotFound
+from dfp.paginator import paginate
+
+
+logger = logging.getLogger(__name__)
+
+PATH_SEPARATOR = '/'
+
+
+class AdUnitNode(object):
+  """
+  An ad unit in the inventory tree, with its children by name.
+  """
+
+  def __init__(self, ad_unit, parent=None):
+    self.ad_unit = ad_unit
+    self.parent = parent
+    self.children = {}
+
+  @property
+  def path(self):
+    """
+    The names of the ad unit and its ancestors below the root, joined by
+    slashes, e.g. 'site/section/leaderboard'.
+    """
+    names = []
+    node = self
+    while node.parent is not None:
+      names.append(node.ad_unit['name'])
+      node = node.parent
+    return PATH_SEPARATOR.join(reversed(names))
+
+
+class InventoryIndex(object):
+  """
+  The ad unit hierarchy of a network as a trie, keyed by ad unit name at
+  each level. Resolving a path such as 'site/section/leaderboard' walks one
+  level per segment.
+  """
+
+  def __init__(self, ad_units):
+    """
+    Args:
+      ad_units (arr): every ad unit of the network, including the root
+    """
+    nodes = dict((ad_unit['id'], AdUnitNode(ad_unit)) for ad_unit in ad_units)
+    self.nodes_by_name = {}
+    self.roots = []
+
+    for node in nodes.values():
+      self.nodes_by_name.setdefault(node.ad_unit['name'], []).append(node)
+      parent_id = (node.ad_unit['parentId'] if 'parentId' in node.ad_unit
+        else None)
+      parent = nodes.get(parent_id)
+      if parent is None:
+        self.roots.append(node)
+      else:
+        node.parent = parent
+        name = node.ad_unit['name']
+        if name in parent.children:
+          logger.warning(u'Ad unit "{parent}" has more than one child named '
+            '"{name}".'.format(parent=parent.path, name=name))
+        else:
+          parent.children[name] = node
+
+  def __len__(self):
+    return sum(len(nodes) for nodes in self.nodes_by_name.values())
+
+  def _find(self, path):
+    names = [name for name in path.split(PATH_SEPARATOR) if name]
+    for root in self.roots:
+      node = root
+      # Paths may start with the root ad unit's name.
+      if names and names[0] == root.ad_unit['name']:
+        remaining = names[1:]
+      else:
+        remaining = names
+      for name in remaining:
+        node = node.children.get(name)
+        if node is None:
+          break
+      if node is not None and node is not root:
+        return node
+    return None
+
+  def resolve(self, path):
+    """
+    Returns the ad unit at a path. A name without slashes matches an ad unit
+    of that name anywhere in the tree, if there is exactly one.
+
+    Args:
+      path (str): an ad unit path such as 'site/section/leaderboard'
+    Returns:
+      a DFP ad unit object
+    """
+    return self._resolve_node(path).ad_unit
+
+  def _resolve_node(self, path):
+    node = None
+    if PATH_SEPARATOR in path:
+      node = self._find(path)
+
+    if node is None:
+      # Ad unit names may themselves contain slashes.
+      nodes = self.nodes_by_name.get(path, [])
+      if len(nodes) > 1:
+        raise DFPObjectNotFound(u'More than one DFP ad unit is named "{name}": '
+          '{paths}. Use the full path instead.'.format(name=path,
+            paths=', '.join(sorted(node.path for node in nodes))))
+      node = nodes[0] if nodes else None
+
+    if node is None:
+      raise DFPObjectNotFound(
+        u'No DFP ad unit found with path {0}'.format(path))
+    return node
+
+  def descendants(self, path):
+    """
+    Returns every ad unit below the ad unit at a path.
+
+    Args:
+      path (str): an ad unit path
+    Returns:
+      an array of DFP ad unit objects, parents before their children
+    """
+    node = self._resolve_node(path)
+    stack = [node.children[name] for name in sorted(node.children,
+      reverse=True)]
+    descendants = []
+    while stack:
+      node = stack.pop()
+      descendants.append(node.ad_unit)
+      stack.extend(node.children[name] for name in sorted(node.children,
+        reverse=True))
+    return descendants
+
+
+def load_ad_units():
+  """
+  Fetches every ad unit of the network, several pages at a time.
+
+  Returns:
+    an array of DFP ad unit objects
+  """
+  ad_unit_service = get_service('InventoryService')
+  return list(paginate(ad_unit_service.getAdUnitsByStatement,
+    ad_manager.StatementBuilder(order_by='id')))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+  """
+  Returns the inventory index, loading it the first time it is requested in
+  this process.
+
+  Returns:
+    an InventoryIndex
+  """
+  global _index
+  with _index_lock:
+    if _index is None:
+      start_time = time.time()
+      _index = InventoryIndex(load_ad_units())
+      logger.info(u'Loaded {count} ad units in {seconds:.2f}s.'.format(
+        count=len(_index), seconds=time.time() - start_time))
+    return _index
+
+def reset():
+  """
+  Discards the loaded inventory index.
+
+  Returns:
+    None
+  """
+  global _index
+  with _index_lock:
+    _index = None
+
+register_reset_hook(reset)
@@ -0,0 +1,112 @@
+
+import logging
+import time
+from collections import OrderedDict
+
+from googleads import ad_manager
+
+from dfp import pql
+from dfp.exceptions import DFPObjectNotFound
+from dfp.paginator import Paginator
+from dfp.snapshot import get_snapshot
+
+
+logger = logging.getLogger(__name__)
+
+# The most names to look up per statement.
+NAME_CHUNK_SIZE = 100
+
+
+def find_objects_by_name(query_method, names, object_type,
+  snapshot_entity=None):
+  """
+  Fetches DFP objects by name with as few requests as possible: one paged
+  `name IN (...)` statement per chunk of names. Logs how long the lookup
+  took.
+
+  Args:
+    query_method (function): a get*ByStatement service method, e.g.
+      `getPlacementsByStatement`
+    names (arr): an array of object names
+    object_type (str): the object type for messages, e.g. 'placement'
+    snapshot_entity (str): the type of the objects, e.g. 'Placements'. If
+      the snapshot is enabled, names found there are not requested from DFP.
+      If `DFP_PQL_LOOKUPS` is on and PQL supports the type, only the ids and
+      names of the objects are fetched.
+  Returns:
+    an OrderedDict: an array of the DFP objects with each name, empty if
+      there are none, by name
+  """
+  unique_names = []
+  for name in names:
+    if name in unique_names:
+      logger.warning(u'The {object_type} name "{name}" is listed more than '
+        'once.'.format(object_type=object_type, name=name))
+    else:
+      unique_names.append(name)
+
+  start_time = time.time()
+  request_count = 0
+  objects_by_name = OrderedDict((name, []) for name in unique_names)
+  snapshot = get_snapshot() if snapshot_entity else None
+  if snapshot is not None:
+    for name in unique_names:
+      obj = snapshot.find_one(snapshot_entity, 'name', name)
+      if obj is not None:
+        objects_by_name[name].append(obj)
+
+  remaining_names = [name for name in unique_names
+    if not objects_by_name[name]]
+  for i in range(0, len(remaining_names), NAME_CHUNK_SIZE):
+    chunk = remaining_names[i:i+NAME_CHUNK_SIZE]
+    if pql.is_enabled() and snapshot_entity in pql.TABLES:
+      # Only the ids and names are needed.
+      found = pql.Selection(snapshot_entity, ('id', 'name'), query_method,
+        'name IN (:names)', {'names': chunk})
+    else:
+      found = Paginator(query_method, ad_manager.StatementBuilder(
+        where='name IN (:names)').WithBindVariable('names', chunk))
+    for obj in found:
+      if obj['name'] in objects_by_name:
+        objects_by_name[obj['name']].append(obj)
+    request_count += found.requests
+
+  logger.info(u'Looked up {count} {object_type} names in {seconds:.2f}s with '
+    '{requests} requests.'.format(count=len(unique_names),
+      object_type=object_type, seconds=time.time() - start_time,
+      requests=request_count))
+  return objects_by_name
+
+def get_objects_by_name(query_method, names, object_type,
+  snapshot_entity=None):
+  """
+  Fetches DFP objects by name (see `find_objects_by_name`). If several
+  objects share a name, the first one is used.
+
+  Args:
+    query_method (function): a get*ByStatement service method, e.g.
+      `getPlacementsByStatement`
+    names (arr): an array of object names
+    object_type (str): the object type for messages, e.g. 'placement'
+    snapshot_entity (str): the type of the objects, e.g. 'Placements'
+  Returns:
+    an array: the DFP objects, in the order of `names`
+  Raises:
+    DFPObjectNotFound: listing every name with no object
+  """
+  objects_by_name = find_objects_by_name(query_method, names, object_type,
+    snapshot_entity)
+
+  missing_names = [name for name, objects in objects_by_name.items()
+    if not objects]
+  if missing_names:
+    raise DFPObjectNotFound(u'No DFP {object_type} found with name {names}'
+      .format(object_type=object_type, names=', '.join(missing_names)))
+
+  for name, objects in objects_by_name.items():
+    if len(objects) > 1:
+      logger.warning(u'More than one DFP {object_type} is named "{name}". '
+        'Using the first one.'.format(object_type=object_type, name=name))
+    logger.info(u'Found {object_type} with name "{name}".'.format(
+      object_type=object_type, name=name))
+  return [objects_by_name[name][0] for name in names]
@@ -0,0 +1,540 @@
+
+import copy
+import datetime
+import itertools
+import re
+import threading
+import time
+
+from googleads import errors
+
+import settings
+
+
+# The objects each DFP service manages, by the plural used in its method
+# names: `create<Plural>` and `get<Plural>ByStatement`.
+SERVICE_ENTITIES = {
+  'CompanyService': ['Companies'],
+  'CreativeService': ['Creatives'],
+  'CustomTargetingService': ['CustomTargetingKeys', 'CustomTargetingValues'],
+  'InventoryService': ['AdUnits'],
+  'LineItemCreativeAssociationService': ['LineItemCreativeAssociations'],
+  'LineItemService': ['LineItems'],
+  'OrderService': ['Orders'],
+  'PlacementService': ['Placements'],
+  'UserService': ['Users'],
+  'PublisherQueryLanguageService': [],
+}
+
+# The objects in each table PublisherQueryLanguageService can select from.
+PQL_TABLES = {
+  'Ad_Unit': 'AdUnits',
+  'Line_Item': 'LineItems',
+  'User': 'Users',
+}
+
+_SELECT_PATTERN = re.compile(r'^\s*SELECT\s+(?P<columns>.+?)\s+FROM\s+'
+  r'(?P<table>\w+)(?P<rest>.*)$', re.IGNORECASE | re.DOTALL)
+
+# The fields that must be unique among objects of a type, as DFP enforces.
+UNIQUE_FIELDS = {
+  'Companies': ('name',),
+  'CustomTargetingKeys': ('name',),
+  'CustomTargetingValues': ('customTargetingKeyId', 'name'),
+  'LineItemCreativeAssociations': ('lineItemId', 'creativeId'),
+  'LineItems': ('orderId', 'name'),
+  'Orders': ('name',),
+}
+
+# Values DFP fills in on created objects.
+DEFAULTS = {
+  'CustomTargetingKeys': {'status': 'ACTIVE'},
+  'CustomTargetingValues': {'status': 'ACTIVE'},
+  'LineItemCreativeAssociations': {'status': 'ACTIVE'},
+  'LineItems': {'status': 'DRAFT', 'isArchived': False},
+  'Orders': {'status': 'DRAFT', 'isArchived': False},
+}
+
+# Objects without their own ID.
+NO_ID_ENTITIES = ('LineItemCreativeAssociations',)
+
+_TOKEN_PATTERN = re.compile(r"""
+  \s*(?:
+    (?P<string>'(?:[^']|'')*') |
+    (?P<number>-?\d+(?:\.\d+)?) |
+    (?P<bind>:\w+) |
+    (?P<op><>|!=|<=|>=|=|<|>) |
+    (?P<punct>[(),]) |
+    (?P<word>[A-Za-z_][\w.]*)
+  )""", re.VERBOSE)
+
+
+def _to_pql_value(value):
+  """
+  Wraps a field value as a PQL Value, e.g. {'xsi_type': 'TextValue', ...}.
+  """
+  if isinstance(value, bool):
+    return {'xsi_type': 'BooleanValue', 'value': value}
+  if isinstance(value, (int, float)):
+    return {'xsi_type': 'NumberValue', 'value': str(value)}
+  return {'xsi_type': 'TextValue', 'value': value}
+
+
+class PQLError(Exception):
+  """
+  When the in-memory backend can't parse a statement.
+  """
+  pass
+
+
+def _fault(error_string, message):
+  return errors.GoogleAdsServerFault(None,
+    errors=[{'errorString': error_string, 'fieldPath': '', 'trigger': ''}],
+    message=u'[{0} @ ; trigger:\'\'] {1}'.format(error_string, message))
+
+def _bind_value(value):
+  """
+  Unwraps a bound PQL value, e.g. {'xsi_type': 'TextValue', 'value': 'x'}.
+  """
+  if 'values' in value:
+    return [_bind_value(item) for item in value['values']]
+  if value.get('xsi_type') == 'DateTimeValue':
+    date_time = value['value']
+    return datetime.datetime(date_time['date']['year'],
+      date_time['date']['month'], date_time['date']['day'],
+      date_time['hour'], date_time['minute'], date_time['second'])
+  return value.get('value')
+
+def _tokenize(query):
+  tokens = []
+  position = 0
+  query = query.strip()
+  while position < len(query):
+    match = _TOKEN_PATTERN.match(query, position)
+    if match is None or match.end() == position:
+      raise PQLError(u'Unexpected input at "{0}".'.format(query[position:]))
+    kind = match.lastgroup
+    text = match.group(kind)
+    if kind == 'string':
+      tokens.append(('value', text[1:-1].replace("''", "'")))
+    elif kind == 'number':
+      tokens.append(('value', float(text) if '.' in text else int(text)))
+    elif kind == 'word' and text.upper() in ('TRUE', 'FALSE'):
+      tokens.append(('value', text.upper() == 'TRUE'))
+    elif kind == 'word' and text.upper() in ('AND', 'OR', 'NOT', 'IN', 'LIKE',
+      'IS', 'NULL', 'WHERE', 'ORDER', 'BY', 'ASC', 'DESC', 'LIMIT', 'OFFSET'):
+      tokens.append(('keyword', text.upper()))
+    else:
+      tokens.append((kind, text))
+    position = match.end()
+  return tokens
+
+
+class _Statement(object):
+  """
+  A parsed PQL filter statement: WHERE, ORDER BY, LIMIT and OFFSET.
+  """
+
+  def __init__(self, statement):
+    statement = statement or {}
+    self.bind_values = dict((value['key'], _bind_value(value['value']))
+      for value in statement.get('values') or [])
+    self.tokens = _tokenize(statement.get('query') or '')
+    self.position = 0
+    self.where = None
+    self.order_by = []
+    self.limit = None
+    self.offset = 0
+
+    if self._accept('keyword', 'WHERE'):
+      self.where = self._parse_or()
+    if self._accept('keyword', 'ORDER'):
+      self._expect('keyword', 'BY')
+      while True:
+        field = self._expect('word')
+        descending = bool(self._accept('keyword', 'DESC'))
+        if not descending:
+          self._accept('keyword', 'ASC')
+        self.order_by.append((field, descending))
+        if not self._accept('punct', ','):
+          break
+    if self._accept('keyword', 'LIMIT'):
+      self.limit = self._parse_value()
+    if self._accept('keyword', 'OFFSET'):
+      self.offset = self._parse_value()
+    if self.position < len(self.tokens):
+      raise PQLError(u'Unexpected "{0}".'.format(self.tokens[self.position][1]))
+
+  def _peek(self):
+    if self.position < len(self.tokens):
+      return self.tokens[self.position]
+    return (None, None)
+
+  def _accept(self, kind, text=None):
+    token_kind, token_text = self._peek()
+    if token_kind == kind and (text is None or token_text == text):
+      self.position += 1
+      return token_text if token_text is not None else True
+    return None
+
+  def _expect(self, kind, text=None):
+    token = self._accept(kind, text)
+    if token is None:
+      raise PQLError(u'Expected {0} but found "{1}".'.format(text or kind,
+        self._peek()[1]))
+    return token
+
+  def _parse_value(self):
+    kind, text = self._peek()
+    if kind == 'value':
+      self.position += 1
+      return text
+    if kind == 'bind':
+      self.position += 1
+      try:
+        return self.bind_values[text[1:]]
+      except KeyError:
+        raise PQLError(u'Unbound variable {0}.'.format(text))
+    raise PQLError(u'Expected a value but found "{0}".'.format(text))
+
+  def _parse_or(self):
+    conditions = [self._parse_and()]
+    while self._accept('keyword', 'OR'):
+      conditions.append(self._parse_and())
+    return lambda obj: any(condition(obj) for condition in conditions)
+
+  def _parse_and(self):
+    conditions = [self._parse_condition()]
+    while self._accept('keyword', 'AND'):
+      conditions.append(self._parse_condition())
+    return lambda obj: all(condition(obj) for condition in conditions)
+
+  def _parse_condition(self):
+    if self._accept('keyword', 'NOT'):
+      condition = self._parse_condition()
+      return lambda obj: not condition(obj)
+    if self._accept('punct', '('):
+      condition = self._parse_or()
+      self._expect('punct', ')')
+      return condition
+
+    field = self._expect('word')
+    negated = bool(self._accept('keyword', 'NOT'))
+
+    if self._accept('keyword', 'IN'):
+      self._expect('punct', '(')
+      values = []
+      while True:
+        value = self._parse_value()
+        values.extend(value if isinstance(value, list) else [value])
+        if not self._accept('punct', ','):
+          break
+      self._expect('punct', ')')
+      condition = lambda obj: _field(obj, field) in values
+    elif self._accept('keyword', 'LIKE'):
+      pattern = re.compile('^{0}$'.format(
+        re.escape(self._parse_value()).replace('%', '.*')), re.DOTALL)
+      condition = lambda obj: pattern.match(str(_field(obj, field))) is not None
+    elif self._accept('keyword', 'IS'):
+      negated = bool(self._accept('keyword', 'NOT'))
+      self._expect('keyword', 'NULL')
+      condition = lambda obj: _field(obj, field) is None
+    else:
+      operator = self._expect('op')
+      value = self._parse_value()
+      condition = _comparison(field, operator, value)
+
+    if negated:
+      return lambda obj: not condition(obj)
+    return condition
+
+  def apply(self, objects):
+    """
+    Returns the filtered, sorted and paged objects, and the number of
+    objects matching the filter.
+    """
+    if self.where is not None:
+      objects = [obj for obj in objects if self.where(obj)]
+    for field, descending in reversed(self.order_by):
+      objects = sorted(objects, key=lambda obj: _sort_key(_field(obj, field)),
+        reverse=descending)
+    total = len(objects)
+    end = None if self.limit is None else self.offset + self.limit
+    return objects[self.offset:end], total
+
+
+def _field(obj, field):
+  value = obj
+  for part in field.split('.'):
+    if not isinstance(value, dict):
+      return None
+    if part not in value:
+      # PQL column names are capitalized, e.g. 'Name' for 'name'.
+      part = part[:1].lower() + part[1:]
+    value = value.get(part)
+  return value
+
+def _sort_key(value):
+  return (value is not None, value if value is not None else 0)
+
+def _comparison(field, operator, value):
+  def compare(obj):
+    field_value = _field(obj, field)
+    if operator == '=':
+      return field_value == value
+    if operator in ('!=', '<>'):
+      return field_value != value
+    if field_value is None:
+      return False
+    if operator == '<':
+      return field_value < value
+    if operator == '>':
+      return field_value > value
+    if operator == '<=':
+      return field_value <= value
+    return field_value >= value
+  return compare
+
+
+class MemoryNetwork(object):
+  """
+  The state of a simulated DFP network: every object created through the
+  in-memory backend, by type.
+  """
+
+  def __init__(self, network_code=None):
+    self.network_code = network_code
+    self.objects = dict((entity, []) for entities in SERVICE_ENTITIES.values()
+      for entity in entities)
+    self._ids = itertools.count(1000001)
+    self._lock = threading.Lock()
+
+  def create(self, entity, objects):
+    """
+    Stores new objects, assigning their IDs.
+
+    Args:
+      entity (str): the plural object type, e.g. 'LineItems'
+      objects (arr): an array of object dicts
+    Returns:
+      an array: copies of the stored objects
+    """
+    unique_fields = UNIQUE_FIELDS.get(entity)
+    created = []
+    with self._lock:
+      existing = self.objects[entity]
+      seen = set()
+      if unique_fields:
+        seen = set(tuple(obj.get(field) for field in unique_fields)
+          for obj in existing)
+
+      for obj in objects:
+        obj = dict(DEFAULTS.get(entity, {}), **copy.deepcopy(dict(obj)))
+        if unique_fields:
+          unique_key = tuple(obj.get(field) for field in unique_fields)
+          if unique_key in seen:
+            raise _fault('UniqueError.NOT_UNIQUE',
+              u'{0} with {1} {2} already exists.'.format(entity,
+                '/'.join(unique_fields), unique_key))
+          seen.add(unique_key)
+        if entity not in NO_ID_ENTITIES:
+          obj['id'] = next(self._ids)
+        obj['lastModifiedDateTime'] = datetime.datetime.utcnow()
+        created.append(obj)
+
+      existing.extend(created)
+    return copy.deepcopy(created)
+
+  def query(self, entity, statement):
+    """
+    Returns a page of objects matching a PQL filter statement, shaped like
+    a DFP page result.
+
+    Args:
+      entity (str): the plural object type, e.g. 'Orders'
+      statement (dict): a statement from `FilterStatement.ToStatement()`
+    Returns:
+      a dict with `totalResultSetSize`, `startIndex` and `results`
+    """
+    parsed = _Statement(statement)
+    with self._lock:
+      objects = list(self.objects[entity])
+    results, total = parsed.apply(objects)
+    return {
+      'totalResultSetSize': total,
+      'startIndex': parsed.offset,
+      'results': copy.deepcopy(results),
+    }
+
+  def select(self, statement):
+    """
+    Returns the columns of the objects matching a PQL select statement,
+    shaped like a DFP ResultSet.
+
+    Args:
+      statement (dict): a statement whose query starts with
+        `SELECT <columns> FROM <table>`
+    Returns:
+      a dict with `columnTypes` and `rows`
+    """
+    match = _SELECT_PATTERN.match(statement['query'])
+    if match is None:
+      raise PQLError(u'Expected SELECT ... FROM ... in "{0}".'.format(
+        statement['query']))
+    entity = PQL_TABLES.get(match.group('table'))
+    if entity is None:
+      raise _fault('PublisherQueryLanguageContextError.UNEXECUTABLE',
+        u'Unknown table {0}.'.format(match.group('table')))
+
+    columns = [column.strip() for column in
+      match.group('columns').split(',')]
+    page = self.query(entity, {'query': match.group('rest'),
+      'values': statement.get('values')})
+    return {
+      'columnTypes': [{'labelName': column} for column in columns],
+      'rows': [{'values': [_to_pql_value(_field(obj, column))
+        for column in columns]} for obj in page['results']],
+    }
+
+  def seed_from_settings(self):
+    """
+    Adds the user, placements and ad units named in settings, so a setup
+    can run against this network without further preparation.
+
+    Returns:
+      None
+    """
+    email = getattr(settings, 'DFP_USER_EMAIL_ADDRESS', None)
+    if email:
+      self.create('Users', [{'email': email, 'name': email}])
+    self.create('Placements', [{'name': name, 'status': 'ACTIVE'} for name in
+      getattr(settings, 'DFP_TARGETED_PLACEMENT_NAMES', None) or []])
+    self.create('AdUnits', [{'name': name, 'status': 'ACTIVE'} for name in
+      getattr(settings, 'DFP_TARGETED_AD_UNIT_NAMES', None) or []])
+
+
+class MemoryService(object):
+  """
+  A stand-in for a DFP service proxy that reads and writes a MemoryNetwork.
+  Every call sleeps for `latency` seconds to simulate a round trip.
+  """
+
+  def __init__(self, network, service_name, latency=0):
+    """
+    Args:
+      network (MemoryNetwork)
+      service_name (str): the name of the DFP service, e.g. 'OrderService'
+      latency (float): seconds each call takes
+    """
+    try:
+      entities = SERVICE_ENTITIES[service_name]
+    except KeyError:
+      raise ValueError(
+        u'The in-memory backend does not support {0}.'.format(service_name))
+
+    self.network = network
+    self.service_name = service_name
+    self.latency = latency
+    for entity in entities:
+      setattr(self, 'create' + entity, self._create_method(entity))
+      setattr(self, 'get{0}ByStatement'.format(entity),
+        self._query_method(entity))
+    if service_name == 'PublisherQueryLanguageService':
+      self.select = self._select_method()
+
+  def _sleep(self):
+    if self.latency:
+      time.sleep(self.latency)
+
+  def _create_method(self, entity):
+    def create(objects):
+      self._sleep()
+      return self.network.create(entity, objects)
+    return create
+
+  def _query_method(self, entity):
+    def query(statement):
+      self._sleep()
+      try:
+        return self.network.query(entity, statement)
+      except PQLError as error:
+        raise _fault('PublisherQueryLanguageSyntaxError.UNPARSABLE',
+          str(error))
+    return query
+
+
+  def _select_method(self):
+    def select(statement):
+      self._sleep()
+      try:
+        return self.network.select(statement)
+      except PQLError as error:
+        raise _fault('PublisherQueryLanguageSyntaxError.UNPARSABLE',
+          str(error))
+    return select
+
+
+class MemoryClient(object):
+  """
+  A stand-in for AdManagerClient whose services use a MemoryNetwork.
+  """
+
+  def __init__(self, network, latency=0):
+    """
+    Args:
+      network (MemoryNetwork)
+      latency (float): seconds each service call takes
+    """
+    self.network = network
+    self.network_code = network.network_code
+    self.latency = latency
+    self.cache = None
+
+  def GetService(self, service_name, version=None, server=None):
+    return MemoryService(self.network, service_name, self.latency)
+
+
+_networks = {}
+_networks_lock = threading.Lock()
+
+
+def get_network(network_code=None):
+  """
+  Returns the simulated network for a network code, creating and seeding it
+  the first time it is requested in this process.
+
+  Args:
+    network_code (str)
+  Returns:
+    a MemoryNetwork
+  """
+  with _networks_lock:
+    network = _networks.get(network_code)
+    if network is None:
+      network = MemoryNetwork(network_code)
+      network.seed_from_settings()
+      _networks[network_code] = network
+    return network
+
+def load_client(network_code=None):
+  """
+  Returns a client for the in-memory backend, with the latency set by
+  `DFP_MEMORY_LATENCY`.
+
+  Args:
+    network_code (str)
+  Returns:
+    a MemoryClient
+  """
+  return MemoryClient(get_network(network_code),
+    latency=getattr(settings, 'DFP_MEMORY_LATENCY', 0))
+
+def reset():
+  """
+  Discards every simulated network.
+
+  Returns:
+    None
+  """
+  with _networks_lock:
+    _networks.clear()
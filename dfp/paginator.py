@@ -0,0 +1,374 @@
+
+import collections
+import concurrent.futures
+import logging
+import threading
+
+from googleads import ad_manager
+
+import settings
+from dfp import executor, transport
+from dfp.exceptions import BadSettingException
+
+
+logger = logging.getLogger(__name__)
+
+# The most objects DFP returns per page.
+MAX_PAGE_SIZE = ad_manager.SUGGESTED_PAGE_LIMIT
+
+DEFAULT_PREFETCH_PAGES = 4
+
+# How `fetch_all` pages: by offset, or by id (keyset pagination).
+PAGINATION_MODES = ('offset', 'keyset')
+
+
+def get_page_size():
+  """
+  Returns the number of objects to request per page (`DFP_PAGE_SIZE`).
+
+  Returns:
+    an integer
+  """
+  page_size = getattr(settings, 'DFP_PAGE_SIZE', None)
+  if page_size is None:
+    return MAX_PAGE_SIZE
+  if (not isinstance(page_size, int) or page_size < 1
+    or page_size > MAX_PAGE_SIZE):
+    raise BadSettingException('The setting "DFP_PAGE_SIZE" must be a whole '
+      'number from 1 to {0}.'.format(MAX_PAGE_SIZE))
+  return page_size
+
+def get_prefetch_pages():
+  """
+  Returns the number of pages to fetch ahead of the one being read
+  (`DFP_PREFETCH_PAGES`).
+
+  Returns:
+    an integer
+  """
+  prefetch_pages = getattr(settings, 'DFP_PREFETCH_PAGES',
+    DEFAULT_PREFETCH_PAGES)
+  return max(0, int(prefetch_pages or 0))
+
+def _get_results(response):
+  if 'results' in response and response['results']:
+    return response['results']
+  return []
+
+
+class Paginator(object):
+  """
+  Iterates over every object a get*ByStatement call matches. The first page
+  tells us how many objects there are (`totalResultSetSize`), so the pages
+  after it are requested up to `prefetch_pages` at a time while earlier ones
+  are being read. Objects are yielded in page order.
+
+  Pages are fetched by offset, so the statement should order its results,
+  e.g. by id, if objects may change while we page through them.
+  """
+
+  def __init__(self, query_method, statement=None, page_size=None,
+    prefetch_pages=None):
+    """
+    Args:
+      query_method (function): a get*ByStatement service method, e.g.
+        `getOrdersByStatement`
+      statement (object): a StatementBuilder or FilterStatement. Its limit and
+        offset are set by the paginator. Defaults to every object.
+      page_size (int): the objects per page. Defaults to `DFP_PAGE_SIZE`.
+      prefetch_pages (int): the most pages to fetch ahead. Defaults to
+        `DFP_PREFETCH_PAGES`.
+    """
+    self.query_method = query_method
+    self.statement = (statement if statement is not None
+      else ad_manager.StatementBuilder())
+    self.page_size = page_size or get_page_size()
+    self.prefetch_pages = (prefetch_pages if prefetch_pages is not None
+      else get_prefetch_pages())
+    # The number of requests made and the number of objects DFP reported,
+    # once known.
+    self.requests = 0
+    self.total = None
+
+  def _page_statement(self, offset):
+    # Statements are built here, on the calling thread, because the
+    # statement objects are not safe to share between threads.
+    self.statement.limit = self.page_size
+    self.statement.offset = offset
+    return self.statement.ToStatement()
+
+  def _fetch(self, offset):
+    self.requests += 1
+    return self.query_method(self._page_statement(offset))
+
+  def __iter__(self):
+    response = self._fetch(0)
+    results = _get_results(response)
+    for obj in results:
+      yield obj
+
+    if 'totalResultSetSize' not in response:
+      # Without a total we can only read one page at a time until one is
+      # empty.
+      offset = self.page_size
+      while results:
+        results = _get_results(self._fetch(offset))
+        for obj in results:
+          yield obj
+        offset += self.page_size
+      return
+
+    self.total = response['totalResultSetSize']
+    offsets = collections.deque(range(self.page_size, self.total,
+      self.page_size))
+    if not results or not offsets:
+      return
+
+    pending = collections.deque()
+    try:
+      while offsets or pending:
+        while offsets and len(pending) < max(1, self.prefetch_pages):
+          statement = self._page_statement(offsets.popleft())
+          self.requests += 1
+          pending.append(executor.submit(self.query_method, statement))
+
+        results = _get_results(pending.popleft().result())
+        for obj in results:
+          yield obj
+        if not results:
+          # The result set shrank while we paged through it.
+          break
+    finally:
+      for future in pending:
+        future.cancel()
+
+
+def paginate(query_method, statement=None, page_size=None,
+  prefetch_pages=None):
+  """
+  Yields every object a get*ByStatement call matches, fetching pages ahead
+  concurrently. See `Paginator`.
+
+  Args:
+    query_method (function): a get*ByStatement service method
+    statement (object): a StatementBuilder or FilterStatement
+    page_size (int): the objects per page
+    prefetch_pages (int): the most pages to fetch ahead
+  Returns:
+    a generator of DFP objects
+  """
+  return iter(Paginator(query_method, statement, page_size, prefetch_pages))
+
+
+def get_pagination_mode():
+  """
+  Returns how `fetch_all` pages through objects (`DFP_PAGINATION`): 'offset'
+  or 'keyset'.
+
+  Returns:
+    a string
+  """
+  mode = getattr(settings, 'DFP_PAGINATION', None) or 'offset'
+  if mode not in PAGINATION_MODES:
+    raise BadSettingException('The setting "DFP_PAGINATION" must be one of '
+      '{0}.'.format(', '.join(PAGINATION_MODES)))
+  return mode
+
+def _keyset_statement(where, values, lower_id, upper_id, limit,
+  descending=False):
+  conditions = ['({0})'.format(where)] if where else []
+  bind_values = dict(values or {})
+  if lower_id is not None:
+    conditions.append('id > :keysetLowerId')
+    bind_values['keysetLowerId'] = lower_id
+  if upper_id is not None:
+    conditions.append('id <= :keysetUpperId')
+    bind_values['keysetUpperId'] = upper_id
+
+  query = 'WHERE {0} '.format(' AND '.join(conditions)) if conditions else ''
+  query += 'ORDER BY id {order} LIMIT {limit}'.format(
+    order='DESC' if descending else 'ASC', limit=limit)
+  return {
+    'query': query,
+    'values': (ad_manager.PQLHelper.GetQueryValuesFromDict(bind_values)
+      if bind_values else None),
+  }
+
+
+class _IdRange(object):
+  """
+  One id range of a keyset scan: the last id fetched, the page fetched but
+  not yet read, the fetch in flight, and whether the range is done.
+  """
+
+  def __init__(self, lower_id, upper_id):
+    self.lower_id = lower_id
+    self.upper_id = upper_id
+    self.page = None
+    self.future = None
+    self.done = False
+
+
+class KeysetPaginator(object):
+  """
+  Iterates over every object a get*ByStatement call matches in id order,
+  asking for the objects after the last id seen
+  (`WHERE id > :last ORDER BY id ASC LIMIT n`) rather than for an offset, so
+  each page costs DFP the same however deep into the set it is.
+
+  With more than one range, the ids between the first and last match are
+  split into that many ranges, which are scanned concurrently. The first
+  range is read as it arrives, and each of the others fetches only one page
+  ahead, so at most about one page per range is held at a time.
+  """
+
+  def __init__(self, query_method, where='', values=None, page_size=None,
+    ranges=None):
+    """
+    Args:
+      query_method (function): a get*ByStatement service method
+      where (str): a PQL condition, without the WHERE keyword
+      values (dict): bind variable values for `where`, by name
+      page_size (int): the objects per page. Defaults to `DFP_PAGE_SIZE`.
+      ranges (int): the most id ranges to scan at once. Defaults to
+        `DFP_MAX_CONCURRENCY`.
+    """
+    self.query_method = query_method
+    self.where = where
+    self.values = values
+    self.page_size = page_size or get_page_size()
+    self.ranges = ranges or transport.get_max_concurrency()
+    self.requests = 0
+    self._lock = threading.Lock()
+
+  def _query(self, lower_id, upper_id, limit, descending=False):
+    with self._lock:
+      self.requests += 1
+    return self.query_method(_keyset_statement(self.where, self.values,
+      lower_id, upper_id, limit, descending))
+
+  def _fetch_page(self, lower_id, upper_id):
+    """
+    Returns the page of objects after `lower_id`, up to `upper_id`, and
+    whether it is the last page of the range.
+    """
+    response = self._query(lower_id, upper_id, self.page_size)
+    results = _get_results(response)
+    last = not results or ('totalResultSetSize' in response
+      and len(results) >= response['totalResultSetSize'])
+    return results, last
+
+  def _scan(self, lower_id=None, upper_id=None):
+    while True:
+      results, last = self._fetch_page(lower_id, upper_id)
+      for obj in results:
+        yield obj
+      if last:
+        break
+      lower_id = results[-1]['id']
+
+  def _advance(self, ranges):
+    """
+    Collects the pages fetched for each range, and starts fetching the next
+    page of each range that has none waiting to be read.
+    """
+    for id_range in ranges:
+      if id_range.future is not None and id_range.future.done():
+        results, id_range.done = id_range.future.result()
+        id_range.future = None
+        if results:
+          id_range.page = results
+          id_range.lower_id = results[-1]['id']
+      if (id_range.future is None and id_range.page is None
+        and not id_range.done):
+        id_range.future = executor.submit(self._fetch_page, id_range.lower_id,
+          id_range.upper_id)
+
+  def __iter__(self):
+    if self.ranges <= 1:
+      for obj in self._scan():
+        yield obj
+      return
+
+    # Find the id space to split, and whether the set is big enough to be
+    # worth splitting.
+    response = self._query(None, None, 1)
+    first = _get_results(response)
+    if not first:
+      return
+    total = (response['totalResultSetSize']
+      if 'totalResultSetSize' in response else 0)
+    ranges = min(self.ranges, -(-total // self.page_size))
+    if ranges <= 1:
+      for obj in self._scan():
+        yield obj
+      return
+
+    last = _get_results(self._query(None, None, 1, descending=True))
+    lower_id = int(first[0]['id']) - 1
+    upper_id = int(last[0]['id']) if last else lower_id + 1
+    bounds = [lower_id + (upper_id - lower_id) * index // ranges
+      for index in range(ranges + 1)]
+    # Leave the outer ranges open, so objects created since are included.
+    bounds[0] = None
+    bounds[-1] = None
+
+    id_ranges = [_IdRange(bounds[index], bounds[index + 1])
+      for index in range(ranges)]
+    try:
+      for id_range in id_ranges:
+        while True:
+          self._advance(id_ranges)
+          if id_range.page is not None:
+            page, id_range.page = id_range.page, None
+            # Fetch the range's next page while this one is read.
+            self._advance(id_ranges)
+            for obj in page:
+              yield obj
+          elif id_range.done:
+            break
+          else:
+            concurrent.futures.wait([other.future for other in id_ranges
+              if other.future is not None],
+              return_when=concurrent.futures.FIRST_COMPLETED)
+    finally:
+      for id_range in id_ranges:
+        if id_range.future is not None:
+          id_range.future.cancel()
+
+
+def paginate_by_id(query_method, where='', values=None, page_size=None,
+  ranges=None):
+  """
+  Yields every object a get*ByStatement call matches, in id order, by
+  keyset pagination. See `KeysetPaginator`.
+
+  Args:
+    query_method (function): a get*ByStatement service method
+    where (str): a PQL condition, without the WHERE keyword
+    values (dict): bind variable values for `where`, by name
+    page_size (int): the objects per page
+    ranges (int): the most id ranges to scan at once
+  Returns:
+    a generator of DFP objects
+  """
+  return iter(KeysetPaginator(query_method, where, values, page_size, ranges))
+
+def fetch_all(query_method, where='', values=None):
+  """
+  Yields every object a get*ByStatement call matches, paging by offset or by
+  id depending on `DFP_PAGINATION`.
+
+  Args:
+    query_method (function): a get*ByStatement service method
+    where (str): a PQL condition, without the WHERE keyword
+    values (dict): bind variable values for `where`, by name
+  Returns:
+    a generator of DFP objects
+  """
+  if get_pagination_mode() == 'keyset':
+    return paginate_by_id(query_method, where, values)
+  statement = ad_manager.FilterStatement(
+    'WHERE {0}'.format(where) if where else '',
+    ad_manager.PQLHelper.GetQueryValuesFromDict(values) if values else None)
+  return paginate(query_method, statement)
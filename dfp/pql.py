@@ -0,0 +1,212 @@
+
+import logging
+import threading
+
+from googleads import ad_manager
+from googleads.errors import GoogleAdsServerFault
+
+import settings
+from dfp.client import get_service, register_reset_hook
+from dfp.paginator import fetch_all, get_page_size
+from dfp.retry import get_error_strings
+
+
+logger = logging.getLogger(__name__)
+
+# The PQL tables that hold the objects of each type, for the types
+# PublisherQueryLanguageService can select. Other types, such as placements
+# and companies, are always fetched with their *ByStatement calls.
+TABLES = {
+  'AdUnits': 'Ad_Unit',
+  'LineItems': 'Line_Item',
+  'Users': 'User',
+}
+
+# The errors with which DFP rejects a select it cannot run, such as one on a
+# column the table does not have.
+PQL_ERRORS = ('PublisherQueryLanguageContextError',
+  'PublisherQueryLanguageSyntaxError')
+
+# The types PQL has declined to select this run, so we don't ask again.
+_unsupported = set()
+_unsupported_lock = threading.Lock()
+
+
+def is_enabled():
+  """
+  Returns whether lookups may use PQL selects (`DFP_PQL_LOOKUPS`).
+
+  Returns:
+    a boolean
+  """
+  return bool(getattr(settings, 'DFP_PQL_LOOKUPS', False))
+
+def to_column(field):
+  """
+  Returns the PQL column of an object field, e.g. 'ParentId' for 'parentId'.
+  """
+  return field[:1].upper() + field[1:]
+
+def to_field(column):
+  """
+  Returns the object field of a PQL column, e.g. 'parentId' for 'ParentId'.
+  """
+  return column[:1].lower() + column[1:]
+
+def _get(obj, key, default=None):
+  try:
+    return obj[key]
+  except (AttributeError, KeyError, TypeError):
+    return default
+
+def _to_python(value):
+  """
+  Returns the Python value of a PQL Value, e.g. 42 for
+  {'xsi_type': 'NumberValue', 'value': '42'}.
+  """
+  if value is None:
+    return None
+  if isinstance(value, dict):
+    value_type = value.get('xsi_type')
+  else:
+    value_type = getattr(getattr(value, '_xsd_type', None), 'name', None)
+
+  if value_type == 'SetValue':
+    return [_to_python(item) for item in _get(value, 'values') or []]
+  raw = _get(value, 'value')
+  if value_type == 'NumberValue' and raw is not None:
+    number = float(raw)
+    return int(number) if number.is_integer() else number
+  return raw
+
+def parse_result_set(result_set):
+  """
+  Turns a PQL ResultSet into object dicts.
+
+  Args:
+    result_set (object): the response of PublisherQueryLanguageService.select
+  Returns:
+    an array of dicts, one per row, keyed by object field
+  """
+  fields = [to_field(column_type['labelName']) for column_type in
+    _get(result_set, 'columnTypes') or []]
+  return [dict(zip(fields, [_to_python(value) for value in row['values']]))
+    for row in _get(result_set, 'rows') or []]
+
+
+class Selection(object):
+  """
+  Iterates over the given fields of every object of a type that matches a
+  condition. Where PQL supports the type, the fields are selected with
+  PublisherQueryLanguageService, which sends and parses only those columns.
+  Otherwise, or if DFP rejects the select, the objects are fetched whole with
+  the *ByStatement call and cut down to the fields.
+  """
+
+  def __init__(self, entity, fields, query_method, where='', values=None):
+    """
+    Args:
+      entity (str): the object type, e.g. 'AdUnits'
+      fields (arr): the fields to fetch, e.g. ['id', 'name']
+      query_method (function): the *ByStatement service method to fall back
+        on, e.g. `getAdUnitsByStatement`
+      where (str): a PQL condition on object fields, without the WHERE
+        keyword
+      values (dict): bind variable values for `where`, by name
+    """
+    self.entity = entity
+    self.fields = list(fields)
+    self.query_method = query_method
+    self.where = where
+    self.values = values
+    # The number of requests made, and whether PQL served them.
+    self.requests = 0
+    self.used_pql = False
+    self._lock = threading.Lock()
+
+  def _can_select(self):
+    with _unsupported_lock:
+      unsupported = self.entity in _unsupported
+    return is_enabled() and self.entity in TABLES and not unsupported
+
+  def _select(self):
+    service = get_service('PublisherQueryLanguageService')
+    page_size = get_page_size()
+    query = 'SELECT {columns} FROM {table}'.format(
+      columns=', '.join(to_column(field) for field in self.fields),
+      table=TABLES[self.entity])
+    if self.where:
+      query += ' WHERE {0}'.format(self.where)
+    statement = ad_manager.FilterStatement(query,
+      ad_manager.PQLHelper.GetQueryValuesFromDict(self.values)
+        if self.values else None, limit=page_size)
+
+    rows = []
+    while True:
+      self.requests += 1
+      page = parse_result_set(service.select(statement.ToStatement()))
+      rows.extend(page)
+      if len(page) < page_size:
+        return rows
+      statement.offset += page_size
+
+  def _fetch(self):
+    paginated = fetch_all(self._count(self.query_method), self.where,
+      self.values)
+    return [dict((field, _get(obj, field)) for field in self.fields)
+      for obj in paginated]
+
+  def _count(self, query_method):
+    def counted(statement):
+      # Pages may be fetched on several threads.
+      with self._lock:
+        self.requests += 1
+      return query_method(statement)
+    return counted
+
+  def __iter__(self):
+    if self._can_select():
+      try:
+        rows = self._select()
+        self.used_pql = True
+        return iter(rows)
+      except GoogleAdsServerFault as fault:
+        error_strings = get_error_strings(fault)
+        if not error_strings or not all(error_string.split('.')[0]
+          in PQL_ERRORS for error_string in error_strings):
+          raise
+        logger.warning(u'PQL cannot select {entity} ({errors}). Fetching '
+          'whole objects instead.'.format(entity=self.entity,
+            errors=', '.join(error_strings)))
+        with _unsupported_lock:
+          _unsupported.add(self.entity)
+    return iter(self._fetch())
+
+
+def select_objects(entity, fields, query_method, where='', values=None):
+  """
+  Returns the given fields of every object of a type that matches a
+  condition, by PQL select where possible. See `Selection`.
+
+  Args:
+    entity (str): the object type, e.g. 'AdUnits'
+    fields (arr): the fields to fetch, e.g. ['id', 'name']
+    query_method (function): the *ByStatement service method to fall back on
+    where (str): a PQL condition on object fields, without the WHERE keyword
+    values (dict): bind variable values for `where`, by name
+  Returns:
+    an array of dicts keyed by field
+  """
+  return list(Selection(entity, fields, query_method, where, values))
+
+def reset():
+  """
+  Forgets which types PQL has declined to select.
+
+  Returns:
+    None
+  """
+  with _unsupported_lock:
+    _unsupported.clear()
+
+register_reset_hook(reset)
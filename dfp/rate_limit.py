@@ -0,0 +1,136 @@
+
+import threading
+import time
+
+import settings
+
+
+class TokenBucket(object):
+  """
+  Lets calls through at `rate` per second on average, and up to `burst` at
+  once after a quiet period. Callers that find the bucket empty reserve a
+  token and sleep until it is due, so waiting callers go in arrival order.
+  """
+
+  def __init__(self, rate=None, burst=None):
+    """
+    Args:
+      rate (float): calls per second, or None for no limit
+      burst (int): the most calls to allow at once. Defaults to `rate`.
+    """
+    self.rate = float(rate) if rate else None
+    self.burst = max(1, int(burst or rate or 1))
+    self.tokens = self.burst
+    self.updated = time.monotonic()
+    self.calls = 0
+    self.waited_calls = 0
+    self.total_wait = 0.0
+    self.max_wait = 0.0
+    self._lock = threading.Lock()
+
+  def acquire(self):
+    """
+    Waits until a call may go through.
+
+    Returns:
+      a float: the seconds waited
+    """
+    wait = 0.0
+    with self._lock:
+      if self.rate is not None:
+        now = time.monotonic()
+        self.tokens = min(self.burst,
+          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens < 0:
+          wait = -self.tokens / self.rate
+
+      self.calls += 1
+      if wait:
+        self.waited_calls += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    if wait:
+      time.sleep(wait)
+    return wait
+
+  def summary(self):
+    """
+    Returns:
+      a string describing how long calls waited for the limiter
+    """
+    with self._lock:
+      average_wait = self.total_wait / self.calls if self.calls else 0
+      return (u'{calls} DFP calls, {waited} of them rate limited: waited '
+        '{total:.1f}s in total, {average:.3f}s on average and {max:.3f}s at '
+        'most.'.format(calls=self.calls, waited=self.waited_calls,
+          total=self.total_wait, average=average_wait, max=self.max_wait))
+
+
+class RateLimitedService(object):
+  """
+  Wraps a DFP service proxy so every call first waits for a token bucket.
+  """
+
+  def __init__(self, service, bucket):
+    """
+    Args:
+      service: a DFP service proxy
+      bucket (TokenBucket)
+    """
+    self.service = service
+    self.bucket = bucket
+
+  def __getattr__(self, name):
+    attribute = getattr(self.service, name)
+    if name.startswith('_') or not callable(attribute):
+      return attribute
+
+    def call(*args, **kwargs):
+      self.bucket.acquire()
+      return attribute(*args, **kwargs)
+    return call
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(network_code):
+  """
+  Returns the token bucket shared by every call to a network, configured by
+  `DFP_REQUESTS_PER_SECOND` and `DFP_REQUESTS_BURST`.
+
+  Args:
+    network_code (str)
+  Returns:
+    a TokenBucket
+  """
+  with _buckets_lock:
+    bucket = _buckets.get(network_code)
+    if bucket is None:
+      bucket = TokenBucket(
+        getattr(settings, 'DFP_REQUESTS_PER_SECOND', None),
+        getattr(settings, 'DFP_REQUESTS_BURST', None))
+      _buckets[network_code] = bucket
+    return bucket
+
+def get_buckets():
+  """
+  Returns:
+    a dict of network code to its TokenBucket
+  """
+  with _buckets_lock:
+    return dict(_buckets)
+
+def reset():
+  """
+  Discards every token bucket and its stats.
+
+  Returns:
+    None
+  """
+  with _buckets_lock:
+    _buckets.clear()
@@ -0,0 +1,215 @@
+
+import collections
+import datetime
+import decimal
+import json
+import os
+import threading
+
+from googleads import errors
+import zeep.helpers
+
+
+class RecordingNotFound(Exception):
+  """
+  When a replayed call was never recorded.
+  """
+  pass
+
+
+def _to_json(value):
+  if isinstance(value, (datetime.date, datetime.datetime)):
+    return value.isoformat()
+  if isinstance(value, decimal.Decimal):
+    return float(value)
+  raise TypeError(u'Cannot record a {0}.'.format(type(value).__name__))
+
+def _call_key(service_name, method_name, args, kwargs):
+  return json.dumps([service_name, method_name,
+    zeep.helpers.serialize_object(list(args)),
+    zeep.helpers.serialize_object(kwargs)],
+    sort_keys=True, default=_to_json)
+
+def _fault_errors(fault):
+  fault_errors = []
+  for error in fault.errors or []:
+    if isinstance(error, dict):
+      error_string = error.get('errorString')
+    else:
+      error_string = getattr(error, 'errorString', None)
+    fault_errors.append({'errorString': error_string})
+  return fault_errors
+
+
+class Recording(object):
+  """
+  The DFP calls of a run, stored as newline-delimited JSON: one line per
+  call, with its service, method and arguments and the response or fault it
+  got.
+  """
+
+  def __init__(self, path):
+    """
+    Args:
+      path (str): the path of the recording file
+    """
+    self.path = os.path.expanduser(path)
+    self.interactions = []
+    self._started = False
+    self._lock = threading.Lock()
+
+  def load(self):
+    """
+    Reads the recording file.
+
+    Returns:
+      None
+    """
+    with open(self.path) as recording_file:
+      self.interactions = [json.loads(line) for line in recording_file
+        if line.strip()]
+
+  def append(self, key, response=None, fault=None):
+    """
+    Records a call by adding a line to the recording file. The first call
+    of a run replaces any earlier recording.
+
+    Args:
+      key (str): the call key from `_call_key`
+      response: the DFP response
+      fault (GoogleAdsServerFault): the fault the call raised
+    Returns:
+      None
+    """
+    interaction = {'call': key}
+    if fault is not None:
+      interaction['fault'] = {'message': str(fault),
+        'errors': _fault_errors(fault)}
+    else:
+      interaction['response'] = zeep.helpers.serialize_object(response,
+        target_cls=dict)
+
+    line = json.dumps(interaction, default=_to_json) + '\n'
+    with self._lock:
+      if not self._started:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(directory):
+          os.makedirs(directory)
+      with open(self.path, 'a' if self._started else 'w') as recording_file:
+        recording_file.write(line)
+      self._started = True
+
+
+class RecordingService(object):
+  """
+  Wraps a DFP service proxy and records every call made through it.
+  """
+
+  def __init__(self, service, service_name, recording):
+    self.service = service
+    self.service_name = service_name
+    self.recording = recording
+
+  def __getattr__(self, method_name):
+    method = getattr(self.service, method_name)
+    if not callable(method):
+      return method
+
+    def call(*args, **kwargs):
+      key = _call_key(self.service_name, method_name, args, kwargs)
+      try:
+        response = method(*args, **kwargs)
+      except errors.GoogleAdsServerFault as fault:
+        self.recording.append(key, fault=fault)
+        raise
+      self.recording.append(key, response=response)
+      return response
+    return call
+
+
+class ReplayService(object):
+  """
+  Answers DFP calls from a recording instead of the network.
+  """
+
+  def __init__(self, service_name, responses, lock, method_names):
+    self.service_name = service_name
+    self.responses = responses
+    self.lock = lock
+    self.method_names = method_names
+
+  def __getattr__(self, method_name):
+    # Only recorded methods exist, so probes such as `zeep_client` find
+    # nothing.
+    if method_name not in self.method_names:
+      raise AttributeError(u'{0} has no recorded calls to {1}.'.format(
+        self.service_name, method_name))
+
+    def call(*args, **kwargs):
+      key = _call_key(self.service_name, method_name, args, kwargs)
+      with self.lock:
+        interactions = self.responses.get(key)
+        if not interactions:
+          raise RecordingNotFound(u'No recorded response for {0}.{1}.'.format(
+            self.service_name, method_name))
+        # Replay repeated calls in the recorded order, then keep returning
+        # the last response.
+        interaction = (interactions.popleft() if len(interactions) > 1
+          else interactions[0])
+      if 'fault' in interaction:
+        raise errors.GoogleAdsServerFault(None,
+          errors=interaction['fault']['errors'],
+          message=interaction['fault']['message'])
+      return interaction['response']
+    return call
+
+
+class RecordingClient(object):
+  """
+  Wraps an AdManagerClient so its services record their calls.
+  """
+
+  def __init__(self, client, recording):
+    """
+    Args:
+      client (AdManagerClient)
+      recording (Recording)
+    """
+    self.client = client
+    self.recording = recording
+
+  def __getattr__(self, name):
+    return getattr(self.client, name)
+
+  def GetService(self, service_name, version=None, server=None):
+    kwargs = {'version': version} if version is not None else {}
+    if server is not None:
+      kwargs['server'] = server
+    return RecordingService(self.client.GetService(service_name, **kwargs),
+      service_name, self.recording)
+
+
+class ReplayClient(object):
+  """
+  A stand-in for AdManagerClient whose services replay a recording.
+  """
+
+  def __init__(self, recording, network_code=None):
+    """
+    Args:
+      recording (Recording): a loaded recording
+      network_code (str)
+    """
+    self.network_code = network_code
+    self.cache = None
+    self.responses = collections.defaultdict(collections.deque)
+    self.method_names = collections.defaultdict(set)
+    self._lock = threading.Lock()
+    for interaction in recording.interactions:
+      self.responses[interaction['call']].append(interaction)
+      service_name, method_name = json.loads(interaction['call'])[:2]
+      self.method_names[service_name].add(method_name)
+
+  def GetService(self, service_name, version=None, server=None):
+    return ReplayService(service_name, self.responses, self._lock,
+      self.method_names[service_name])
@@ -0,0 +1,238 @@
+
+import collections
+import logging
+import random
+import threading
+import time
+
+from googleads import errors
+import requests.exceptions
+import zeep.exceptions
+
+import settings
+
+
+logger = logging.getLogger(__name__)
+
+# DFP errors that say nothing about the request itself, so the same request
+# may succeed later.
+TRANSIENT_ERRORS = frozenset([
+  'InternalApiError.TRANSIENT_ERROR',
+  'InternalApiError.UNEXPECTED_INTERNAL_API_ERROR',
+  'QuotaError.EXCEEDED_QUOTA',
+  'ServerError.SERVER_BUSY',
+  'ServerError.SERVER_ERROR',
+])
+
+# The transient errors after which DFP has certainly applied nothing, so
+# even a create or update may be retried. After a server error, part of a
+# batch may have been saved.
+WRITE_TRANSIENT_ERRORS = frozenset([
+  'QuotaError.EXCEEDED_QUOTA',
+])
+
+# Defaults for the retry settings in settings.py.
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BASE_DELAY = 1
+DEFAULT_MAX_DELAY = 60
+DEFAULT_BUDGET = 50
+
+RetryRecord = collections.namedtuple('RetryRecord',
+  ['service', 'method', 'attempt', 'delay', 'error'])
+
+
+def get_error_strings(fault):
+  """
+  Returns the error strings of a DFP fault, e.g. 'QuotaError.EXCEEDED_QUOTA'.
+
+  Args:
+    fault (GoogleAdsServerFault)
+  Returns:
+    an array of strings
+  """
+  error_strings = []
+  for error in getattr(fault, 'errors', None) or []:
+    if isinstance(error, dict):
+      error_strings.append(error.get('errorString'))
+    else:
+      error_strings.append(getattr(error, 'errorString', None))
+  return error_strings
+
+def is_transient(error, write):
+  """
+  Returns whether a failed call may be retried.
+
+  Reads are retried after any transient fault or lost connection. A create
+  or update that failed on the server may have been partly applied, and
+  retrying it could create duplicates, e.g. of creatives, which needn't have
+  unique names. So writes are only retried when DFP turned them away for
+  quota, or when the connection was never made.
+
+  Args:
+    error (Exception): what the call raised
+    write (bool): whether the call creates or changes objects
+  Returns:
+    a boolean
+  """
+  if isinstance(error, errors.GoogleAdsServerFault):
+    transient_errors = WRITE_TRANSIENT_ERRORS if write else TRANSIENT_ERRORS
+    error_strings = get_error_strings(error)
+    return bool(error_strings) and all(error_string in transient_errors
+      for error_string in error_strings)
+  if isinstance(error, requests.exceptions.ConnectTimeout):
+    return True
+  if write:
+    return False
+  if isinstance(error, zeep.exceptions.TransportError):
+    return error.status_code >= 500
+  return isinstance(error, (requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout))
+
+
+class RetryPolicy(object):
+  """
+  Retries transient failures with capped exponential backoff and full
+  jitter. All calls share a budget of retries, so a run that keeps failing
+  gives up instead of retrying forever.
+  """
+
+  def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS,
+    base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY,
+    budget=DEFAULT_BUDGET):
+    """
+    Args:
+      max_attempts (int): the most times to try one call
+      base_delay (float): the longest delay, in seconds, before the first
+        retry. It doubles with every retry.
+      max_delay (float): the longest delay before any retry
+      budget (int): the most retries across all calls
+    """
+    self.max_attempts = max(1, max_attempts)
+    self.base_delay = base_delay
+    self.max_delay = max_delay
+    self.budget = budget
+    self.retries = []
+    self._lock = threading.Lock()
+
+  def get_delay(self, attempt):
+    """
+    Returns a random delay before retrying after failed attempt `attempt`.
+    """
+    return random.uniform(0, min(self.max_delay,
+      self.base_delay * 2 ** (attempt - 1)))
+
+  def _take_retry(self, record):
+    with self._lock:
+      if len(self.retries) >= self.budget:
+        return False
+      self.retries.append(record)
+      return True
+
+  def call(self, func, service_name, method_name, *args, **kwargs):
+    """
+    Calls a DFP service method, retrying transient failures.
+
+    Args:
+      func (function): the service method
+      service_name (str): the name of the service, for the retry log
+      method_name (str): the name of the method
+      args: positional arguments for `func`
+      kwargs: keyword arguments for `func`
+    Returns:
+      what `func` returns
+    """
+    # PublisherQueryLanguageService.select only reads.
+    write = not method_name.startswith(('get', 'select'))
+    attempt = 1
+    while True:
+      try:
+        return func(*args, **kwargs)
+      except Exception as error:
+        if attempt >= self.max_attempts or not is_transient(error, write):
+          raise
+        delay = self.get_delay(attempt)
+        record = RetryRecord(service_name, method_name, attempt, delay,
+          str(error))
+        if not self._take_retry(record):
+          logger.error(u'Not retrying {service}.{method}: the budget of '
+            '{budget} retries is spent.'.format(service=service_name,
+              method=method_name, budget=self.budget))
+          raise
+        logger.warning(u'{service}.{method} failed on attempt {attempt} '
+          '({error}). Retrying in {delay:.1f}s.'.format(service=service_name,
+            method=method_name, attempt=attempt, error=error, delay=delay))
+        time.sleep(delay)
+        attempt += 1
+
+  def summary(self):
+    """
+    Returns:
+      a string counting the retries by service method
+    """
+    with self._lock:
+      counts = collections.Counter('{0}.{1}'.format(record.service,
+        record.method) for record in self.retries)
+    return u'{total} DFP calls retried: {calls}.'.format(
+      total=sum(counts.values()), calls=', '.join('{0} x{1}'.format(call,
+        count) for call, count in sorted(counts.items())))
+
+
+class RetryingService(object):
+  """
+  Wraps a DFP service proxy so every call follows a retry policy.
+  """
+
+  def __init__(self, service, service_name, policy):
+    """
+    Args:
+      service: a DFP service proxy
+      service_name (str): the name of the DFP service
+      policy (RetryPolicy)
+    """
+    self.service = service
+    self.service_name = service_name
+    self.policy = policy
+
+  def __getattr__(self, name):
+    attribute = getattr(self.service, name)
+    if name.startswith('_') or not callable(attribute):
+      return attribute
+
+    def call(*args, **kwargs):
+      return self.policy.call(attribute, self.service_name, name, *args,
+        **kwargs)
+    return call
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def get_policy():
+  """
+  Returns the retry policy of this run, configured by `DFP_RETRY_MAX_ATTEMPTS`,
+  `DFP_RETRY_BASE_DELAY`, `DFP_RETRY_MAX_DELAY` and `DFP_RETRY_BUDGET`.
+
+  Returns:
+    a RetryPolicy
+  """
+  global _policy
+  with _policy_lock:
+    if _policy is None:
+      _policy = RetryPolicy(
+        getattr(settings, 'DFP_RETRY_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS),
+        getattr(settings, 'DFP_RETRY_BASE_DELAY', DEFAULT_BASE_DELAY),
+        getattr(settings, 'DFP_RETRY_MAX_DELAY', DEFAULT_MAX_DELAY),
+        getattr(settings, 'DFP_RETRY_BUDGET', DEFAULT_BUDGET))
+    return _policy
+
+def reset():
+  """
+  Discards the retry policy, with its budget and log.
+
+  Returns:
+    None
+  """
+  global _policy
+  with _policy_lock:
+    _policy = None
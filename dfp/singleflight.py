@@ -0,0 +1,65 @@
+
+import threading
+
+
+class _Flight(object):
+  """
+  A call in progress, and its outcome once it is done.
+  """
+
+  def __init__(self):
+    self.done = threading.Event()
+    self.result = None
+    self.error = None
+
+
+class SingleFlight(object):
+  """
+  Coalesces identical calls: while a call for a key is in progress, other
+  callers with the same key wait for it and share its result (or its
+  exception) rather than making the call again.
+  """
+
+  def __init__(self):
+    # The number of calls made, and the number that shared another's.
+    self.calls = 0
+    self.shared = 0
+    self._flights = {}
+    self._lock = threading.Lock()
+
+  def call(self, key, func):
+    """
+    Calls `func`, unless a call for `key` is already in progress, in which
+    case waits for that one.
+
+    Args:
+      key: identifies identical calls, e.g. ('Users', 'a@b.com')
+      func (function): makes the call, taking no arguments
+    Returns:
+      what `func` returns
+    """
+    with self._lock:
+      flight = self._flights.get(key)
+      leader = flight is None
+      if leader:
+        flight = self._flights[key] = _Flight()
+        self.calls += 1
+      else:
+        self.shared += 1
+
+    if not leader:
+      flight.done.wait()
+      if flight.error is not None:
+        raise flight.error
+      return flight.result
+
+    try:
+      flight.result = func()
+      return flight.result
+    except Exception as error:
+      flight.error = error
+      raise
+    finally:
+      with self._lock:
+        del self._flights[key]
+      flight.done.set()
@@ -0,0 +1,282 @@
+
+import datetime
+import decimal
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from googleads import ad_manager
+import zeep.helpers
+
+import settings
+from dfp.client import get_client, get_service, register_reset_hook
+from dfp.paginator import paginate
+
+
+logger = logging.getLogger(__name__)
+
+# The objects the snapshot holds: the service and method that fetch them,
+# and whether the API can filter them on lastModifiedDateTime.
+ENTITIES = {
+  'AdUnits': ('InventoryService', 'getAdUnitsByStatement', True),
+  'Companies': ('CompanyService', 'getCompaniesByStatement', True),
+  'CustomTargetingKeys': ('CustomTargetingService',
+    'getCustomTargetingKeysByStatement', False),
+  'Placements': ('PlacementService', 'getPlacementsByStatement', True),
+  'Users': ('UserService', 'getUsersByStatement', False),
+}
+
+# The object fields the snapshot can look objects up by.
+LOOKUP_FIELDS = ('id', 'name', 'email')
+
+DEFAULT_MAX_AGE = 3600
+
+_SCHEMA = """
+  CREATE TABLE IF NOT EXISTS objects (
+    network_code TEXT NOT NULL,
+    entity TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT,
+    email TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (network_code, entity, id)
+  );
+  CREATE INDEX IF NOT EXISTS objects_name
+    ON objects (network_code, entity, name);
+  CREATE INDEX IF NOT EXISTS objects_email
+    ON objects (network_code, entity, email);
+  CREATE TABLE IF NOT EXISTS refreshes (
+    network_code TEXT NOT NULL,
+    entity TEXT NOT NULL,
+    refreshed_at REAL NOT NULL,
+    last_modified TEXT,
+    PRIMARY KEY (network_code, entity)
+  );
+"""
+
+
+def _to_json(value):
+  if isinstance(value, (datetime.date, datetime.datetime)):
+    return value.isoformat()
+  if isinstance(value, decimal.Decimal):
+    return float(value)
+  raise TypeError(u'Cannot store a {0}.'.format(type(value).__name__))
+
+def _to_date_time(value):
+  """
+  Returns a lastModifiedDateTime as a DFP DateTime dict.
+  """
+  if isinstance(value, datetime.datetime):
+    return {
+      'date': {'year': value.year, 'month': value.month, 'day': value.day},
+      'hour': value.hour,
+      'minute': value.minute,
+      'second': value.second,
+      'timeZoneId': 'UTC',
+    }
+  return value
+
+def _date_time_key(date_time):
+  return (date_time['date']['year'], date_time['date']['month'],
+    date_time['date']['day'], date_time['hour'], date_time['minute'],
+    date_time['second'])
+
+
+class Snapshot(object):
+  """
+  A local SQLite copy of the users, companies, placements, ad units and
+  targeting keys of DFP networks, so runs can look them up by name without a
+  request. Each type of object is refreshed when its copy is older than
+  `max_age` seconds: incrementally, with a lastModifiedDateTime filter, where
+  the API supports one, and in full otherwise.
+  """
+
+  def __init__(self, path, max_age=DEFAULT_MAX_AGE):
+    """
+    Args:
+      path (str): the path of the SQLite database
+      max_age (float): seconds after which a copy is refreshed
+    """
+    self.path = os.path.expanduser(path)
+    self.max_age = max_age
+    directory = os.path.dirname(os.path.abspath(self.path))
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+    self._connection = sqlite3.connect(self.path, check_same_thread=False)
+    self._connection.executescript(_SCHEMA)
+    self._lock = threading.RLock()
+
+  def close(self):
+    with self._lock:
+      self._connection.close()
+
+  def _store(self, network_code, entity, objects):
+    rows = []
+    last_modified = None
+    for obj in objects:
+      obj = zeep.helpers.serialize_object(obj, target_cls=dict)
+      if obj.get('lastModifiedDateTime'):
+        obj['lastModifiedDateTime'] = _to_date_time(
+          obj['lastModifiedDateTime'])
+        if (last_modified is None or _date_time_key(obj['lastModifiedDateTime'])
+          > _date_time_key(last_modified)):
+          last_modified = obj['lastModifiedDateTime']
+      rows.append((network_code, entity, str(obj['id']), obj.get('name'),
+        obj.get('email'), json.dumps(obj, default=_to_json)))
+
+    self._connection.executemany('INSERT OR REPLACE INTO objects '
+      '(network_code, entity, id, name, email, data) '
+      'VALUES (?, ?, ?, ?, ?, ?)', rows)
+    return last_modified
+
+  def _fetch(self, entity, since=None):
+    service_name, method_name, _ = ENTITIES[entity]
+    query_method = getattr(get_service(service_name), method_name)
+
+    where = ''
+    values = None
+    if since is not None:
+      # Objects modified in the same second as the last refresh are fetched
+      # again, which is harmless.
+      where = 'WHERE lastModifiedDateTime >= :since '
+      values = [{'key': 'since',
+        'value': {'xsi_type': 'DateTimeValue', 'value': since}}]
+
+    statement = ad_manager.FilterStatement(where + 'ORDER BY id ASC', values)
+    return paginate(query_method, statement)
+
+  def refresh(self, network_code, entity, full=False):
+    """
+    Updates the copy of one type of object from DFP.
+
+    Args:
+      network_code (str)
+      entity (str): the object type, one of `ENTITIES`
+      full (bool): whether to fetch every object even if a filter on
+        lastModifiedDateTime is possible
+    Returns:
+      None
+    """
+    start_time = time.time()
+    with self._lock:
+      row = self._connection.execute('SELECT last_modified FROM refreshes '
+        'WHERE network_code = ? AND entity = ?',
+        (network_code, entity)).fetchone()
+      since = None
+      if not full and ENTITIES[entity][2] and row and row[0]:
+        since = json.loads(row[0])
+
+      objects = list(self._fetch(entity, since))
+      with self._connection:
+        if since is None:
+          self._connection.execute('DELETE FROM objects WHERE network_code = ? '
+            'AND entity = ?', (network_code, entity))
+        last_modified = self._store(network_code, entity, objects)
+        if last_modified is None and since is not None:
+          last_modified = since
+        self._connection.execute('INSERT OR REPLACE INTO refreshes '
+          '(network_code, entity, refreshed_at, last_modified) '
+          'VALUES (?, ?, ?, ?)', (network_code, entity, time.time(),
+            json.dumps(last_modified) if last_modified else None))
+
+    logger.info(u'Refreshed the {kind} snapshot of {entity}: {count} objects '
+      'in {seconds:.2f}s.'.format(kind='full' if since is None else
+        'incremental', entity=entity, count=len(objects),
+        seconds=time.time() - start_time))
+
+  def ensure_fresh(self, network_code, entity):
+    """
+    Refreshes the copy of one type of object if it is older than `max_age`.
+
+    Args:
+      network_code (str)
+      entity (str): the object type, one of `ENTITIES`
+    Returns:
+      None
+    """
+    with self._lock:
+      row = self._connection.execute('SELECT refreshed_at FROM refreshes '
+        'WHERE network_code = ? AND entity = ?',
+        (network_code, entity)).fetchone()
+      if row is None or time.time() - row[0] > self.max_age:
+        self.refresh(network_code, entity)
+
+  def find(self, network_code, entity, field, value):
+    """
+    Returns the objects of a type whose `field` equals `value`, after
+    making sure the copy is fresh.
+
+    Args:
+      network_code (str)
+      entity (str): the object type, one of `ENTITIES`
+      field (str): one of `LOOKUP_FIELDS`
+      value: the value to match
+    Returns:
+      an array of object dicts
+    """
+    if field not in LOOKUP_FIELDS:
+      raise ValueError(u'Cannot look objects up by {0}.'.format(field))
+    self.ensure_fresh(network_code, entity)
+    with self._lock:
+      rows = self._connection.execute('SELECT data FROM objects WHERE '
+        'network_code = ? AND entity = ? AND {0} = ? ORDER BY id'.format(field),
+        (network_code, entity, str(value))).fetchall()
+    return [json.loads(row[0]) for row in rows]
+
+  def find_one(self, entity, field, value):
+    """
+    Returns the only object of a type in the current network whose `field`
+    equals `value`.
+
+    Args:
+      entity (str): the object type, one of `ENTITIES`
+      field (str): one of `LOOKUP_FIELDS`
+      value: the value to match
+    Returns:
+      an object dict, or None if there is no such object or more than one
+    """
+    objects = self.find(str(get_client().network_code), entity, field, value)
+    if len(objects) == 1:
+      return objects[0]
+    return None
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot():
+  """
+  Returns the snapshot configured by `DFP_SNAPSHOT_FILE` and
+  `DFP_SNAPSHOT_MAX_AGE`.
+
+  Returns:
+    a Snapshot, or None if `DFP_SNAPSHOT_FILE` is not set
+  """
+  global _snapshot
+  path = getattr(settings, 'DFP_SNAPSHOT_FILE', None)
+  if not path:
+    return None
+  with _snapshot_lock:
+    if _snapshot is None or _snapshot.path != os.path.expanduser(path):
+      _snapshot = Snapshot(path,
+        getattr(settings, 'DFP_SNAPSHOT_MAX_AGE', DEFAULT_MAX_AGE))
+    return _snapshot
+
+def reset():
+  """
+  Closes the snapshot database.
+
+  Returns:
+    None
+  """
+  global _snapshot
+  with _snapshot_lock:
+    if _snapshot is not None:
+      _snapshot.close()
+    _snapshot = None
+
+register_reset_hook(reset)
@@ -0,0 +1,197 @@
+
+import datetime
+import json
+import logging
+import os
+import stat
+import tempfile
+
+import googleads.common
+import googleads.oauth2
+import yaml
+from googleads import ad_manager
+
+
+logger = logging.getLogger(__name__)
+
+# Cached tokens are only reused while they have at least this many seconds
+# left, so a request never goes out with a token about to expire.
+EXPIRY_MARGIN_SECONDS = 300
+
+_EXPIRY_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+class TokenCache(object):
+  """
+  A JSON file of OAuth2 access tokens, keyed by service account, scope and
+  delegated user. The file is only readable by its owner.
+  """
+
+  def __init__(self, path):
+    """
+    Args:
+      path (str): the path to the token cache file
+    """
+    self.path = os.path.expanduser(path)
+
+  def _read(self):
+    try:
+      if os.name == 'posix':
+        mode = os.stat(self.path).st_mode
+        if mode & (stat.S_IRWXG | stat.S_IRWXO):
+          logger.warning(u'Ignoring OAuth token cache "{path}" because other '
+            'users can access it.'.format(path=self.path))
+          return {}
+      with open(self.path, 'r') as cache_file:
+        data = json.load(cache_file)
+    except (IOError, OSError, ValueError):
+      return {}
+    return data if isinstance(data, dict) else {}
+
+  def get(self, key):
+    """
+    Gets a cached token that is not about to expire.
+
+    Args:
+      key (str): the cache key
+    Returns:
+      a tuple of (token, expiry datetime in UTC), or None
+    """
+    entry = self._read().get(key)
+    try:
+      token = entry['token']
+      expiry = datetime.datetime.strptime(entry['expiry'], _EXPIRY_FORMAT)
+    except (KeyError, TypeError, ValueError):
+      return None
+
+    margin = datetime.timedelta(seconds=EXPIRY_MARGIN_SECONDS)
+    if not token or expiry - margin <= datetime.datetime.utcnow():
+      return None
+    return token, expiry
+
+  def set(self, key, token, expiry):
+    """
+    Stores a token. The file is replaced atomically and created with
+    owner-only permissions.
+
+    Args:
+      key (str): the cache key
+      token (str): the access token
+      expiry (datetime): when the token expires, in UTC
+    Returns:
+      None
+    """
+    data = self._read()
+    data[key] = {
+      'token': token,
+      'expiry': expiry.strftime(_EXPIRY_FORMAT),
+    }
+
+    directory = os.path.dirname(os.path.abspath(self.path))
+    if not os.path.isdir(directory):
+      os.makedirs(directory, mode=0o700)
+
+    # mkstemp creates the file with mode 0600.
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.token-cache-')
+    try:
+      with os.fdopen(fd, 'w') as temp_file:
+        json.dump(data, temp_file)
+      os.replace(temp_path, self.path)
+    except (IOError, OSError):
+      logger.warning(u'Could not write OAuth token cache "{path}".'.format(
+        path=self.path))
+      if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+  def clear(self):
+    """
+    Deletes the token cache file.
+
+    Returns:
+      None
+    """
+    if os.path.exists(self.path):
+      os.remove(self.path)
+
+
+class CachedServiceAccountClient(googleads.oauth2.GoogleServiceAccountClient):
+  """
+  A service account OAuth2 client that reuses access tokens from a
+  `TokenCache` and only mints a new token when the cached one is missing,
+  stale or corrupt.
+  """
+
+  def __init__(self, key_file, scope, sub=None, proxy_config=None,
+    token_cache=None):
+    """
+    Args:
+      key_file (str): the path to the service account JSON key file
+      scope (str): the OAuth2 scope
+      sub (str): the email of a user account to impersonate
+      proxy_config (googleads.common.ProxyConfig)
+      token_cache (TokenCache)
+    """
+    self.token_cache = token_cache
+    self._scope = scope
+    self._sub = sub
+    super(CachedServiceAccountClient, self).__init__(key_file, scope, sub=sub,
+      proxy_config=proxy_config)
+
+  def _cache_key(self):
+    return '{0}|{1}|{2}'.format(self.creds.service_account_email, self._scope,
+      self._sub or '')
+
+  def Refresh(self):
+    if self.token_cache is not None:
+      cached = self.token_cache.get(self._cache_key())
+      if cached is not None:
+        self.creds.token, self.creds.expiry = cached
+        return
+
+    super(CachedServiceAccountClient, self).Refresh()
+
+    if self.token_cache is not None and self.creds.expiry is not None:
+      self.token_cache.set(self._cache_key(), self.creds.token,
+        self.creds.expiry)
+
+
+def load_client(yaml_file, token_cache):
+  """
+  Loads a DFP client from a googleads YAML file, using `token_cache` for the
+  service account's access tokens.
+
+  Args:
+    yaml_file (str): the path to the googleads YAML file
+    token_cache (TokenCache)
+  Returns:
+    an AdManagerClient, or None if the YAML file does not configure a
+      service account
+  """
+  with open(os.path.expanduser(yaml_file), 'r') as handle:
+    data = yaml.safe_load(handle) or {}
+
+  product_data = data.get('ad_manager') or {}
+  if 'path_to_private_key_file' not in product_data:
+    return None
+
+  proxy_config_data = data.get('proxy_config') or {}
+  proxy_config = googleads.common.ProxyConfig(
+    http_proxy=proxy_config_data.get('http'),
+    https_proxy=proxy_config_data.get('https'),
+    cafile=proxy_config_data.get('cafile'),
+    disable_certificate_validation=proxy_config_data.get(
+      'disable_certificate_validation', False))
+
+  oauth2_client = CachedServiceAccountClient(
+    product_data['path_to_private_key_file'],
+    googleads.oauth2.GetAPIScope('ad_manager'),
+    sub=product_data.get('delegated_account'),
+    proxy_config=proxy_config,
+    token_cache=token_cache)
+
+  return ad_manager.AdManagerClient(oauth2_client,
+    product_data['application_name'],
+    network_code=product_data.get('network_code'),
+    proxy_config=proxy_config,
+    custom_http_headers=data.get('custom_http_headers'),
+    enable_compression=data.get('enable_compression', False))
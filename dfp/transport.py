@@ -0,0 +1,213 @@
+
+import gzip
+import threading
+
+import requests
+import requests.adapters
+
+import settings
+
+
+# Defaults for the transport settings in settings.py.
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 600
+
+
+class TransferStats(object):
+  """
+  Counts the bytes of DFP requests and responses, both before compression
+  ("body") and as sent over the network ("wire").
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.requests = 0
+    self.request_body_bytes = 0
+    self.request_wire_bytes = 0
+    self.response_body_bytes = 0
+    self.response_wire_bytes = 0
+
+  def record(self, request_body_bytes, request_wire_bytes, response_body_bytes,
+    response_wire_bytes):
+    with self._lock:
+      self.requests += 1
+      self.request_body_bytes += request_body_bytes
+      self.request_wire_bytes += request_wire_bytes
+      self.response_body_bytes += response_body_bytes
+      self.response_wire_bytes += response_wire_bytes
+
+  def add(self, other):
+    """
+    Adds the counts of another TransferStats to this one.
+
+    Args:
+      other (TransferStats)
+    Returns:
+      None
+    """
+    with self._lock:
+      self.requests += other.requests
+      self.request_body_bytes += other.request_body_bytes
+      self.request_wire_bytes += other.request_wire_bytes
+      self.response_body_bytes += other.response_body_bytes
+      self.response_wire_bytes += other.response_wire_bytes
+
+  def summary(self):
+    """
+    Returns:
+      a string describing the bytes transferred and saved by compression
+    """
+    body_bytes = self.request_body_bytes + self.response_body_bytes
+    wire_bytes = self.request_wire_bytes + self.response_wire_bytes
+    saved = 1 - float(wire_bytes) / body_bytes if body_bytes else 0
+    return (u'{requests} DFP requests: sent {request_wire} of {request_body} '
+      'bytes, received {response_wire} of {response_body} bytes '
+      '({saved:.0%} saved by compression).'.format(
+        requests=self.requests,
+        request_wire=self.request_wire_bytes,
+        request_body=self.request_body_bytes,
+        response_wire=self.response_wire_bytes,
+        response_body=self.response_body_bytes,
+        saved=saved))
+
+
+class DFPSession(requests.Session):
+  """
+  A requests session that can gzip request bodies and counts the bytes it
+  transfers.
+  """
+
+  def __init__(self, compress_requests=False):
+    """
+    Args:
+      compress_requests (bool): whether to gzip request bodies
+    """
+    super(DFPSession, self).__init__()
+    self.compress_requests = compress_requests
+    self.stats = TransferStats()
+
+  def request(self, method, url, *args, **kwargs):
+    data = kwargs.get('data')
+    if isinstance(data, str):
+      data = data.encode('utf-8')
+    request_body_bytes = len(data) if isinstance(data, bytes) else 0
+    request_wire_bytes = request_body_bytes
+
+    if self.compress_requests and method.upper() == 'POST' and data:
+      data = gzip.compress(data)
+      headers = dict(kwargs.get('headers') or {})
+      headers['Content-Encoding'] = 'gzip'
+      kwargs['data'] = data
+      kwargs['headers'] = headers
+      request_wire_bytes = len(data)
+
+    response = super(DFPSession, self).request(method, url, *args, **kwargs)
+
+    # The raw response counts the (possibly compressed) bytes it read.
+    response_body_bytes = len(response.content)
+    try:
+      response_wire_bytes = int(response.raw.tell())
+    except (AttributeError, TypeError, ValueError):
+      response_wire_bytes = response_body_bytes
+    self.stats.record(request_body_bytes, request_wire_bytes,
+      response_body_bytes, response_wire_bytes or response_body_bytes)
+
+    return response
+
+
+def get_max_concurrency():
+  """
+  Returns the number of DFP calls we allow in flight at once. This also
+  sizes the HTTP connection pool.
+
+  Returns:
+    an integer
+  """
+  return max(1, int(getattr(settings, 'DFP_MAX_CONCURRENCY',
+    DEFAULT_MAX_CONCURRENCY) or 1))
+
+def get_timeouts():
+  """
+  Returns the per-call timeouts, in seconds.
+
+  Returns:
+    a tuple of (connect timeout, read timeout)
+  """
+  return (
+    getattr(settings, 'DFP_HTTP_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT),
+    getattr(settings, 'DFP_HTTP_READ_TIMEOUT', DEFAULT_READ_TIMEOUT),
+  )
+
+def create_session(proxy_config=None):
+  """
+  Creates an HTTP session whose keep-alive connection pool holds one
+  connection per concurrent DFP call. When every connection is busy, a call
+  waits for one instead of opening a connection the pool would discard.
+  Request bodies are gzipped if `DFP_GZIP_REQUESTS` is set.
+
+  Args:
+    proxy_config (googleads.common.ProxyConfig)
+  Returns:
+    a DFPSession
+  """
+  pool_size = get_max_concurrency()
+  adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,
+    pool_maxsize=pool_size, pool_block=True)
+
+  session = DFPSession(
+    compress_requests=getattr(settings, 'DFP_GZIP_REQUESTS', False))
+  session.mount('https://', adapter)
+  session.mount('http://', adapter)
+  if proxy_config is not None:
+    session.proxies = dict(proxy_config.proxies)
+    if proxy_config.disable_certificate_validation:
+      session.verify = False
+    elif proxy_config.cafile:
+      session.verify = proxy_config.cafile
+  return session
+
+def attach_session(service, session):
+  """
+  Makes a DFP service proxy send its calls through `session`, with the
+  configured connect and read timeouts.
+
+  Args:
+    service: a DFP service proxy
+    session (requests.Session)
+  Returns:
+    None
+  """
+  zeep_client = getattr(service, 'zeep_client', None)
+  if zeep_client is None:
+    return
+
+  transport = zeep_client.transport
+  if transport.session is not session:
+    session.headers.update(transport.session.headers)
+    if getattr(transport, '_close_session', False):
+      transport.session.close()
+    transport.session = session
+
+  # The session is shared, so the transport must never close it.
+  transport._close_session = False
+  transport.operation_timeout = get_timeouts()
+
+def enable_response_compression(client):
+  """
+  Asks DFP to gzip its responses to `client`, which requests decompresses.
+  This does the same as `enable_compression: true` in the googleads YAML
+  file.
+
+  Args:
+    client (AdManagerClient)
+  Returns:
+    None
+  """
+  header_handler = getattr(client, '_header_handler', None)
+  if header_handler is None or header_handler.enable_compression is True:
+    return
+  header_handler.enable_compression = True
+  # DFP only compresses responses for applications that declare "gzip" in
+  # their name.
+  client.application_name = '%s (gzip)' % client.application_name
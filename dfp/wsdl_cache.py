@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+import argparse
+import hashlib
+import logging
+import os
+import re
+import shutil
+import sys
+
+import zeep
+import zeep.cache
+import zeep.transports
+from googleads import ad_manager
+
+import settings
+import dfp.client
+
+
+logger = logging.getLogger(__name__)
+
+# The DFP services this project uses, which `warm` downloads by default.
+SERVICES = [
+  'CompanyService',
+  'CreativeService',
+  'CustomTargetingService',
+  'InventoryService',
+  'LineItemCreativeAssociationService',
+  'LineItemService',
+  'OrderService',
+  'PlacementService',
+  'UserService',
+]
+
+_SERVICE_URL_PATTERN = re.compile(r'/apis/ads/publisher/(v\d+)/(\w+)')
+
+# The directory of documents that aren't tied to a DFP service, such as
+# shared XSDs.
+_OTHER = 'other'
+
+
+class WsdlCache(zeep.cache.Base):
+  """
+  A zeep cache that stores WSDL and XSD documents on disk, one directory
+  per API version. A published API version never changes, so entries
+  don't expire; clear the cache to force a fresh download.
+  """
+
+  def __init__(self, directory):
+    """
+    Args:
+      directory (str): the root directory of the cache
+    """
+    self.directory = os.path.expanduser(directory)
+
+  def _path(self, url):
+    match = _SERVICE_URL_PATTERN.search(url)
+    if match:
+      version, service_name = match.groups()
+    else:
+      version, service_name = _OTHER, 'document'
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(self.directory, version,
+      '{0}-{1}.xml'.format(service_name, digest))
+
+  def add(self, url, content):
+    path = self._path(url)
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+    if not isinstance(content, bytes):
+      content = content.encode('utf-8')
+
+    # Write to a temporary file first so a concurrent reader never sees a
+    # partial document.
+    temp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'wb') as cache_file:
+      cache_file.write(content)
+    os.replace(temp_path, path)
+
+  def get(self, url):
+    try:
+      with open(self._path(url), 'rb') as cache_file:
+        return cache_file.read()
+    except (IOError, OSError):
+      return None
+
+  def clear(self, version=None):
+    """
+    Deletes cached documents.
+
+    Args:
+      version (str): only delete documents for this API version, and those
+        not tied to a service, which the version may have imported
+    Returns:
+      None
+    """
+    paths = [self.directory]
+    if version is not None:
+      paths = [os.path.join(self.directory, version),
+        os.path.join(self.directory, _OTHER)]
+    for path in paths:
+      if os.path.isdir(path):
+        shutil.rmtree(path)
+
+  def warm(self, services=SERVICES, version=None):
+    """
+    Downloads and caches the documents of DFP services. WSDLs are public,
+    so this doesn't need credentials.
+
+    Args:
+      services (arr): an array of DFP service names
+      version (str): the DFP API version. Defaults to the version this
+        project uses.
+    Returns:
+      None
+    """
+    if version is None:
+      version = dfp.client.API_VERSION
+
+    transport = zeep.transports.Transport(cache=self)
+    for service_name in services:
+      url = ad_manager.AdManagerClient._SOAP_SERVICE_FORMAT % (
+        ad_manager.DEFAULT_ENDPOINT, version, service_name)
+      zeep.Client(url, transport=transport)
+      logger.info(u'Cached {service} for {version}.'.format(
+        service=service_name, version=version))
+
+
+def get_cache():
+  """
+  Returns the WSDL cache configured in settings.
+
+  Returns:
+    a WsdlCache, or None if `DFP_WSDL_CACHE_DIR` is not set
+  """
+  directory = getattr(settings, 'DFP_WSDL_CACHE_DIR', None)
+  if not directory:
+    return None
+  return WsdlCache(directory)
+
+def main(argv=None):
+  """
+  Pre-warms or clears the WSDL cache.
+
+  Returns:
+    None
+  """
+  parser = argparse.ArgumentParser(prog='python -m dfp.wsdl_cache',
+    description='Manage the on-disk cache of DFP service definitions.')
+  parser.add_argument('command', choices=['warm', 'clear'])
+  parser.add_argument('services', nargs='*', default=SERVICES,
+    help='services to warm (default: all services this project uses)')
+  parser.add_argument('--version', default=None,
+    help='the DFP API version (default: {0} for warm, all for clear)'.format(
+      dfp.client.API_VERSION))
+  args = parser.parse_args(argv)
+
+  cache = get_cache()
+  if cache is None:
+    print('The WSDL cache is disabled. Set DFP_WSDL_CACHE_DIR in settings.py.')
+    return
+
+  if args.command == 'warm':
+    cache.warm(args.services, args.version)
+  else:
+    cache.clear(args.version)
+
+if __name__ == '__main__':
+  logging.basicConfig(stream=sys.stdout, level=logging.INFO,
+    format='%(message)s')
+  main()
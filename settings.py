@@ -21,7 +21,10 @@ DFP_ADVERTISER_NAME = None
 # Names of placements the line items should target.
 DFP_TARGETED_PLACEMENT_NAMES = []
 
-# Names of ad units the line items should target.
+# Names of ad units the line items should target. A name containing a slash,
+# such as 'site/section/leaderboard', that matches no ad unit name is a path
+# in the ad unit hierarchy; use one for a name several ad units share.
+# Resolving a path loads every ad unit in the network once.
 DFP_TARGETED_AD_UNIT_NAMES = []
 
 # Sizes of placements. These are used to set line item and creative sizes.
@@ -74,6 +77,108 @@ DFP_USE_EXISTING_ORDER_IF_EXISTS = False
 # This should be specified in python's format syntax.
 # DFP_LINE_ITEM_FORMAT = u'{bidder_code}: HB ${price:0>5}'
 
+# Optional
+# A file in which to cache OAuth access tokens between runs, so chained
+# invocations don't each mint a new token. Tokens are reused until shortly
+# before they expire. Only used with service account credentials.
+# DFP_OAUTH_TOKEN_CACHE_FILE = os.path.join(os.path.expanduser('~'),
+#   '.dfp-prebid-setup', 'oauth-token.json')
+
+# A directory in which to cache DFP service definitions (WSDLs) per API
+# version, so later runs don't download them again. Pre-warm it with
+# `python -m dfp.wsdl_cache warm` and empty it with
+# `python -m dfp.wsdl_cache clear`. Set to None to use the googleads default
+# one-hour cache.
+DFP_WSDL_CACHE_DIR = os.path.join(os.path.expanduser('~'),
+  '.dfp-prebid-setup', 'wsdl')
+
+# The maximum number of DFP API calls to run at once. This sizes both the one
+# thread pool that runs concurrent calls and the pool of keep-alive HTTP
+# connections shared by all DFP services.
+DFP_MAX_CONCURRENCY = 4
+
+# The number of objects to request per page when listing objects (at most
+# 500), and how many pages to fetch ahead, concurrently, while one is read.
+DFP_PAGE_SIZE = 500
+DFP_PREFETCH_PAGES = 4
+
+# How to page through large listings, such as every value of a targeting key:
+# 'offset' (LIMIT/OFFSET), or 'keyset', which asks for the objects after the
+# last id seen and splits the ids into DFP_MAX_CONCURRENCY ranges fetched at
+# once. Keyset pages cost the same however deep into the listing they are.
+DFP_PAGINATION = 'offset'
+
+# Whether to look up ad units and users with PQL selects of just the columns
+# we need (PublisherQueryLanguageService), rather than fetching whole objects.
+# Placements and advertisers are always fetched whole, and any select DFP
+# rejects falls back to fetching whole objects.
+DFP_PQL_LOOKUPS = False
+
+# How to fetch the hb_bidder and hb_pb values a setup needs: 'names' queries
+# just those values by name, 'all' pages through every value of the key, and
+# 'auto' picks whichever takes fewer requests, e.g. 'names' for the few
+# prices of a low granularity on a key with many thousands of values.
+DFP_TARGETING_VALUE_FETCH = 'auto'
+
+# Lookups of orders, advertisers, users and targeting keys by name are cached
+# in memory. DFP_CACHE_TTLS sets how many seconds to keep found objects of a
+# type ('Orders', 'Companies', 'Users', 'CustomTargetingKeys'); 0 turns
+# caching off for it. Names with no object are kept for at most
+# DFP_CACHE_NEGATIVE_TTL seconds. Creating an object drops its cached lookup.
+DFP_CACHE_MAX_SIZE = 10000
+DFP_CACHE_TTLS = {}
+DFP_CACHE_NEGATIVE_TTL = 60
+
+# Timeouts, in seconds, for connecting to DFP and for waiting on the response
+# to each API call.
+DFP_HTTP_CONNECT_TIMEOUT = 10
+DFP_HTTP_READ_TIMEOUT = 600
+
+# The most DFP API calls per second to make to a network, shared by every
+# call in this process, and the most to make at once after a quiet period
+# (defaults to the rate). Keep these under your network's quota to avoid
+# QuotaError.EXCEEDED_QUOTA faults. Set to None for no limit.
+DFP_REQUESTS_PER_SECOND = None
+DFP_REQUESTS_BURST = None
+
+# Retries of DFP calls that fail for transient reasons, such as
+# QuotaError.EXCEEDED_QUOTA or ServerError.SERVER_ERROR. Each call is tried up
+# to DFP_RETRY_MAX_ATTEMPTS times, waiting a random time of up to
+# DFP_RETRY_BASE_DELAY seconds, doubling per retry up to DFP_RETRY_MAX_DELAY.
+# A run gives up after DFP_RETRY_BUDGET retries in total. Calls that create
+# or change objects are only retried when DFP rejected them for quota or the
+# connection was never made, so retries can't create duplicates.
+DFP_RETRY_MAX_ATTEMPTS = 5
+DFP_RETRY_BASE_DELAY = 1
+DFP_RETRY_MAX_DELAY = 60
+DFP_RETRY_BUDGET = 50
+
+# A local SQLite file holding a copy of the network's users, advertisers,
+# placements, ad units and targeting keys, so they can be looked up by name
+# without a request to DFP. Each type is refreshed when its copy is older
+# than DFP_SNAPSHOT_MAX_AGE seconds: only the objects modified since the last
+# refresh where DFP supports it, everything otherwise. Names missing from the
+# copy are still looked up in DFP. Set to None to always ask DFP.
+DFP_SNAPSHOT_FILE = None
+DFP_SNAPSHOT_MAX_AGE = 3600
+
+# Whether to gzip the SOAP requests we send and to ask DFP to gzip its
+# responses. Line item requests are large and repetitive XML, so both shrink
+# a lot. The bytes saved are logged at the end of a run.
+DFP_GZIP_REQUESTS = False
+DFP_GZIP_RESPONSES = False
+
+# Where DFP calls go: 'soap' (the DFP API), 'memory' (a simulated network in
+# this process, seeded with the user, placements and ad units above, for
+# profiling and load tests), 'record' (the DFP API, saving every call to
+# DFP_RECORDING_FILE) or 'replay' (answers from DFP_RECORDING_FILE). The
+# DFP_BACKEND environment variable overrides this.
+DFP_BACKEND = 'soap'
+DFP_RECORDING_FILE = None
+
+# Seconds each call to the 'memory' backend takes, to simulate round trips.
+DFP_MEMORY_LATENCY = 0
+
 #########################################################################
 # PREBID SETTINGS
 #########################################################################
@@ -1,9 +1,11 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import functools
 import logging
 import os
 import sys
+import time
 from builtins import input
 from pprint import pprint
 from collections import OrderedDict
@@ -11,18 +13,9 @@ from collections import OrderedDict
 from colorama import init
 
 import settings
-import dfp.associate_line_items_and_creatives
-import dfp.create_custom_targeting
-import dfp.create_creatives
-import dfp.create_line_items
-import dfp.create_orders
-import dfp.get_ad_units
-import dfp.get_advertisers
-import dfp.get_custom_targeting
-import dfp.get_placements
-import dfp.get_users
 from dfp.exceptions import (
   BadSettingException,
+  DFPLookupErrors,
   MissingSettingException
 )
 from tasks.price_utils import (
@@ -57,18 +50,50 @@ def setup_partner(user_email, advertiser_name, order_name, placements, ad_units,
   Call all necessary DFP tasks for a new Prebid partner setup.
   """
 
-  # Get the user.
-  user_id = dfp.get_users.get_user_id_by_email(user_email)
-
-  # Get the placement IDs.
-  placement_ids = dfp.get_placements.get_placement_ids_by_name(placements)
-
-  # Get the ad unit IDs.
-  ad_unit_ids = dfp.get_ad_units.get_ad_unit_ids_by_name(ad_units)
-
-  # Get (or potentially create) the advertiser.
-  advertiser_id = dfp.get_advertisers.get_advertiser_id_by_name(
-    advertiser_name)
+  # The DFP modules load the googleads SOAP stack, which is slow to import.
+  # Import them here, rather than at the top of this module, so settings
+  # validation and the confirmation prompt don't wait on it.
+  import dfp.associate_line_items_and_creatives
+  import dfp.cache
+  import dfp.client
+  import dfp.create_creatives
+  import dfp.create_line_items
+  import dfp.create_orders
+  import dfp.get_ad_units
+  import dfp.get_advertisers
+  import dfp.get_placements
+  import dfp.get_users
+  import dfp.rate_limit
+  import dfp.retry
+
+  # The `hb_pb` values the line items will target.
+  price_strs = [num_to_str(micro_amount_to_num(price)) for price in prices]
+
+  # Look up everything the order and line items need. None of these lookups
+  # depends on another, so they run concurrently. The read-only lookups run
+  # first, so a run that fails validation creates nothing.
+  prerequisites = resolve_prerequisites(OrderedDict([
+    ('user', functools.partial(dfp.get_users.get_user_id_by_email,
+      user_email)),
+    ('placements', functools.partial(
+      dfp.get_placements.get_placement_ids_by_name, placements)),
+    ('ad units', functools.partial(dfp.get_ad_units.get_ad_unit_ids_by_name,
+      ad_units)),
+  ]))
+  # These create the advertiser and targeting keys if they don't exist.
+  prerequisites.update(resolve_prerequisites(OrderedDict([
+    ('advertiser', functools.partial(
+      dfp.get_advertisers.get_advertiser_id_by_name, advertiser_name)),
+    ('targeting', functools.partial(get_targeting_keys_and_values,
+      OrderedDict([('hb_bidder', [bidder_code]), ('hb_pb', price_strs)]))),
+  ])))
+  user_id = prerequisites['user']
+  placement_ids = prerequisites['placements']
+  ad_unit_ids = prerequisites['ad units']
+  advertiser_id = prerequisites['advertiser']
+  hb_bidder_key_id, HBBidderValueGetter = prerequisites['targeting'][
+    'hb_bidder']
+  hb_pb_key_id, HBPBValueGetter = prerequisites['targeting']['hb_pb']
 
   # Create the order.
   order_id = dfp.create_orders.create_order(order_name, advertiser_id, user_id)
@@ -78,14 +103,6 @@ def setup_partner(user_email, advertiser_name, order_name, placements, ad_units,
       bidder_code, order_name, advertiser_id, num_creatives, video_ad_type, redirect_url)
   creative_ids = dfp.create_creatives.create_creatives(creative_configs)
 
-  # Get DFP key IDs for line item targeting.
-  hb_bidder_key_id = get_or_create_dfp_targeting_key('hb_bidder')
-  hb_pb_key_id = get_or_create_dfp_targeting_key('hb_pb')
-
-  # Instantiate DFP targeting value ID getters for the targeting keys.
-  HBBidderValueGetter = DFPValueIdGetter('hb_bidder')
-  HBPBValueGetter = DFPValueIdGetter('hb_pb')
-
   # Create line items.
   line_items_config = create_line_item_configs(prices, order_id, placement_ids, ad_unit_ids, bidder_code, sizes,
                                                hb_bidder_key_id, hb_pb_key_id, currency_code, line_item_format,
@@ -97,6 +114,20 @@ def setup_partner(user_email, advertiser_name, order_name, placements, ad_units,
   dfp.associate_line_items_and_creatives.make_licas(line_item_ids,
     creative_ids, size_overrides=sizes)
 
+  transfer_stats = dfp.client.get_transfer_stats()
+  if transfer_stats.requests:
+    logger.info(transfer_stats.summary())
+  for bucket in dfp.rate_limit.get_buckets().values():
+    if bucket.calls:
+      logger.info(bucket.summary())
+  retry_policy = dfp.retry.get_policy()
+  if retry_policy.retries:
+    logger.info(retry_policy.summary())
+  lookup_cache = dfp.cache.get_cache()
+  if (lookup_cache.hits or lookup_cache.negative_hits
+    or lookup_cache.shared):
+    logger.info(lookup_cache.summary())
+
   logger.info("""
 
     Done! Please review your order, line items, and creatives to
@@ -106,33 +137,88 @@ def setup_partner(user_email, advertiser_name, order_name, placements, ad_units,
 
   """)
 
+def resolve_prerequisites(lookups):
+  """
+  Runs independent DFP lookups concurrently on the shared thread pool
+  (`dfp.executor`), at most `DFP_MAX_CONCURRENCY` at a time, so they take as
+  long as the slowest one rather than all of them together. Every lookup
+  runs even if another fails.
+
+  Args:
+    lookups (OrderedDict): functions that take no arguments, by name
+  Returns:
+    an OrderedDict: what each function returned, by name
+  Raises:
+    the exception of the failed lookup if only one fails, or a
+    DFPLookupErrors with every exception if more than one does
+  """
+  import dfp.executor
+
+  start_time = time.time()
+  futures = OrderedDict((name, dfp.executor.submit(lookup))
+    for name, lookup in lookups.items())
+
+  results = OrderedDict()
+  errors = OrderedDict()
+  for name, future in futures.items():
+    error = future.exception()
+    if error is None:
+      results[name] = future.result()
+    else:
+      errors[name] = error
+
+  logger.info(u'Resolved {count} prerequisites in {seconds:.2f}s.'.format(
+    count=len(lookups), seconds=time.time() - start_time))
+
+  if len(errors) == 1:
+    raise list(errors.values())[0]
+  elif errors:
+    raise DFPLookupErrors(errors)
+  return results
+
 class DFPValueIdGetter(object):
   """
   A class to bulk fetch DFP values by key and then create new values as needed.
+  Values are indexed by name, and values it creates are added to the index.
   """
 
-  def __init__(self, key_name, *args, **kwargs):
+  def __init__(self, key_name, *args, value_names=None, key_id=None,
+    existing_values=None, **kwargs):
     """
     Args:
       key_name (str): the name of the DFP key
+      value_names (arr): the names of the values that will be needed, so
+        only those may be fetched. Defaults to fetching every value.
+      key_id (int): the ID of the DFP key, if already fetched
+      existing_values (arr): the values of the key, if already fetched
+        (see `get_targeting_keys_and_values`)
     """
+    import dfp.get_custom_targeting
+
     self.key_name = key_name
-    self.key_id = dfp.get_custom_targeting.get_key_id_by_name(key_name)
-    self.existing_values = dfp.get_custom_targeting.get_targeting_by_key_name(
-      key_name)
+    if key_id is None:
+      key_id = dfp.get_custom_targeting.get_key_id_by_name(key_name)
+    self.key_id = key_id
+    if existing_values is None:
+      existing_values = dfp.get_custom_targeting.get_targeting_by_key_name(
+        key_name, value_names)
+    self.existing_values = existing_values
+
+    # Value IDs by value name. If names repeat, the first value wins.
+    self.value_ids = {}
+    for value_obj in reversed(self.existing_values or []):
+      self.value_ids[value_obj['name']] = value_obj['id']
     super(DFPValueIdGetter, self).__init__(*args, **kwargs)
 
   def _get_value_id_from_cache(self, value_name):
-    val_id = None
-    for value_obj in self.existing_values:
-      if value_obj['name'] == value_name:
-        val_id = value_obj['id']
-        break
-    return val_id
+    return self.value_ids.get(value_name)
 
   def _create_value_and_return_id(self, value_name):
-    return dfp.create_custom_targeting.create_targeting_value(value_name,
+    import dfp.create_custom_targeting
+    val_id = dfp.create_custom_targeting.create_targeting_value(value_name,
       self.key_id)
+    self.value_ids[value_name] = val_id
+    return val_id
 
   def get_value_id(self, value_name):
     """
@@ -148,6 +234,34 @@ class DFPValueIdGetter(object):
       val_id = self._create_value_and_return_id(value_name)
     return val_id
 
+  def get_value_ids(self, value_names):
+    """
+    Get the DFP custom value IDs of many values, creating those that don't
+    exist. The missing values are created together, in batches (see
+    `dfp.create_custom_targeting.create_targeting_values`), and each once,
+    however often it is named.
+
+    Args:
+      value_names (arr): the names of the DFP values
+    Returns:
+      an array of integers: the IDs of the DFP values, in the same order
+    """
+    import dfp.create_custom_targeting
+
+    missing = []
+    seen = set()
+    for value_name in value_names:
+      if not self._get_value_id_from_cache(value_name) and value_name not in seen:
+        missing.append(value_name)
+        seen.add(value_name)
+
+    if missing:
+      val_ids = dfp.create_custom_targeting.create_targeting_values(missing,
+        self.key_id)
+      self.value_ids.update(zip(missing, val_ids))
+
+    return [self.value_ids[value_name] for value_name in value_names]
+
 
 def get_or_create_dfp_targeting_key(name):
   """
@@ -158,11 +272,44 @@ def get_or_create_dfp_targeting_key(name):
   Returns:
     an integer: the ID of the targeting key
   """
+  import dfp.create_custom_targeting
+  import dfp.get_custom_targeting
+
   key_id = dfp.get_custom_targeting.get_key_id_by_name(name)
   if key_id is None:
     key_id = dfp.create_custom_targeting.create_targeting_key(name)
   return key_id
 
+def get_targeting_keys_and_values(value_names):
+  """
+  Get or create many custom targeting keys by name, then fetch their values
+  together: one lookup of the keys and one paged query of their values.
+
+  Args:
+    value_names (OrderedDict): the names of the values that will be needed,
+      by key name, or None for every value of a key
+  Returns:
+    an OrderedDict: a tuple of the ID of the targeting key and a
+      DFPValueIdGetter for it, by key name
+  """
+  import dfp.create_custom_targeting
+  import dfp.get_custom_targeting
+
+  key_ids = dfp.get_custom_targeting.get_key_ids_by_name(list(value_names))
+  existing = [name for name in key_ids if key_ids[name] is not None]
+  for name in key_ids:
+    if key_ids[name] is None:
+      key_ids[name] = dfp.create_custom_targeting.create_targeting_key(name)
+
+  # Keys we just created have no values to fetch.
+  key_values = {}
+  if existing:
+    key_values = dfp.get_custom_targeting.get_targeting_by_key_names(
+      existing, value_names, key_ids)
+  return OrderedDict((name, (key_ids[name], DFPValueIdGetter(name,
+    key_id=key_ids[name], existing_values=key_values.get(name) or [])))
+    for name in value_names)
+
 def create_line_item_configs(prices, order_id, placement_ids, ad_unit_ids, bidder_code, sizes, hb_bidder_key_id,
                              hb_pb_key_id, currency_code, line_item_format, HBBidderValueGetter, HBPBValueGetter,
                              video_ad_type):
@@ -185,14 +332,19 @@ def create_line_item_configs(prices, order_id, placement_ids, ad_unit_ids, bidde
   Returns:
     an array of objects: the array of DFP line item configurations
   """
+  import dfp.create_line_items
 
   # The DFP targeting value ID for this `hb_bidder` code.
   hb_bidder_value_id = HBBidderValueGetter.get_value_id(bidder_code)
 
-  line_items_config = []
-  for price in prices:
+  price_strs = [num_to_str(micro_amount_to_num(price)) for price in prices]
+
+  # The DFP targeting value IDs for the `hb_pb` price values.
+  hb_pb_value_ids = HBPBValueGetter.get_value_ids(price_strs)
 
-    price_str = num_to_str(micro_amount_to_num(price))
+  line_items_config = []
+  for price, price_str, hb_pb_value_id in zip(prices, price_strs,
+    hb_pb_value_ids):
 
     # Autogenerate the line item name.
     line_item_name = line_item_format.format(
@@ -200,9 +352,6 @@ def create_line_item_configs(prices, order_id, placement_ids, ad_unit_ids, bidde
       price=price_str
     )
 
-    # The DFP targeting value ID for this `hb_pb` price value.
-    hb_pb_value_id = HBPBValueGetter.get_value_id(price_str)
-
     config = dfp.create_line_items.create_line_item_config(name=line_item_name, order_id=order_id,
                                                            placement_ids=placement_ids, ad_unit_ids=ad_unit_ids,
                                                            cpm_micro_amount=price, sizes=sizes,
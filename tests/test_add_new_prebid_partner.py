@@ -1,11 +1,31 @@
 
+import os
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
 from unittest import TestCase
 
 from mock import MagicMock, patch
 
 import settings
+import dfp.associate_line_items_and_creatives
+import dfp.client
+import dfp.create_creatives
+import dfp.create_custom_targeting
+import dfp.create_line_items
+import dfp.create_orders
+import dfp.get_advertisers
+import dfp.get_custom_targeting
+import dfp.get_placements
+import dfp.get_users
 import tasks.add_new_prebid_partner
-from dfp.exceptions import BadSettingException, MissingSettingException
+from dfp.exceptions import (
+  BadSettingException,
+  DFPLookupErrors,
+  DFPObjectNotFound,
+  MissingSettingException
+)
 from tasks.add_new_prebid_partner import DFPValueIdGetter
 from tasks.price_utils import (
   get_prices_array,
@@ -48,6 +68,10 @@ prices = get_prices_array(price_buckets)
 @patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
 class AddNewPrebidPartnerTests(TestCase):
 
+  def setUp(self):
+    # Each test mocks the DFP client, so never reuse a cached one.
+    dfp.client.reset_clients()
+
   def test_missing_email_setting(self, mock_dfp_client):
     """
     It throws an exception with a missing setting.
@@ -313,8 +337,7 @@ class AddNewPrebidPartnerTests(TestCase):
     self.assertEqual(num_creatives, len(ad_units))
 
   @patch('tasks.add_new_prebid_partner.create_line_item_configs')
-  @patch('tasks.add_new_prebid_partner.DFPValueIdGetter')
-  @patch('tasks.add_new_prebid_partner.get_or_create_dfp_targeting_key')
+  @patch('tasks.add_new_prebid_partner.get_targeting_keys_and_values')
   @patch('dfp.associate_line_items_and_creatives')
   @patch('dfp.create_creatives')
   @patch('dfp.create_line_items')
@@ -324,12 +347,15 @@ class AddNewPrebidPartnerTests(TestCase):
   @patch('dfp.get_users')
   def test_setup_partner(self, mock_get_users, mock_get_placements,
     mock_get_advertisers, mock_create_orders, mock_create_line_items,
-    mock_create_creatives, mock_licas, mock_dfp_client,
-    mock_get_or_create_dfp_targeting_key, mock_dfp_value_id_getter,
-    mock_create_line_item_configs):
+    mock_create_creatives, mock_licas, mock_get_targeting_keys_and_values,
+    mock_create_line_item_configs, mock_dfp_client):
     """
     It calls all expected DFP functions.
     """
+    mock_get_targeting_keys_and_values.return_value = OrderedDict([
+      ('hb_bidder', (999999, MagicMock())),
+      ('hb_pb', (888888, MagicMock())),
+    ])
 
     mock_get_users.get_user_id_by_email = MagicMock(return_value=14523)
     mock_get_placements.get_placement_ids_by_name = MagicMock(
@@ -356,6 +382,103 @@ class AddNewPrebidPartnerTests(TestCase):
     mock_create_line_items.create_line_items.assert_called_once()
     mock_licas.make_licas.assert_called_once()
 
+    # Both keys and their values are fetched together, and only the values
+    # the line items need.
+    value_names = mock_get_targeting_keys_and_values.call_args[0][0]
+    self.assertEqual(list(value_names), ['hb_bidder', 'hb_pb'])
+    self.assertEqual(value_names['hb_bidder'], [bidder_code])
+    self.assertEqual(len(value_names['hb_pb']), len(prices))
+    self.assertEqual(mock_create_line_item_configs.call_args[0][6:8],
+      (999999, 888888))
+
+  @patch('tasks.add_new_prebid_partner.get_targeting_keys_and_values')
+  @patch('dfp.create_orders')
+  @patch('dfp.get_advertisers')
+  @patch('dfp.get_placements')
+  @patch('dfp.get_users')
+  def test_setup_partner_lookup_fails(self, mock_get_users,
+    mock_get_placements, mock_get_advertisers, mock_create_orders,
+    mock_get_targeting_keys_and_values, mock_dfp_client):
+    """
+    It creates nothing if a read-only lookup fails.
+    """
+    mock_get_users.get_user_id_by_email = MagicMock(return_value=14523)
+    mock_get_placements.get_placement_ids_by_name = MagicMock(
+      side_effect=DFPObjectNotFound('No DFP placement found'))
+
+    with self.assertRaises(DFPObjectNotFound):
+      tasks.add_new_prebid_partner.setup_partner(user_email=email,
+        advertiser_name=advertiser, order_name=order, placements=placements,
+        ad_units=[], sizes=sizes, bidder_code=bidder_code, prices=prices,
+        num_creatives=2, currency_code='USD',
+        line_item_format=u'{bidder_code}: HB ${price:0>5}')
+
+    mock_get_advertisers.get_advertiser_id_by_name.assert_not_called()
+    mock_get_targeting_keys_and_values.assert_not_called()
+    mock_create_orders.create_order.assert_not_called()
+
+  @patch('settings.DFP_MAX_CONCURRENCY', 3, create=True)
+  def test_resolve_prerequisites_concurrently(self, mock_dfp_client):
+    """
+    It runs the lookups at the same time and returns results by name.
+    """
+    # Each lookup waits for the others, so this only passes if all three
+    # run at once.
+    barrier = threading.Barrier(3, timeout=5)
+
+    def lookup(value):
+      barrier.wait()
+      return value
+
+    results = tasks.add_new_prebid_partner.resolve_prerequisites(OrderedDict([
+      ('user', lambda: lookup(14523)),
+      ('placements', lambda: lookup([1234567, 9876543])),
+      ('advertiser', lambda: lookup(246810)),
+    ]))
+    self.assertEqual(list(results.items()), [
+      ('user', 14523),
+      ('placements', [1234567, 9876543]),
+      ('advertiser', 246810),
+    ])
+
+  def test_resolve_prerequisites_one_error(self, mock_dfp_client):
+    """
+    It raises the exception of the only failed lookup as it is.
+    """
+    def missing():
+      raise DFPObjectNotFound('No DFP placement found with name Nope')
+
+    with self.assertRaises(DFPObjectNotFound):
+      tasks.add_new_prebid_partner.resolve_prerequisites(OrderedDict([
+        ('user', lambda: 14523),
+        ('placements', missing),
+      ]))
+
+  def test_resolve_prerequisites_many_errors(self, mock_dfp_client):
+    """
+    It runs every lookup and reports all failures together.
+    """
+    def missing_placement():
+      raise DFPObjectNotFound('No DFP placement found with name Nope')
+
+    def missing_user():
+      raise DFPObjectNotFound('No DFP user found with email a@b.com')
+
+    advertiser_lookup = MagicMock(return_value=246810)
+    with self.assertRaises(DFPLookupErrors) as context:
+      tasks.add_new_prebid_partner.resolve_prerequisites(OrderedDict([
+        ('user', missing_user),
+        ('placements', missing_placement),
+        ('advertiser', advertiser_lookup),
+      ]))
+
+    advertiser_lookup.assert_called_once_with()
+    self.assertEqual(list(context.exception.errors), ['user', 'placements'])
+    self.assertIn('No DFP user found with email a@b.com',
+      str(context.exception))
+    self.assertIn('No DFP placement found with name Nope',
+      str(context.exception))
+
   def test_create_line_item_configs(self, mock_dfp_client):
     """
     It creates the expected line item configs.
@@ -368,7 +491,8 @@ class AddNewPrebidPartnerTests(TestCase):
             'height': '90'
         }], hb_bidder_key_id=999999, hb_pb_key_id=888888, currency_code='HUF',
         line_item_format=u'{bidder_code}: HB ${price:0>5}', HBBidderValueGetter=MagicMock(
-            return_value=3434343434), HBPBValueGetter=MagicMock(return_value=5656565656), video_ad_type=False)
+            return_value=3434343434), HBPBValueGetter=MagicMock(**{
+            'get_value_ids.side_effect': lambda names: [5656565656] * len(names)}), video_ad_type=False)
 
     self.assertEqual(len(configs), 3)
 
@@ -399,7 +523,8 @@ class AddNewPrebidPartnerTests(TestCase):
             'height': '480'
         }], hb_bidder_key_id=4, hb_pb_key_id=5, currency_code='HUF',
         line_item_format=u'{bidder_code}: HB ${price:0>5}', HBBidderValueGetter=MagicMock(
-            return_value=6), HBPBValueGetter=MagicMock(return_value=7), video_ad_type=True)
+            return_value=6), HBPBValueGetter=MagicMock(**{
+            'get_value_ids.return_value': [7]}), video_ad_type=True)
 
     self.assertEqual(len(configs), 1)
     self.assertEqual(configs[0]['environmentType'], 'VIDEO_PLAYER')
@@ -436,7 +561,7 @@ class AddNewPrebidPartnerTests(TestCase):
     getter = DFPValueIdGetter('some-key-name')
 
     mock_get_targeting.get_targeting_by_key_name.assert_called_once_with(
-      'some-key-name')
+      'some-key-name', None)
     mock_create_targeting.create_targeting_value.assert_not_called()
 
     # This targeting value already exists.
@@ -447,6 +572,62 @@ class AddNewPrebidPartnerTests(TestCase):
     mock_create_targeting.create_targeting_value.assert_called_once_with(
       '15.00', 987654)
 
+    # Created values are remembered.
+    self.assertEqual(getter.get_value_id('15.00'), 44445555)
+    mock_create_targeting.create_targeting_value.assert_called_once()
+
+  @patch('dfp.create_custom_targeting')
+  @patch('dfp.get_custom_targeting')
+  def test_value_id_getter_get_value_ids(self, mock_get_targeting,
+    mock_create_targeting, mock_dfp_client):
+    """
+    It returns the IDs of many values in order, creating the missing values
+    together and each once.
+    """
+    mock_get_targeting.get_targeting_by_key_name = MagicMock(
+      return_value=[{'id': 100 + index, 'name': '{0:.2f}'.format(index)}
+        for index in range(20000)])
+    mock_get_targeting.get_key_id_by_name = MagicMock(return_value=987654)
+    mock_create_targeting.create_targeting_values = MagicMock(
+      return_value=[44445555, 66667777])
+
+    getter = DFPValueIdGetter('hb_pb')
+    self.assertEqual(
+      getter.get_value_ids(['3.00', '20000.00', '19999.00', '20000.00',
+        '20001.00']),
+      [103, 44445555, 20099, 44445555, 66667777])
+    mock_create_targeting.create_targeting_values.assert_called_once_with(
+      ['20000.00', '20001.00'], 987654)
+    mock_create_targeting.create_targeting_value.assert_not_called()
+
+    # The created values are merged into the index.
+    self.assertEqual(getter.get_value_ids(['20001.00']), [66667777])
+    mock_create_targeting.create_targeting_values.assert_called_once()
+
+  def test_key_looked_up_once(self, mock_dfp_client):
+    """
+    It looks up the hb_pb, hb_adid and hb_bidder keys with one request.
+    """
+    service = mock_dfp_client.return_value.GetService.return_value
+    service.getCustomTargetingKeysByStatement.return_value = {
+      'totalResultSetSize': 3,
+      'results': [{'id': 987654, 'name': 'hb_pb'},
+        {'id': 876543, 'name': 'hb_adid'},
+        {'id': 765432, 'name': 'hb_bidder'}],
+    }
+    service.getCustomTargetingValuesByStatement.return_value = {
+      'totalResultSetSize': 0,
+    }
+
+    keys = tasks.add_new_prebid_partner.get_targeting_keys_and_values(
+      OrderedDict([('hb_pb', ['0.50']), ('hb_adid', None),
+        ('hb_bidder', [bidder_code])]))
+
+    self.assertEqual([(key_id, getter.key_id) for key_id, getter in
+      keys.values()], [(987654, 987654), (876543, 876543), (765432, 765432)])
+    service.getCustomTargetingKeysByStatement.assert_called_once()
+    service.createCustomTargetingKeys.assert_not_called()
+
   @patch('dfp.create_custom_targeting')
   @patch('dfp.get_custom_targeting')
   def test_get_or_create_dfp_targeting_key_does_not_exist(self,
@@ -501,3 +682,75 @@ class AddNewPrebidPartnerTests(TestCase):
     tasks.add_new_prebid_partner.logger.info(u'\xe4')
     tasks.add_new_prebid_partner.logger.info(
       u"""A with umlaut: {my_character}""".format(my_character=u'\xe4'))
+
+
+# Modules that make up the SOAP stack. None of them should load before the
+# user confirms the setup.
+SOAP_STACK_MODULES = ['googleads', 'zeep', 'lxml', 'requests']
+
+# A generous upper bound on the cumulative import time of the task module,
+# in microseconds. It imports in ~20ms without the SOAP stack and ~350ms
+# with it.
+IMPORT_TIME_BUDGET_US = 250000
+
+# Runs the task up to the confirmation prompt and declines it.
+DECLINE_CONFIRMATION_SCRIPT = """
+import sys
+import settings
+import tasks.add_new_prebid_partner as task
+
+settings.DFP_USER_EMAIL_ADDRESS = 'fakeuser@example.com'
+settings.DFP_ADVERTISER_NAME = 'My Advertiser'
+settings.DFP_ORDER_NAME = 'My Cool Order'
+settings.DFP_TARGETED_PLACEMENT_NAMES = ['My Site Leaderboard']
+settings.PREBID_BIDDER_CODE = 'mypartner'
+settings.PREBID_PRICE_BUCKETS = 'dense'
+task.input = lambda prompt: 'n'
+task.main()
+
+print(','.join(sorted(set(name.split('.')[0] for name in sys.modules))))
+"""
+
+class AddNewPrebidPartnerImportTests(TestCase):
+
+  def run_python(self, *args):
+    env = dict(os.environ, DISABLE_LOGGING='true')
+    return subprocess.run([sys.executable] + list(args),
+      cwd=settings.ROOT_DIR, env=env, stdout=subprocess.PIPE,
+      stderr=subprocess.PIPE, universal_newlines=True, check=True)
+
+  def test_import_time(self):
+    """
+    Importing the task must not import the SOAP stack. Uses the
+    `-X importtime` report, which lists every module imported.
+    """
+    result = self.run_python('-X', 'importtime', '-c',
+      'import tasks.add_new_prebid_partner')
+
+    imported = []
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+      if not line.startswith('import time:') or '|' not in line:
+        continue
+      fields = [field.strip() for field in line.split('|')]
+      if not fields[1].isdigit():
+        continue
+      imported.append(fields[2])
+      if fields[2] == 'tasks.add_new_prebid_partner':
+        cumulative_us = int(fields[1])
+
+    self.assertIsNotNone(cumulative_us)
+    self.assertLess(cumulative_us, IMPORT_TIME_BUDGET_US)
+    for module in imported:
+      self.assertNotIn(module.split('.')[0], SOAP_STACK_MODULES)
+
+  def test_confirmation_prompt_without_soap_stack(self):
+    """
+    Validation, price bucket expansion and the summary must not import the
+    SOAP stack.
+    """
+    result = self.run_python('-c', DECLINE_CONFIRMATION_SCRIPT)
+    loaded = result.stdout.strip().splitlines()[-1].split(',')
+    self.assertIn('tasks', loaded)
+    for module in SOAP_STACK_MODULES:
+      self.assertNotIn(module, loaded)
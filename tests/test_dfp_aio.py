@@ -0,0 +1,108 @@
+
+import asyncio
+import threading
+import time
+from unittest import TestCase
+
+from mock import patch
+
+import dfp.aio
+import dfp.associate_line_items_and_creatives
+import dfp.client
+import dfp.create_line_items
+import dfp.executor
+
+
+def created_objects(create_method):
+  return [obj for args, kwargs in create_method.call_args_list
+    for obj in args[0]]
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+class DFPAsyncTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+
+  def test_create_line_items(self, mock_load_from_storage):
+    """
+    Ensure line items are created in batches and IDs keep their order.
+    """
+    service = mock_load_from_storage.return_value.GetService.return_value
+    service.createLineItems.side_effect = lambda line_items: [
+      {'id': line_item['name']} for line_item in line_items]
+    line_items = [{'name': index} for index in range(5)]
+
+    line_item_ids = asyncio.run(dfp.aio.create_line_items(line_items,
+      batch_size=2))
+
+    self.assertEqual(line_item_ids, [0, 1, 2, 3, 4])
+    self.assertEqual(service.createLineItems.call_count, 3)
+    self.assertEqual(sorted(created_objects(service.createLineItems),
+      key=lambda line_item: line_item['name']), line_items)
+
+  @patch('dfp.associate_line_items_and_creatives.LICA_BATCH_SIZE', 4)
+  def test_make_licas_matches_sync(self, mock_load_from_storage):
+    """
+    Ensure the async path sends the same associations as the sync one.
+    """
+    service = mock_load_from_storage.return_value.GetService.return_value
+    sizes = [{'width': '300', 'height': '250'}]
+
+    dfp.associate_line_items_and_creatives.make_licas([1, 2, 3], [7, 8],
+      size_overrides=sizes)
+    sync_licas = created_objects(
+      service.createLineItemCreativeAssociations)
+    service.createLineItemCreativeAssociations.reset_mock()
+
+    asyncio.run(dfp.aio.make_licas([1, 2, 3], [7, 8], size_overrides=sizes))
+    async_licas = created_objects(
+      service.createLineItemCreativeAssociations)
+
+    key = lambda lica: (lica['lineItemId'], lica['creativeId'])
+    self.assertEqual(len(async_licas), 6)
+    self.assertEqual(sorted(async_licas, key=key),
+      sorted(sync_licas, key=key))
+    self.assertEqual(service.createLineItemCreativeAssociations.call_count, 2)
+
+  def test_wrapped_function(self, mock_load_from_storage):
+    """
+    Ensure wrapped functions run off the event loop thread.
+    """
+    threads = []
+    def get_user_id_by_email(email):
+      threads.append(threading.current_thread())
+      return 123
+
+    with patch('dfp.get_users.get_user_id_by_email', get_user_id_by_email):
+      wrapped = dfp.aio._wrap(dfp.get_users.get_user_id_by_email)
+      self.assertEqual(asyncio.run(wrapped('me@example.com')), 123)
+    self.assertIsNot(threads[0], threading.current_thread())
+
+
+class DFPGatherTests(TestCase):
+
+  def tearDown(self):
+    dfp.executor.shutdown()
+
+  @patch.multiple('settings', DFP_MAX_CONCURRENCY=8, create=True)
+  def test_gather_limit(self):
+    """
+    Ensure no more than `limit` calls run at once.
+    """
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0}
+    def call(index):
+      with lock:
+        state['running'] += 1
+        state['peak'] = max(state['peak'], state['running'])
+      time.sleep(0.01)
+      with lock:
+        state['running'] -= 1
+      return index
+
+    results = asyncio.run(dfp.aio.gather(
+      [dfp.aio.run(call, index) for index in range(10)], limit=3))
+
+    self.assertEqual(results, list(range(10)))
+    self.assertEqual(state['peak'], 3)
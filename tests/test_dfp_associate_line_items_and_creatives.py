@@ -4,12 +4,17 @@ from unittest import TestCase
 from mock import MagicMock, Mock, patch
 
 import settings
+import dfp.client
 import dfp.associate_line_items_and_creatives
 
 
 @patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
 class DFPCreateLICAsTests(TestCase):
 
+  def setUp(self):
+    # Each test mocks the DFP client, so never reuse a cached one.
+    dfp.client.reset_clients()
+
   def test_association(self, mock_dfp_client):
     """
     Ensure it calls DFP with expected associations.
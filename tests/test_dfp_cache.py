@@ -0,0 +1,189 @@
+
+import threading
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+import dfp.cache
+import dfp.client
+import dfp.create_orders
+import dfp.get_orders
+import dfp.get_users
+from dfp.cache import LookupCache
+from dfp.exceptions import DFPObjectNotFound
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+class LookupCacheTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+    self.loader = MagicMock(return_value=12345)
+
+  @patch('time.monotonic')
+  def test_ttl(self, mock_monotonic, mock_load_from_storage):
+    """
+    Ensure found objects are cached for their type's TTL.
+    """
+    cache = LookupCache(ttls={'Users': 10})
+    mock_monotonic.return_value = 100.0
+    self.assertEqual(cache.get_or_load('Users', 'a@b.com', self.loader),
+      12345)
+    mock_monotonic.return_value = 109.0
+    self.assertEqual(cache.get_or_load('Users', 'a@b.com', self.loader),
+      12345)
+    self.loader.assert_called_once_with()
+
+    mock_monotonic.return_value = 110.0
+    cache.get_or_load('Users', 'a@b.com', self.loader)
+    self.assertEqual(self.loader.call_count, 2)
+    self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+  @patch('time.monotonic')
+  def test_negative_entries(self, mock_monotonic, mock_load_from_storage):
+    """
+    Ensure misses are cached for the shorter negative TTL.
+    """
+    cache = LookupCache(ttls={'Orders': 300}, negative_ttl=60)
+    self.loader.return_value = None
+    mock_monotonic.return_value = 0.0
+    self.assertIsNone(cache.get_or_load('Orders', 'Order', self.loader))
+    mock_monotonic.return_value = 59.0
+    self.assertIsNone(cache.get_or_load('Orders', 'Order', self.loader))
+    self.loader.assert_called_once_with()
+    self.assertEqual(cache.negative_hits, 1)
+
+    mock_monotonic.return_value = 60.0
+    cache.get_or_load('Orders', 'Order', self.loader)
+    self.assertEqual(self.loader.call_count, 2)
+
+  def test_lru_eviction(self, mock_load_from_storage):
+    """
+    Ensure the least recently used entries are evicted past the size limit.
+    """
+    cache = LookupCache(max_size=2)
+    cache.put('Users', 'a', 1)
+    cache.put('Users', 'b', 2)
+    cache.get('Users', 'a')
+    cache.put('Users', 'c', 3)
+
+    self.assertEqual(len(cache), 2)
+    self.assertEqual(cache.get('Users', 'a'), (True, 1))
+    self.assertEqual(cache.get('Users', 'b'), (False, None))
+    self.assertEqual(cache.get('Users', 'c'), (True, 3))
+    self.assertEqual(cache.evictions, 1)
+
+  def test_invalidate(self, mock_load_from_storage):
+    """
+    Ensure an invalidated lookup is loaded again.
+    """
+    cache = LookupCache()
+    cache.put('Orders', 'Order', None)
+    cache.invalidate('Orders', 'Order')
+    cache.get_or_load('Orders', 'Order', self.loader)
+    self.loader.assert_called_once_with()
+
+  def test_ttl_zero(self, mock_load_from_storage):
+    """
+    Ensure a TTL of 0 turns caching off for a type.
+    """
+    cache = LookupCache(ttls={'Users': 0})
+    cache.get_or_load('Users', 'a@b.com', self.loader)
+    cache.get_or_load('Users', 'a@b.com', self.loader)
+    self.assertEqual(self.loader.call_count, 2)
+
+  def test_networks(self, mock_load_from_storage):
+    """
+    Ensure lookups are cached per network.
+    """
+    cache = LookupCache()
+    mock_load_from_storage.return_value.network_code = '1111'
+    cache.put('Users', 'a@b.com', 1)
+    dfp.client.reset_clients()
+    mock_load_from_storage.return_value.network_code = '2222'
+    self.assertEqual(cache.get('Users', 'a@b.com'), (False, None))
+
+  def test_concurrent_misses(self, mock_load_from_storage):
+    """
+    Ensure concurrent lookups of the same object share one load.
+    """
+    cache = LookupCache()
+    barrier = threading.Barrier(4, timeout=5)
+    loaded = threading.Event()
+
+    def loader():
+      loaded.set()
+      # Give the other lookups time to find this one in progress.
+      threading.Event().wait(0.05)
+      return 12345
+    self.loader.side_effect = loader
+
+    results = []
+
+    def lookup():
+      barrier.wait()
+      results.append(cache.get_or_load('Users', 'a@b.com', self.loader))
+
+    threads = [threading.Thread(target=lookup) for _ in range(4)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join(5)
+
+    self.assertEqual(results, [12345] * 4)
+    self.loader.assert_called_once_with()
+
+  @patch.multiple('settings', DFP_CACHE_MAX_SIZE=5,
+    DFP_CACHE_TTLS={'Users': 30}, DFP_CACHE_NEGATIVE_TTL=10, create=True)
+  def test_get_cache(self, mock_load_from_storage):
+    """
+    Ensure the cache is configured from settings and discarded on reset.
+    """
+    cache = dfp.cache.get_cache()
+    self.assertIs(dfp.cache.get_cache(), cache)
+    self.assertEqual(cache.max_size, 5)
+    self.assertEqual(cache.ttls['Users'], 30)
+    self.assertEqual(cache.ttls['Orders'], 300)
+    self.assertEqual(cache.negative_ttl, 10)
+
+    dfp.client.reset_clients()
+    self.assertIsNot(dfp.cache.get_cache(), cache)
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+class CachedLookupTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+
+  def test_user_lookups(self, mock_load_from_storage):
+    """
+    Ensure repeated user lookups, found or not, make one request each.
+    """
+    service = mock_load_from_storage.return_value.GetService.return_value
+    service.getUsersByStatement.side_effect = lambda statement: (
+      {'results': [{'id': 14523}]}
+      if statement['values'][0]['value']['value'] == 'a@b.com' else {})
+
+    self.assertEqual(dfp.get_users.get_user_id_by_email('a@b.com'), 14523)
+    self.assertEqual(dfp.get_users.get_user_id_by_email('a@b.com'), 14523)
+    for _ in range(2):
+      with self.assertRaises(DFPObjectNotFound):
+        dfp.get_users.get_user_id_by_email('nobody@b.com')
+    self.assertEqual(service.getUsersByStatement.call_count, 2)
+
+  def test_create_order_invalidates(self, mock_load_from_storage):
+    """
+    Ensure creating an order drops its cached miss.
+    """
+    service = mock_load_from_storage.return_value.GetService.return_value
+    service.getOrdersByStatement.return_value = {}
+    service.createOrders.return_value = [{'id': 1357913, 'name': 'Order'}]
+
+    dfp.create_orders.create_order('Order', 246810, 14523)
+    self.assertEqual(dfp.cache.get_cache().get('Orders', 'Order'),
+      (False, None))
+
+    service.getOrdersByStatement.return_value = {
+      'results': [{'id': 1357913, 'name': 'Order'}]}
+    self.assertEqual(dfp.get_orders.get_order_by_name('Order')['id'], 1357913)
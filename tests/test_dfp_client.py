@@ -0,0 +1,144 @@
+
+from unittest import TestCase
+from mock import MagicMock, call, patch
+
+import settings
+import dfp.client
+import dfp.memory_backend
+import dfp.recording
+from dfp.exceptions import BadSettingException, MissingSettingException
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+class DFPClientTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+
+  def test_get_client_loads_once(self, mock_load_from_storage):
+    """
+    Ensure we only load the client from the YAML file once per process.
+    """
+    client = dfp.client.get_client()
+    self.assertIs(dfp.client.get_client(), client)
+    mock_load_from_storage.assert_called_once_with(
+      settings.GOOGLEADS_YAML_FILE)
+
+  def test_get_client_per_yaml_file_and_network(self, mock_load_from_storage):
+    """
+    Ensure clients are cached separately per YAML file and network code.
+    """
+    mock_load_from_storage.side_effect = [MagicMock(), MagicMock(),
+      MagicMock()]
+
+    default_client = dfp.client.get_client()
+    other_file_client = dfp.client.get_client('other.yaml')
+    network_client = dfp.client.get_client(network_code='12345')
+
+    self.assertIsNot(default_client, other_file_client)
+    self.assertIsNot(default_client, network_client)
+    self.assertEqual(network_client.network_code, '12345')
+    self.assertIs(dfp.client.get_client(network_code='12345'), network_client)
+    self.assertEqual(mock_load_from_storage.call_count, 3)
+
+  def test_get_service_cached(self, mock_load_from_storage):
+    """
+    Ensure we create one service proxy per service name and version.
+    """
+    mock_client = mock_load_from_storage.return_value
+    mock_client.GetService.side_effect = lambda name, version: MagicMock()
+
+    line_item_service = dfp.client.get_service('LineItemService')
+    self.assertIs(dfp.client.get_service('LineItemService'),
+      line_item_service)
+    self.assertIsNot(dfp.client.get_service('OrderService'),
+      line_item_service)
+    self.assertIsNot(
+      dfp.client.get_service('LineItemService', version='v202505'),
+      line_item_service)
+
+    self.assertEqual(mock_client.GetService.call_args_list, [
+      call('LineItemService', version=dfp.client.API_VERSION),
+      call('OrderService', version=dfp.client.API_VERSION),
+      call('LineItemService', version='v202505'),
+    ])
+    mock_load_from_storage.assert_called_once()
+
+  def test_reload_client(self, mock_load_from_storage):
+    """
+    Ensure reloading a client drops it and its services.
+    """
+    first_client = MagicMock()
+    second_client = MagicMock()
+    mock_load_from_storage.side_effect = [first_client, second_client]
+
+    dfp.client.get_service('OrderService')
+    self.assertIs(dfp.client.reload_client(), second_client)
+    dfp.client.get_service('OrderService')
+
+    first_client.GetService.assert_called_once()
+    second_client.GetService.assert_called_once()
+
+  def test_reset_hooks(self, mock_load_from_storage):
+    """
+    Ensure registered hooks run when the clients are reset.
+    """
+    hook = MagicMock()
+    dfp.client.register_reset_hook(hook)
+    dfp.client.register_reset_hook(hook)
+    try:
+      dfp.client.reset_clients()
+    finally:
+      dfp.client._reset_hooks.remove(hook)
+    hook.assert_called_once_with()
+
+
+class DFPBackendTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+
+  def tearDown(self):
+    dfp.client.reset_clients()
+
+  @patch.dict('os.environ', {'DFP_BACKEND': 'memory'})
+  @patch('settings.DFP_BACKEND', 'soap', create=True)
+  @patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+  def test_environment_overrides_setting(self, mock_load_from_storage):
+    """
+    Ensure the environment variable chooses the backend over settings.
+    """
+    self.assertEqual(dfp.client.get_backend(), 'memory')
+    self.assertIsInstance(dfp.client.get_client(),
+      dfp.memory_backend.MemoryClient)
+    mock_load_from_storage.assert_not_called()
+
+  @patch.dict('os.environ', {'DFP_BACKEND': ''})
+  @patch('settings.DFP_BACKEND', 'carrier-pigeon', create=True)
+  def test_unknown_backend(self):
+    """
+    Ensure an unknown backend is reported as a bad setting.
+    """
+    with self.assertRaises(BadSettingException):
+      dfp.client.get_client()
+
+  @patch.dict('os.environ', {'DFP_BACKEND': 'record'})
+  @patch('settings.DFP_RECORDING_FILE', '/tmp/recording.json', create=True)
+  @patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+  def test_record_backend(self, mock_load_from_storage):
+    """
+    Ensure the record backend wraps the SOAP client.
+    """
+    client = dfp.client.get_client()
+    self.assertIsInstance(client, dfp.recording.RecordingClient)
+    self.assertIs(client.client, mock_load_from_storage.return_value)
+    self.assertEqual(client.recording.path, '/tmp/recording.json')
+
+  @patch.dict('os.environ', {'DFP_BACKEND': 'replay'})
+  @patch('settings.DFP_RECORDING_FILE', None, create=True)
+  def test_replay_backend_needs_file(self):
+    """
+    Ensure replaying requires a recording file.
+    """
+    with self.assertRaises(MissingSettingException):
+      dfp.client.get_client()
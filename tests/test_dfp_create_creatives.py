@@ -4,12 +4,17 @@ from unittest import TestCase
 from mock import MagicMock, Mock, patch
 
 import settings
+import dfp.client
 import dfp.create_creatives
 
 
 @patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
 class DFPCreateCreativesTests(TestCase):
 
+  def setUp(self):
+    # Each test mocks the DFP client, so never reuse a cached one.
+    dfp.client.reset_clients()
+
   def test_create_creatives_items_call(self, mock_dfp_client):
     """
     Ensure it calls DFP once with creative info.
@@ -2,12 +2,17 @@
 from unittest import TestCase
 from mock import MagicMock, Mock, patch
 
+import dfp.client
 import dfp.create_custom_targeting
 
 
 @patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
 class DFPCreateCustomTargetingTests(TestCase):
 
+  def setUp(self):
+    # Each test mocks the DFP client, so never reuse a cached one.
+    dfp.client.reset_clients()
+
   def test_create_targeting_key(self, mock_dfp_client):
     """
     Ensure it calls DFP to create a key and returns the key ID.
@@ -111,3 +116,32 @@ class DFPCreateCustomTargetingTests(TestCase):
       )
     
     self.assertEqual(response, 555666777)
+
+  def test_create_targeting_values(self, mock_dfp_client):
+    """
+    Ensure values are created in batches and their IDs returned in order.
+    """
+    service = mock_dfp_client.return_value.GetService.return_value
+    service.createCustomTargetingValues.side_effect = lambda values: [
+      {'id': round(float(value['name']) * 100), 'name': value['name']}
+      for value in values]
+
+    names = ['{0:.2f}'.format(index / 100.0) for index in range(1, 1201)]
+    ids = dfp.create_custom_targeting.create_targeting_values(names, 987654)
+
+    self.assertEqual(ids, list(range(1, 1201)))
+    batches = sorted(len(call[0][0]) for call in
+      service.createCustomTargetingValues.call_args_list)
+    self.assertEqual(batches, [200, 500, 500])
+    first_value = service.createCustomTargetingValues.call_args_list[0][0][0][0]
+    self.assertEqual(first_value['customTargetingKeyId'], 987654)
+    self.assertEqual(first_value['matchType'], 'EXACT')
+
+  def test_create_no_targeting_values(self, mock_dfp_client):
+    """
+    Ensure no request is made for no values.
+    """
+    self.assertEqual(
+      dfp.create_custom_targeting.create_targeting_values([], 987654), [])
+    (mock_dfp_client.return_value.GetService.return_value
+      .createCustomTargetingValues.assert_not_called())
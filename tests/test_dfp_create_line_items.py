@@ -3,6 +3,7 @@ from unittest import TestCase
 from mock import MagicMock, patch
 
 import settings
+import dfp.client
 import dfp.create_line_items
 from dfp.exceptions import BadSettingException, MissingSettingException
 
@@ -10,6 +11,10 @@ from dfp.exceptions import BadSettingException, MissingSettingException
 @patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
 class DFPCreateLineItemsTests(TestCase):
 
+  def setUp(self):
+    # Each test mocks the DFP client, so never reuse a cached one.
+    dfp.client.reset_clients()
+
   def test_create_line_items_call(self, mock_dfp_client):
     """
     Ensure it calls DFP once with line item info.
@@ -0,0 +1,59 @@
+
+import threading
+from unittest import TestCase
+
+from mock import patch
+
+import dfp.client
+import dfp.executor
+
+
+class ExecutorTests(TestCase):
+
+  def tearDown(self):
+    dfp.executor.shutdown()
+
+  @patch.multiple('settings', DFP_MAX_CONCURRENCY=2, create=True)
+  def test_executor_size(self):
+    """
+    Ensure the thread pool is bounded by the configured concurrency.
+    """
+    dfp.executor.shutdown()
+    self.assertEqual(dfp.executor.get_executor()._max_workers, 2)
+
+  def test_reset(self):
+    """
+    Ensure resetting the clients stops the thread pool.
+    """
+    executor = dfp.executor.get_executor()
+    dfp.client.reset_clients()
+    self.assertIsNone(dfp.executor._executor)
+    self.assertIsNot(dfp.executor.get_executor(), executor)
+
+  @patch.multiple('settings', DFP_MAX_CONCURRENCY=1, create=True)
+  def test_nested_submit(self):
+    """
+    Ensure work submitted from the pool runs in place rather than waiting
+    for a thread it holds.
+    """
+    dfp.executor.shutdown()
+
+    def outer():
+      inner = dfp.executor.submit(threading.current_thread)
+      return threading.current_thread(), inner.result(timeout=5)
+
+    outer_thread, inner_thread = dfp.executor.submit(outer).result(timeout=5)
+    self.assertIs(outer_thread, inner_thread)
+    self.assertIsNot(outer_thread, threading.current_thread())
+
+  def test_map_ordered(self):
+    """
+    Ensure results come back in item order, and errors are raised.
+    """
+    self.assertEqual(dfp.executor.map_ordered(lambda item: item * 2,
+      [3, 1, 2]), [6, 2, 4])
+
+    def fail(item):
+      raise ValueError(item)
+    with self.assertRaises(ValueError):
+      dfp.executor.map_ordered(fail, [1, 2])
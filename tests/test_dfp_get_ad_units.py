@@ -2,6 +2,7 @@
 from unittest import TestCase
 from mock import MagicMock, Mock, patch
 
+import dfp.client
 import dfp.get_ad_units
 from dfp.exceptions import (
   BadSettingException,
@@ -13,6 +14,10 @@ from dfp.exceptions import (
 @patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
 class DFPGetAdUnitsTests(TestCase):
 
+  def setUp(self):
+    # Each test mocks the DFP client, so never reuse a cached one.
+    dfp.client.reset_clients()
+
   def test_get_placement_by_name_call(self, mock_dfp_client):
     """
     Ensure we make the correct call to DFP when getting a an ad unit
@@ -204,16 +209,14 @@ class DFPGetAdUnitsTests(TestCase):
       ad_unit = dfp.get_ad_units.get_ad_unit_by_name(
         'Not_an_Existing_Ad_Unit')
 
-  @patch('dfp.get_ad_units.get_ad_unit_by_name')
-  def test_get_ad_unit_ids_by_name(self, mock_get_ad_unit_id_by_name,
-    mock_dfp_client):
+  def test_get_ad_unit_ids_by_name(self, mock_dfp_client):
     """
-    Ensures we return ad unit IDs.
+    Ensures we return ad unit IDs in order from a single request.
     """
+    mock_dfp_client.return_value = MagicMock()
 
-    # Fake returned ad unit. Return a different one each time
-    # it is called.
-    mock_get_ad_unit_id_by_name.side_effect = [
+    # Fake returned ad units, in a different order than requested.
+    ad_units = [
       {
         'id': '11122233344',
         'parentId': '12345678',
@@ -329,9 +332,43 @@ class DFPGetAdUnitsTests(TestCase):
         'isSetTopBoxEnabled': False
       }
     ]
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getAdUnitsByStatement) = MagicMock(
+        return_value={
+          'totalResultSetSize': 2,
+          'startIndex': 0,
+          'results': list(reversed(ad_units)),
+        }
+    )
+
     ad_unit_ids = dfp.get_ad_units.get_ad_unit_ids_by_name(
       ['Ad_Unit_One', 'Ad_Unit_Two'])
     self.assertEqual(ad_unit_ids, ['11122233344', '22233344455'])
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getAdUnitsByStatement.assert_called_once()
+      )
+
+  def test_get_ad_unit_ids_by_name_missing(self, mock_dfp_client):
+    """
+    Ensures we list every missing ad unit in one exception.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getAdUnitsByStatement) = MagicMock(
+        return_value={
+          'totalResultSetSize': 0,
+          'startIndex': 0,
+          'results': [],
+        }
+    )
+
+    with self.assertRaises(DFPObjectNotFound) as context:
+      dfp.get_ad_units.get_ad_unit_ids_by_name(['Ad_Unit_One', 'Ad_Unit_Two'])
+    self.assertIn('Ad_Unit_One, Ad_Unit_Two', str(context.exception))
 
   @patch.multiple('settings',
     DFP_TARGETED_AD_UNIT_NAMES=['My_Ad_Unit', 'Another_Ad_Unit'])
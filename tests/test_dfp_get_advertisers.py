@@ -5,6 +5,7 @@ from googleads import ad_manager
 from mock import MagicMock, Mock, patch
 
 import settings
+import dfp.client
 import dfp.get_advertisers
 from dfp.exceptions import (
   BadSettingException,
@@ -16,6 +17,10 @@ from dfp.exceptions import (
 @patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
 class DFPGetAdvertisersTests(TestCase):
 
+  def setUp(self):
+    # Each test mocks the DFP client, so never reuse a cached one.
+    dfp.client.reset_clients()
+
   def test_get_advertiser_call(self, mock_dfp_client):
     """
     Ensure it calls DFP once with correct filter info.
@@ -1,13 +1,21 @@
 
+from collections import OrderedDict
 from unittest import TestCase
 from mock import MagicMock, Mock, patch
 
+import dfp.client
 import dfp.get_custom_targeting
+from dfp.exceptions import BadSettingException
+from dfp.memory_backend import MemoryNetwork, MemoryService
 
 
 @patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
 class DFPGetCustomTargetingTests(TestCase):
 
+  def setUp(self):
+    # Each test mocks the DFP client, so never reuse a cached one.
+    dfp.client.reset_clients()
+
   def test_get_targeting_by_key_name_call_no_key(self, mock_dfp_client):
     """
     Ensure it makes one call to DFP to get the key info.
@@ -98,12 +106,13 @@ class DFPGetCustomTargetingTests(TestCase):
       .getCustomTargetingKeysByStatement.assert_called_once()
       )
 
-    # It should not fetch values because the key does not exist.
+    # The first page holds every value (`totalResultSetSize`), so it should
+    # not request another.
     self.assertEqual(
       mock_dfp_client.return_value
         .GetService.return_value
         .getCustomTargetingValuesByStatement.call_count,
-      2
+      1
     )
 
     self.assertEqual(response,
@@ -167,3 +176,192 @@ class DFPGetCustomTargetingTests(TestCase):
     response = dfp.get_custom_targeting.get_key_id_by_name('hb_pb')
 
     self.assertEqual(response, None)
+
+
+@patch('settings.DFP_PAGE_SIZE', 100, create=True)
+@patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+class TargetedValueFetchTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+    self.network = MemoryNetwork()
+    key = self.network.create('CustomTargetingKeys', [{'name': 'hb_pb'}])[0]
+    self.key_id = key['id']
+    self.network.create('CustomTargetingValues', [{
+      'customTargetingKeyId': self.key_id,
+      'name': '{0:.2f}'.format(index / 100.0),
+      'displayName': '{0:.2f}'.format(index / 100.0),
+      'status': 'ACTIVE',
+    } for index in range(1000)])
+    self.service = MemoryService(self.network, 'CustomTargetingService')
+    self.service.getCustomTargetingValuesByStatement = MagicMock(
+      wraps=self.service.getCustomTargetingValuesByStatement)
+    patcher = patch('dfp.get_custom_targeting.get_service',
+      return_value=self.service)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def queries(self):
+    return [call[0][0]['query'] for call in
+      self.service.getCustomTargetingValuesByStatement.call_args_list]
+
+  def test_few_names(self, mock_load_from_storage):
+    """
+    Ensure values that fit one chunk of names are fetched by name.
+    """
+    names = ['0.50', '1.00', '1.50', '99.00']
+    values = dfp.get_custom_targeting.get_targeting_by_key_name('hb_pb',
+      names)
+
+    self.assertEqual([value['name'] for value in values],
+      ['0.50', '1.00', '1.50'])
+    self.assertEqual(len(self.queries()), 1)
+    self.assertIn('name IN (:names)', self.queries()[0])
+
+  def test_auto_full_scan(self, mock_load_from_storage):
+    """
+    Ensure a full scan is chosen when it takes fewer requests.
+    """
+    names = ['{0:.2f}'.format(index / 100.0) for index in range(0, 1100)]
+    values = dfp.get_custom_targeting.get_targeting_by_key_name('hb_pb',
+      names)
+
+    self.assertEqual(len(values), 1000)
+    # One count, then 10 pages rather than 11 chunks of names.
+    self.assertIn('LIMIT 1 ', self.queries()[0])
+    self.assertTrue(all('name IN' not in query for query in self.queries()))
+
+  def test_auto_by_name(self, mock_load_from_storage):
+    """
+    Ensure chunks of names are chosen when they take fewer requests.
+    """
+    names = ['{0:.2f}'.format(index / 100.0) for index in range(0, 1000, 2)]
+    values = dfp.get_custom_targeting.get_targeting_by_key_name('hb_pb',
+      names)
+
+    self.assertEqual(len(values), 500)
+    # One count, then 5 chunks of names rather than 10 pages.
+    self.assertEqual(len(self.queries()), 6)
+
+  @patch('settings.DFP_TARGETING_VALUE_FETCH', 'names', create=True)
+  def test_names_mode(self, mock_load_from_storage):
+    """
+    Ensure the 'names' mode always fetches by name, in chunks.
+    """
+    names = ['{0:.2f}'.format(index / 100.0) for index in range(0, 1000, 2)]
+    values = dfp.get_custom_targeting.get_targeting_by_key_name('hb_pb',
+      names)
+
+    self.assertEqual(sorted(value['name'] for value in values), sorted(names))
+    self.assertEqual(len(self.queries()), 5)
+
+  @patch('settings.DFP_TARGETING_VALUE_FETCH', 'all', create=True)
+  def test_all_mode(self, mock_load_from_storage):
+    """
+    Ensure the 'all' mode fetches every value.
+    """
+    values = dfp.get_custom_targeting.get_targeting_by_key_name('hb_pb',
+      ['1.00'])
+    self.assertEqual(len(values), 1000)
+
+  @patch('settings.DFP_TARGETING_VALUE_FETCH', 'some', create=True)
+  def test_bad_mode(self, mock_load_from_storage):
+    """
+    Ensure unknown modes are rejected.
+    """
+    with self.assertRaises(BadSettingException):
+      dfp.get_custom_targeting.get_targeting_by_key_name('hb_pb', ['1.00'])
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+class MultiKeyFetchTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+    self.network = MemoryNetwork()
+    keys = self.network.create('CustomTargetingKeys', [{'name': 'hb_bidder'},
+      {'name': 'hb_pb'}])
+    self.key_ids = dict((key['name'], key['id']) for key in keys)
+    values = [('hb_bidder', 'mypartner'), ('hb_bidder', 'other'),
+      ('hb_pb', '0.50'), ('hb_pb', '1.00'), ('hb_pb', 'mypartner')]
+    self.network.create('CustomTargetingValues', [{
+      'customTargetingKeyId': self.key_ids[key_name],
+      'name': name,
+      'displayName': name,
+      'status': 'ACTIVE',
+    } for key_name, name in values])
+    self.service = MemoryService(self.network, 'CustomTargetingService')
+    for method in ('getCustomTargetingKeysByStatement',
+      'getCustomTargetingValuesByStatement', 'createCustomTargetingKeys'):
+      setattr(self.service, method, MagicMock(
+        wraps=getattr(self.service, method)))
+    for module in ('get_custom_targeting', 'create_custom_targeting'):
+      patcher = patch('dfp.{0}.get_service'.format(module),
+        return_value=self.service)
+      patcher.start()
+      self.addCleanup(patcher.stop)
+
+  def test_all_values(self, mock_load_from_storage):
+    """
+    Ensure the keys and their values are each fetched with one request.
+    """
+    key_values = dfp.get_custom_targeting.get_targeting_by_key_names(
+      ['hb_bidder', 'hb_pb', 'missing'])
+
+    self.assertEqual(list(key_values), ['hb_bidder', 'hb_pb', 'missing'])
+    self.assertEqual([value['name'] for value in key_values['hb_bidder']],
+      ['mypartner', 'other'])
+    self.assertEqual([value['name'] for value in key_values['hb_pb']],
+      ['0.50', '1.00', 'mypartner'])
+    self.assertIsNone(key_values['missing'])
+    self.service.getCustomTargetingKeysByStatement.assert_called_once()
+    self.service.getCustomTargetingValuesByStatement.assert_called_once()
+
+  def test_values_by_name(self, mock_load_from_storage):
+    """
+    Ensure only the values needed of each key are returned.
+    """
+    key_values = dfp.get_custom_targeting.get_targeting_by_key_names(
+      ['hb_bidder', 'hb_pb'], {'hb_bidder': ['mypartner'],
+        'hb_pb': ['1.00', '1.50']})
+
+    self.assertEqual([value['name'] for value in key_values['hb_bidder']],
+      ['mypartner'])
+    self.assertEqual([value['name'] for value in key_values['hb_pb']],
+      ['1.00'])
+    self.service.getCustomTargetingValuesByStatement.assert_called_once()
+    self.assertIn('name IN (:names)', self.service
+      .getCustomTargetingValuesByStatement.call_args[0][0]['query'])
+
+  def test_key_ids_cached(self, mock_load_from_storage):
+    """
+    Ensure key lookups share the cache of single key lookups.
+    """
+    dfp.get_custom_targeting.get_key_ids_by_name(['hb_bidder', 'missing'])
+    self.assertEqual(dfp.get_custom_targeting.get_key_id_by_name('hb_bidder'),
+      self.key_ids['hb_bidder'])
+    self.assertIsNone(dfp.get_custom_targeting.get_key_id_by_name('missing'))
+    self.service.getCustomTargetingKeysByStatement.assert_called_once()
+
+  def test_get_targeting_keys_and_values(self, mock_load_from_storage):
+    """
+    Ensure a setup's keys are created if missing, and their values indexed
+    per key.
+    """
+    import tasks.add_new_prebid_partner
+
+    keys = tasks.add_new_prebid_partner.get_targeting_keys_and_values(
+      OrderedDict([('hb_bidder', ['mypartner']), ('hb_pb', ['0.50']),
+        ('hb_format', ['banner'])]))
+
+    key_id, getter = keys['hb_pb']
+    self.assertEqual(key_id, self.key_ids['hb_pb'])
+    self.assertEqual(getter.value_ids, {'0.50': 1000005})
+    self.assertEqual(keys['hb_bidder'][1].value_ids, {'mypartner': 1000003})
+    key_id, getter = keys['hb_format']
+    self.assertEqual(getter.key_id, key_id)
+    self.assertEqual(getter.value_ids, {})
+
+    self.service.getCustomTargetingKeysByStatement.assert_called_once()
+    self.service.createCustomTargetingKeys.assert_called_once()
+    self.service.getCustomTargetingValuesByStatement.assert_called_once()
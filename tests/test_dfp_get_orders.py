@@ -1,14 +1,23 @@
 #!/usr/bin/env python
 
+import csv
+import io
+import json
 from unittest import TestCase
 from mock import MagicMock, Mock, patch
 
+import dfp.client
 import dfp.get_orders
+from dfp.memory_backend import MemoryNetwork, MemoryService
 
 
 @patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
 class DFPServiceTests(TestCase):
 
+  def setUp(self):
+    # Each test mocks the DFP client, so never reuse a cached one.
+    dfp.client.reset_clients()
+
   def test_get_all_orders(self, mock_dfp_client):
     """
     Ensure `get_all_orders` makes one call to DFP.
@@ -171,3 +180,99 @@ class DFPServiceTests(TestCase):
 
     order = dfp.get_orders.get_order_by_name('A new order')
     self.assertIsNone(order)
+
+
+class OrderExportTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+    self.network = MemoryNetwork()
+    self.network.create('Orders', [
+      {'name': 'Prebid 1', 'advertiserId': 1, 'status': 'APPROVED',
+        'startDateTime': {'date': {'year': 2019, 'month': 6, 'day': 1},
+          'hour': 0, 'minute': 0, 'second': 0,
+          'timeZoneId': 'America/New_York'}},
+      {'name': 'Prebid 2', 'advertiserId': 1, 'status': 'DRAFT'},
+      {'name': 'Direct', 'advertiserId': 2, 'status': 'APPROVED'},
+    ])
+    self.orders = dict((order['name'], order['id']) for order in
+      self.network.objects['Orders'])
+    self.network.create('LineItems', [{'name': str(index),
+      'orderId': self.orders['Prebid 1']} for index in range(3)])
+    self.services = {}
+    patcher = patch('dfp.get_orders.get_service',
+      side_effect=self.get_service)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def get_service(self, service_name):
+    if service_name not in self.services:
+      service = MemoryService(self.network, service_name)
+      for method in ('getOrdersByStatement', 'getLineItemsByStatement'):
+        if hasattr(service, method):
+          setattr(service, method, MagicMock(wraps=getattr(service, method)))
+      self.services[service_name] = service
+    return self.services[service_name]
+
+  def test_iter_orders_filters(self):
+    """
+    Ensure orders are filtered by advertiser, status and name.
+    """
+    names = lambda **filters: [order['name'] for order in
+      dfp.get_orders.iter_orders(**filters)]
+    self.assertEqual(names(), ['Prebid 1', 'Prebid 2', 'Direct'])
+    self.assertEqual(names(advertiser_id=1), ['Prebid 1', 'Prebid 2'])
+    self.assertEqual(names(status='APPROVED'), ['Prebid 1', 'Direct'])
+    self.assertEqual(names(advertiser_id=1, status='APPROVED',
+      name_like='Prebid%'), ['Prebid 1'])
+
+  @patch('settings.DFP_PAGE_SIZE', 1, create=True)
+  def test_export_ndjson(self):
+    """
+    Ensure orders are written as JSON lines, page by page.
+    """
+    out = io.StringIO()
+    self.assertEqual(dfp.get_orders.export_orders(out), 3)
+
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    self.assertEqual([row['name'] for row in rows],
+      ['Prebid 1', 'Prebid 2', 'Direct'])
+    self.assertEqual(list(rows[0]), list(dfp.get_orders.EXPORT_FIELDS))
+    self.assertEqual(rows[0]['startDateTime'],
+      '2019-06-01T00:00:00[America/New_York]')
+    self.assertIsNone(rows[1]['startDateTime'])
+    self.assertEqual(self.services['OrderService']
+      .getOrdersByStatement.call_count, 3)
+
+  def test_export_csv_line_item_counts(self):
+    """
+    Ensure CSV exports have a header and, if asked, line item counts
+    fetched without the line items.
+    """
+    out = io.StringIO()
+    dfp.get_orders.export_orders(out, 'csv', line_item_counts=True,
+      advertiser_id=1)
+
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    self.assertEqual([(row['name'], row['lineItemCount']) for row in rows],
+      [('Prebid 1', '3'), ('Prebid 2', '0')])
+    line_item_service = self.services['LineItemService']
+    for call in line_item_service.getLineItemsByStatement.call_args_list:
+      self.assertIn('LIMIT 1 ', call[0][0]['query'])
+
+  def test_export_bad_format(self):
+    """
+    Ensure unknown formats are rejected.
+    """
+    with self.assertRaises(ValueError):
+      dfp.get_orders.export_orders(io.StringIO(), 'xml')
+
+  def test_main_export(self):
+    """
+    Ensure the command line exports with the given filters.
+    """
+    out = io.StringIO()
+    with patch('sys.stdout', out):
+      dfp.get_orders.main(['--format', 'ndjson', '--status', 'DRAFT'])
+    self.assertEqual([json.loads(line)['name'] for line in
+      out.getvalue().splitlines()], ['Prebid 2'])
@@ -2,6 +2,7 @@
 from unittest import TestCase
 from mock import MagicMock, Mock, patch
 
+import dfp.client
 import dfp.get_placements
 from dfp.exceptions import (
   BadSettingException,
@@ -13,6 +14,10 @@ from dfp.exceptions import (
 @patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
 class DFPGetPlacementsTests(TestCase):
 
+  def setUp(self):
+    # Each test mocks the DFP client, so never reuse a cached one.
+    dfp.client.reset_clients()
+
   def test_get_placement_by_name_call(self, mock_dfp_client):
     """
     Ensure we make the correct call to DFP when getting a a placement
@@ -118,49 +123,72 @@ class DFPGetPlacementsTests(TestCase):
       placement = dfp.get_placements.get_placement_by_name(
         'Not an Existing Placement')
 
-  @patch('dfp.get_placements.get_placement_by_name')
-  def test_get_placement_ids_by_name(self, mock_get_placement_by_name, 
-    mock_dfp_client):
+  def test_get_placement_ids_by_name(self, mock_dfp_client):
     """
-    Ensures we return placement IDs.
-    """
-
-    # Fake returned placement. Return a different one each time
-    # it is called.
-    mock_get_placement_by_name.side_effect = [
-      {
-        'targetingDescription': None,
-        'targetingSiteName': None,
-        'targetingAdLocation': None,
-        'id': 9988776655,
-        'name': 'Placement One.',
-        'description': None,
-        'placementCode': "111222333444555666",
-        'status': "ACTIVE",
-        'isAdSenseTargetingEnabled': False,
-        'adSenseTargetingLocale': "und",
-        'targetedAdUnitIds': ['123456789'],
-        'lastModifiedDateTime': {},
-      },
-      {
-        'targetingDescription': None,
-        'targetingSiteName': None,
-        'targetingAdLocation': None,
-        'id': 13571357,
-        'name': 'Placement Two.',
-        'description': None,
-        'placementCode': "111222333444555666",
-        'status': "ACTIVE",
-        'isAdSenseTargetingEnabled': False,
-        'adSenseTargetingLocale': "und",
-        'targetedAdUnitIds': ['123456789'],
-        'lastModifiedDateTime': {},
-      }
-    ]
+    Ensures we return placement IDs in order from a single request.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    # Response from DFP, in a different order than requested.
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getPlacementsByStatement) = MagicMock(
+        return_value={
+          'totalResultSetSize': 2,
+          'startIndex': 0,
+          'results': [
+            {'id': 13571357, 'name': 'Placement Two.', 'status': 'ACTIVE'},
+            {'id': 9988776655, 'name': 'Placement One.', 'status': 'ACTIVE'},
+          ]
+        }
+    )
+
     placement_ids = dfp.get_placements.get_placement_ids_by_name(
       ['Placement One.', 'Placement Two.'])
     self.assertEqual(placement_ids, [9988776655, 13571357])
 
+    expected_statement = {
+      'query': 'WHERE name IN (:names) LIMIT 500 OFFSET 0',
+      'values': [{
+        'key': 'names',
+        'value': {
+          'xsi_type': 'SetValue',
+          'values': [
+            {'value': 'Placement One.', 'xsi_type': 'TextValue'},
+            {'value': 'Placement Two.', 'xsi_type': 'TextValue'},
+          ]
+        }
+      }]
+    }
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getPlacementsByStatement.assert_called_once_with(expected_statement)
+      )
+
+  def test_get_placement_ids_by_name_missing(self, mock_dfp_client):
+    """
+    Ensures we list every missing placement in one exception.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getPlacementsByStatement) = MagicMock(
+        return_value={
+          'totalResultSetSize': 1,
+          'startIndex': 0,
+          'results': [
+            {'id': 13571357, 'name': 'Placement Two.', 'status': 'ACTIVE'},
+          ]
+        }
+    )
+
+    with self.assertRaises(DFPObjectNotFound) as context:
+      dfp.get_placements.get_placement_ids_by_name(
+        ['Placement One.', 'Placement Two.', 'Placement Three.'])
+    self.assertIn('Placement One., Placement Three.',
+      str(context.exception))
+
   @patch.multiple('settings',
     DFP_TARGETED_PLACEMENT_NAMES=['My Placement!', 'Another placment'])
   @patch('dfp.get_placements.get_placement_ids_by_name')
@@ -5,6 +5,7 @@ from googleads import ad_manager
 from mock import MagicMock, Mock, patch
 
 import settings
+import dfp.client
 import dfp.get_users
 from dfp.exceptions import DFPObjectNotFound, MissingSettingException
 
@@ -12,6 +13,10 @@ from dfp.exceptions import DFPObjectNotFound, MissingSettingException
 @patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
 class DFPGetUsersTests(TestCase):
 
+  def setUp(self):
+    # Each test mocks the DFP client, so never reuse a cached one.
+    dfp.client.reset_clients()
+
   def test_get_user_call(self, mock_dfp_client):
     """
     Ensure it calls DFP once with correct user filter info.
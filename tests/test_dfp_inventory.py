@@ -0,0 +1,159 @@
+
+from unittest import TestCase
+
+from mock import patch
+
+import dfp.client
+import dfp.get_ad_units
+import dfp.inventory
+from dfp.exceptions import DFPObjectNotFound
+from dfp.inventory import InventoryIndex
+
+
+def ad_unit(ad_unit_id, name, parent_id=None):
+  return {'id': ad_unit_id, 'name': name, 'parentId': parent_id}
+
+AD_UNITS = [
+  ad_unit('1', 'ca-pub-0000000000000000'),
+  ad_unit('2', 'news', '1'),
+  ad_unit('3', 'sports', '1'),
+  ad_unit('4', 'leaderboard', '2'),
+  ad_unit('5', 'leaderboard', '3'),
+  ad_unit('6', 'football', '3'),
+  ad_unit('7', 'leaderboard', '6'),
+  ad_unit('8', 'sidebar', '6'),
+]
+
+
+class InventoryIndexTests(TestCase):
+
+  def setUp(self):
+    self.index = InventoryIndex(AD_UNITS)
+
+  def test_resolve_path(self):
+    """
+    Ensure paths resolve to the ad unit at that place in the hierarchy.
+    """
+    self.assertEqual(self.index.resolve('news/leaderboard')['id'], '4')
+    self.assertEqual(self.index.resolve('sports/football/leaderboard')['id'],
+      '7')
+    self.assertEqual(
+      self.index.resolve('ca-pub-0000000000000000/sports/leaderboard')['id'],
+      '5')
+
+  def test_resolve_name(self):
+    """
+    Ensure plain names resolve only when they are unique.
+    """
+    self.assertEqual(self.index.resolve('sidebar')['id'], '8')
+    with self.assertRaises(DFPObjectNotFound) as context:
+      self.index.resolve('leaderboard')
+    self.assertIn('news/leaderboard, sports/football/leaderboard, '
+      'sports/leaderboard', str(context.exception))
+
+  def test_resolve_missing(self):
+    """
+    Ensure unknown paths raise.
+    """
+    with self.assertRaises(DFPObjectNotFound):
+      self.index.resolve('news/sidebar')
+    with self.assertRaises(DFPObjectNotFound):
+      self.index.resolve('weather')
+
+  def test_descendants(self):
+    """
+    Ensure descendants include every level below the ad unit.
+    """
+    self.assertEqual(
+      [ad_unit['id'] for ad_unit in self.index.descendants('sports')],
+      ['6', '7', '8', '5'])
+    self.assertEqual(self.index.descendants('news/leaderboard'), [])
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+class InventoryLoadTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+
+  @patch('settings.DFP_PAGE_SIZE', 3, create=True)
+  def test_get_index_loads_pages_once(self, mock_load_from_storage):
+    """
+    Ensure the hierarchy is fetched page by page, once per run.
+    """
+    service = mock_load_from_storage.return_value.GetService.return_value
+    service.getAdUnitsByStatement.side_effect = lambda statement: {
+      'totalResultSetSize': len(AD_UNITS),
+      'results': AD_UNITS[int(statement['query'].split()[-1]):][:3],
+    }
+
+    index = dfp.inventory.get_index()
+    self.assertIs(dfp.inventory.get_index(), index)
+    self.assertEqual(len(index), 8)
+    self.assertEqual(service.getAdUnitsByStatement.call_count, 3)
+    self.assertEqual(service.getAdUnitsByStatement.call_args_list[0][0][0],
+      {'query': 'ORDER BY id ASC LIMIT 3 OFFSET 0', 'values': None})
+
+    dfp.client.reset_clients()
+    self.assertIsNone(dfp.inventory._index)
+
+  @patch('dfp.get_ad_units.get_index')
+  def test_ad_unit_paths(self, mock_get_index, mock_load_from_storage):
+    """
+    Ensure ad unit paths are resolved with the index, in order with names.
+    """
+    mock_get_index.return_value = InventoryIndex(AD_UNITS)
+    service = mock_load_from_storage.return_value.GetService.return_value
+    service.getAdUnitsByStatement.return_value = {
+      'totalResultSetSize': 1,
+      'results': [ad_unit('8', 'sidebar', '6')],
+    }
+
+    ad_unit_ids = dfp.get_ad_units.get_ad_unit_ids_by_name(
+      ['news/leaderboard', 'sidebar', 'sports/football/leaderboard'])
+
+    self.assertEqual(ad_unit_ids, ['4', '8', '7'])
+    service.getAdUnitsByStatement.assert_called_once()
+
+  @patch('dfp.get_ad_units.get_index')
+  def test_ad_unit_name_with_slash(self, mock_get_index,
+    mock_load_from_storage):
+    """
+    Ensure a name containing a slash that matches an ad unit is used as is,
+    without loading the index.
+    """
+    service = mock_load_from_storage.return_value.GetService.return_value
+    service.getAdUnitsByStatement.return_value = {
+      'totalResultSetSize': 2,
+      'results': [ad_unit('9', 'news/sports'), ad_unit('8', 'sidebar', '6')],
+    }
+
+    ad_unit_ids = dfp.get_ad_units.get_ad_unit_ids_by_name(
+      ['news/sports', 'sidebar'])
+
+    self.assertEqual(ad_unit_ids, ['9', '8'])
+    mock_get_index.assert_not_called()
+
+  @patch('dfp.get_ad_units.get_index')
+  def test_ad_unit_name_shared(self, mock_get_index, mock_load_from_storage):
+    """
+    Ensure a name several ad units share is rejected with their paths, along
+    with every path that doesn't resolve.
+    """
+    mock_get_index.return_value = InventoryIndex(AD_UNITS)
+    service = mock_load_from_storage.return_value.GetService.return_value
+    service.getAdUnitsByStatement.return_value = {
+      'totalResultSetSize': 3,
+      'results': [AD_UNITS[3], AD_UNITS[4], AD_UNITS[6]],
+    }
+
+    with self.assertRaises(DFPObjectNotFound) as context:
+      dfp.get_ad_units.get_ad_unit_ids_by_name(
+        ['leaderboard', 'news/sidebar', 'sports/sidebar'])
+
+    message = str(context.exception)
+    self.assertIn('More than one DFP ad unit is named "leaderboard": '
+      'news/leaderboard, sports/football/leaderboard, sports/leaderboard',
+      message)
+    self.assertIn('No DFP ad unit found with path news/sidebar', message)
+    self.assertIn('No DFP ad unit found with path sports/sidebar', message)
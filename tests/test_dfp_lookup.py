@@ -0,0 +1,96 @@
+
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+from dfp.exceptions import DFPObjectNotFound
+from dfp.lookup import find_objects_by_name, get_objects_by_name
+from dfp.memory_backend import MemoryNetwork
+
+
+class GetObjectsByNameTests(TestCase):
+
+  def setUp(self):
+    self.network = MemoryNetwork()
+    self.network.create('AdUnits', [{'name': 'unit-{0}'.format(index)}
+      for index in range(12)])
+    self.query_method = MagicMock(
+      side_effect=lambda statement: self.network.query('AdUnits', statement))
+
+  @patch('dfp.lookup.NAME_CHUNK_SIZE', 5)
+  def test_chunks(self):
+    """
+    Ensure names are looked up in chunks, and results keep their order.
+    """
+    names = ['unit-{0}'.format(index) for index in reversed(range(12))]
+    ad_units = get_objects_by_name(self.query_method, names, 'ad unit')
+
+    self.assertEqual([ad_unit['name'] for ad_unit in ad_units], names)
+    self.assertEqual(self.query_method.call_count, 3)
+
+  @patch('settings.DFP_PAGE_SIZE', 4, create=True)
+  def test_pages(self):
+    """
+    Ensure we fetch every page of results.
+    """
+    names = ['unit-{0}'.format(index) for index in range(10)]
+    ad_units = get_objects_by_name(self.query_method, names, 'ad unit')
+
+    self.assertEqual(len(ad_units), 10)
+    offsets = [args[0]['query'].split()[-1] for args, kwargs in
+      self.query_method.call_args_list]
+    self.assertEqual(offsets, ['0', '4', '8'])
+
+  @patch('dfp.lookup.logger')
+  def test_duplicates(self, mock_logger):
+    """
+    Ensure repeated names are looked up once and flagged, as are names
+    shared by several objects.
+    """
+    self.network.create('AdUnits', [{'name': 'unit-1'}])
+    ad_units = get_objects_by_name(self.query_method,
+      ['unit-1', 'unit-2', 'unit-1'], 'ad unit')
+
+    self.assertEqual([ad_unit['name'] for ad_unit in ad_units],
+      ['unit-1', 'unit-2', 'unit-1'])
+    self.assertIs(ad_units[0], ad_units[2])
+    warnings = [args[0] for args, kwargs in
+      mock_logger.warning.call_args_list]
+    self.assertEqual(len(warnings), 2)
+    self.assertIn('listed more than once', warnings[0])
+    self.assertIn('More than one DFP ad unit is named "unit-1"', warnings[1])
+
+  def test_find_objects(self):
+    """
+    Ensure every object with each name is returned, and none for missing
+    names.
+    """
+    self.network.create('AdUnits', [{'name': 'unit-1'}])
+    ad_units = find_objects_by_name(self.query_method,
+      ['unit-1', 'nope', 'unit-2'], 'ad unit')
+
+    self.assertEqual(list(ad_units), ['unit-1', 'nope', 'unit-2'])
+    self.assertEqual(len(ad_units['unit-1']), 2)
+    self.assertEqual(ad_units['nope'], [])
+    self.assertEqual(len(ad_units['unit-2']), 1)
+
+  def test_missing(self):
+    """
+    Ensure every missing name is reported at once.
+    """
+    with self.assertRaises(DFPObjectNotFound) as context:
+      get_objects_by_name(self.query_method, ['unit-1', 'nope', 'nada'],
+        'ad unit')
+    self.assertEqual(str(context.exception),
+      'No DFP ad unit found with name nope, nada')
+
+  @patch('dfp.lookup.logger')
+  @patch('time.time')
+  def test_timing(self, mock_time, mock_logger):
+    """
+    Ensure we log how long the lookup took.
+    """
+    mock_time.side_effect = [10.0, 12.5]
+    get_objects_by_name(self.query_method, ['unit-1', 'unit-2'], 'ad unit')
+    mock_logger.info.assert_any_call(
+      u'Looked up 2 ad unit names in 2.50s with 1 requests.')
@@ -0,0 +1,138 @@
+
+from unittest import TestCase
+
+from googleads import ad_manager
+from googleads.errors import GoogleAdsServerFault
+from mock import patch
+
+import dfp.client
+import dfp.create_custom_targeting
+import dfp.get_custom_targeting
+import dfp.get_users
+from dfp.memory_backend import MemoryClient, MemoryNetwork
+
+
+class MemoryNetworkTests(TestCase):
+
+  def setUp(self):
+    self.network = MemoryNetwork()
+    self.network.create('Orders', [
+      {'name': 'Prebid 1', 'advertiserId': 1},
+      {'name': 'Prebid 2', 'advertiserId': 2},
+      {'name': 'Other', 'advertiserId': 2},
+    ])
+
+  def test_create_assigns_ids(self):
+    """
+    Ensure created objects get IDs and defaults, and are copies.
+    """
+    orders = self.network.create('Orders', [{'name': 'New'}])
+    self.assertIsInstance(orders[0]['id'], int)
+    self.assertEqual(orders[0]['status'], 'DRAFT')
+    orders[0]['name'] = 'Changed'
+    self.assertEqual(self.network.objects['Orders'][-1]['name'], 'New')
+
+  def test_create_not_unique(self):
+    """
+    Ensure duplicate names fail the way DFP fails.
+    """
+    with self.assertRaises(GoogleAdsServerFault) as context:
+      self.network.create('Orders', [{'name': 'Prebid 1'}])
+    self.assertEqual(context.exception.errors[0]['errorString'],
+      'UniqueError.NOT_UNIQUE')
+    self.assertEqual(len(self.network.objects['Orders']), 3)
+
+  def test_query_bind_values(self):
+    """
+    Ensure filter statements with bound values select matching objects.
+    """
+    statement = ad_manager.FilterStatement('WHERE name = :name',
+      [{'key': 'name', 'value': {'xsi_type': 'TextValue',
+        'value': 'Prebid 2'}}])
+    response = self.network.query('Orders', statement.ToStatement())
+    self.assertEqual(response['totalResultSetSize'], 1)
+    self.assertEqual(response['results'][0]['advertiserId'], 2)
+
+  def test_query_operators_and_paging(self):
+    """
+    Ensure IN, LIKE, AND, ORDER BY, LIMIT and OFFSET work together.
+    """
+    response = self.network.query('Orders', {'query': "WHERE name LIKE "
+      "'Prebid%' AND advertiserId IN (1, 2) ORDER BY name DESC "
+      "LIMIT 1 OFFSET 1"})
+    self.assertEqual(response['totalResultSetSize'], 2)
+    self.assertEqual(response['startIndex'], 1)
+    self.assertEqual([order['name'] for order in response['results']],
+      ['Prebid 1'])
+
+    response = self.network.query('Orders',
+      {'query': "WHERE NOT (advertiserId = 2 OR name != 'Prebid 1')"})
+    self.assertEqual([order['name'] for order in response['results']],
+      ['Prebid 1'])
+
+  def test_query_unparsable(self):
+    """
+    Ensure statements we can't parse fail like a PQL syntax error.
+    """
+    service = MemoryClient(self.network).GetService('OrderService')
+    with self.assertRaises(GoogleAdsServerFault) as context:
+      service.getOrdersByStatement({'query': 'WHERE name = '})
+    self.assertEqual(context.exception.errors[0]['errorString'],
+      'PublisherQueryLanguageSyntaxError.UNPARSABLE')
+
+
+class MemoryClientTests(TestCase):
+
+  def test_service_methods(self):
+    """
+    Ensure services expose the create and query methods of their objects.
+    """
+    client = MemoryClient(MemoryNetwork())
+    service = client.GetService('CustomTargetingService')
+    self.assertTrue(callable(service.createCustomTargetingValues))
+    self.assertTrue(callable(service.getCustomTargetingKeysByStatement))
+    with self.assertRaises(ValueError):
+      client.GetService('ReportService')
+
+  @patch('time.sleep')
+  def test_latency(self, mock_sleep):
+    """
+    Ensure every call takes the configured latency.
+    """
+    service = MemoryClient(MemoryNetwork(), latency=0.25).GetService(
+      'UserService')
+    service.getUsersByStatement({'query': 'LIMIT 1'})
+    mock_sleep.assert_called_once_with(0.25)
+
+
+@patch.multiple('settings', DFP_BACKEND='memory', DFP_MEMORY_LATENCY=0,
+  DFP_USER_EMAIL_ADDRESS='me@example.com', create=True)
+class MemoryBackendTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+
+  def tearDown(self):
+    dfp.client.reset_clients()
+
+  def test_seeded_from_settings(self):
+    """
+    Ensure the simulated network has the user named in settings.
+    """
+    self.assertIsInstance(dfp.client.get_client(), MemoryClient)
+    user_id = dfp.get_users.get_user_id_by_email('me@example.com')
+    self.assertIsInstance(user_id, int)
+
+  def test_targeting_round_trip(self):
+    """
+    Ensure values created through the project's functions can be read back.
+    """
+    key_id = dfp.create_custom_targeting.create_targeting_key('hb_pb')
+    value_id = dfp.create_custom_targeting.create_targeting_value('0.50',
+      key_id)
+
+    self.assertEqual(dfp.get_custom_targeting.get_key_id_by_name('hb_pb'),
+      key_id)
+    values = dfp.get_custom_targeting.get_targeting_by_key_name('hb_pb')
+    self.assertEqual([(value['id'], value['name']) for value in values],
+      [(value_id, '0.50')])
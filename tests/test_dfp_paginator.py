@@ -0,0 +1,257 @@
+
+import threading
+from unittest import TestCase
+
+from googleads import ad_manager
+from mock import MagicMock, patch
+
+import dfp.client
+import dfp.paginator
+from dfp.exceptions import BadSettingException
+from dfp.memory_backend import MemoryNetwork
+from dfp.paginator import KeysetPaginator, Paginator, fetch_all, paginate
+
+
+def make_query_method(objects, total=True):
+  """
+  Returns a mock get*ByStatement method that pages through `objects`.
+  """
+  def query(statement):
+    words = statement['query'].split()
+    limit = int(words[words.index('LIMIT') + 1])
+    offset = int(words[words.index('OFFSET') + 1])
+    response = {'startIndex': offset}
+    if total:
+      response['totalResultSetSize'] = len(objects)
+    page = objects[offset:offset + limit]
+    if page:
+      response['results'] = page
+    return response
+  return MagicMock(side_effect=query)
+
+def get_offsets(query_method):
+  return sorted(int(args[0]['query'].split()[-1]) for args, kwargs in
+    query_method.call_args_list)
+
+
+class PaginatorTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+    self.objects = [{'id': index} for index in range(10)]
+
+  def test_pages_in_order(self):
+    """
+    Ensure every object is yielded once, in order, with one request per page.
+    """
+    query_method = make_query_method(self.objects)
+    paginator = Paginator(query_method, page_size=3, prefetch_pages=2)
+
+    self.assertEqual(list(paginator), self.objects)
+    self.assertEqual(get_offsets(query_method), [0, 3, 6, 9])
+    self.assertEqual(paginator.requests, 4)
+    self.assertEqual(paginator.total, 10)
+
+  def test_statement(self):
+    """
+    Ensure the paginator keeps the statement's filter and sets its limit.
+    """
+    query_method = make_query_method(self.objects)
+    statement = (ad_manager.StatementBuilder(where='id < :id')
+      .WithBindVariable('id', 100))
+    list(paginate(query_method, statement, page_size=5))
+
+    self.assertEqual(query_method.call_args_list[1][0][0], {
+      'query': 'WHERE id < :id LIMIT 5 OFFSET 5',
+      'values': [{'key': 'id',
+        'value': {'value': 100, 'xsi_type': 'NumberValue'}}],
+    })
+
+  @patch('settings.DFP_MAX_CONCURRENCY', 3, create=True)
+  def test_prefetches_concurrently(self):
+    """
+    Ensure the pages after the first are requested at the same time.
+    """
+    # Each of the three pages after the first waits for the other two, so
+    # this only finishes if they are in flight together.
+    barrier = threading.Barrier(3, timeout=5)
+    query = make_query_method(self.objects[:8]).side_effect
+
+    def query_method(statement):
+      if not statement['query'].endswith('OFFSET 0'):
+        barrier.wait()
+      return query(statement)
+
+    objects = list(paginate(query_method, page_size=2, prefetch_pages=3))
+    self.assertEqual(objects, self.objects[:8])
+
+  def test_no_total(self):
+    """
+    Ensure we page until an empty page when DFP does not send a total.
+    """
+    query_method = make_query_method(self.objects, total=False)
+    objects = list(paginate(query_method, page_size=4))
+
+    self.assertEqual(objects, self.objects)
+    self.assertEqual(get_offsets(query_method), [0, 4, 8, 12])
+
+  def test_empty(self):
+    """
+    Ensure an empty result set takes one request.
+    """
+    query_method = make_query_method([])
+    self.assertEqual(list(paginate(query_method)), [])
+    query_method.assert_called_once()
+
+  def test_result_set_shrinks(self):
+    """
+    Ensure we stop at the first empty page if objects go away while paging.
+    """
+    query = make_query_method(self.objects).side_effect
+
+    def query_method(statement):
+      response = query(statement)
+      if not statement['query'].endswith('OFFSET 0'):
+        response.pop('results', None)
+      return response
+
+    objects = list(paginate(query_method, page_size=3, prefetch_pages=1))
+    self.assertEqual(objects, self.objects[:3])
+
+  def test_page_size_setting(self):
+    """
+    Ensure the page size comes from the settings and is bounded.
+    """
+    with patch('settings.DFP_PAGE_SIZE', None, create=True):
+      self.assertEqual(dfp.paginator.get_page_size(), 500)
+    with patch('settings.DFP_PAGE_SIZE', 200, create=True):
+      self.assertEqual(dfp.paginator.get_page_size(), 200)
+    for page_size in (0, 501, '100'):
+      with patch('settings.DFP_PAGE_SIZE', page_size, create=True):
+        with self.assertRaises(BadSettingException):
+          dfp.paginator.get_page_size()
+
+
+class KeysetPaginatorTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+    self.network = MemoryNetwork()
+    self.network.create('CustomTargetingValues', [
+      {'name': '{0:.2f}'.format(index / 10.0), 'customTargetingKeyId': key_id}
+      for index in range(25) for key_id in (1, 2)])
+    self.query_method = MagicMock(side_effect=lambda statement:
+      self.network.query('CustomTargetingValues', statement))
+    self.expected = [obj for obj in
+      self.network.query('CustomTargetingValues', {'query': '',
+        'values': None})['results'] if obj['customTargetingKeyId'] == 1]
+
+  def test_scan(self):
+    """
+    Ensure a single range pages by id, with no offsets.
+    """
+    paginator = KeysetPaginator(self.query_method,
+      'customTargetingKeyId = :keyId', {'keyId': 1}, page_size=10, ranges=1)
+
+    self.assertEqual(list(paginator), self.expected)
+    self.assertEqual(paginator.requests, 3)
+    statements = [args[0] for args, kwargs in
+      self.query_method.call_args_list]
+    self.assertEqual(statements[0]['query'], 'WHERE (customTargetingKeyId = '
+      ':keyId) ORDER BY id ASC LIMIT 10')
+    self.assertEqual(statements[1]['query'], 'WHERE (customTargetingKeyId = '
+      ':keyId) AND id > :keysetLowerId ORDER BY id ASC LIMIT 10')
+    self.assertEqual(statements[1]['values'][1], {'key': 'keysetLowerId',
+      'value': {'value': self.expected[9]['id'], 'xsi_type': 'NumberValue'}})
+    for statement in statements:
+      self.assertNotIn('OFFSET', statement['query'])
+
+  def test_ranges(self):
+    """
+    Ensure the id space is split into ranges, scanned concurrently and
+    returned in id order.
+    """
+    paginator = KeysetPaginator(self.query_method,
+      'customTargetingKeyId = :keyId', {'keyId': 1}, page_size=5, ranges=3)
+
+    self.assertEqual(list(paginator), self.expected)
+    queries = [args[0]['query'] for args, kwargs in
+      self.query_method.call_args_list]
+    self.assertTrue(queries[0].endswith('ORDER BY id ASC LIMIT 1'))
+    self.assertTrue(queries[1].endswith('ORDER BY id DESC LIMIT 1'))
+    # The first range has no lower bound and the last no upper bound.
+    first_pages = [query for query in queries[2:]
+      if 'keysetLowerId' not in query or 'keysetUpperId' not in query]
+    self.assertIn('WHERE (customTargetingKeyId = :keyId) AND '
+      'id <= :keysetUpperId ORDER BY id ASC LIMIT 5', first_pages)
+    self.assertIn('WHERE (customTargetingKeyId = :keyId) AND '
+      'id > :keysetLowerId ORDER BY id ASC LIMIT 5', first_pages)
+    self.assertIn('WHERE (customTargetingKeyId = :keyId) AND '
+      'id > :keysetLowerId AND id <= :keysetUpperId ORDER BY id ASC LIMIT 5',
+      queries)
+
+  def test_ranges_stream(self):
+    """
+    Ensure the first range is read as it arrives, and the others fetch
+    only one page ahead.
+    """
+    self.network.create('CustomTargetingValues', [
+      {'name': str(index), 'customTargetingKeyId': 3}
+      for index in range(200)])
+    paginator = KeysetPaginator(self.query_method,
+      'customTargetingKeyId = :keyId', {'keyId': 3}, page_size=5, ranges=4)
+    objects = iter(paginator)
+
+    first = next(objects)
+    # The boundary lookups, then at most one page per range.
+    self.assertLessEqual(paginator.requests, 2 + 4)
+    self.assertEqual(first['name'], '0')
+
+    # Reading the first range (10 pages) leaves the others a page ahead.
+    for _ in range(49):
+      next(objects)
+    self.assertLessEqual(paginator.requests, 2 + 10 + 3 + 1)
+
+    self.assertEqual([obj['name'] for obj in objects],
+      [str(index) for index in range(50, 200)])
+
+  def test_ranges_small_set(self):
+    """
+    Ensure a set that fits in one page is not split.
+    """
+    objects = list(KeysetPaginator(self.query_method,
+      'customTargetingKeyId = :keyId', {'keyId': 1}, page_size=100,
+      ranges=4))
+
+    self.assertEqual(objects, self.expected)
+    self.assertEqual(self.query_method.call_count, 2)
+
+  def test_ranges_empty(self):
+    """
+    Ensure an empty set takes one request.
+    """
+    objects = list(KeysetPaginator(self.query_method,
+      'customTargetingKeyId = :keyId', {'keyId': 3}, ranges=4))
+
+    self.assertEqual(objects, [])
+    self.query_method.assert_called_once()
+
+  def test_fetch_all_modes(self):
+    """
+    Ensure `DFP_PAGINATION` picks offset or keyset pagination.
+    """
+    with patch('settings.DFP_PAGINATION', 'offset', create=True):
+      self.assertEqual(list(fetch_all(self.query_method,
+        'customTargetingKeyId = :keyId', {'keyId': 1})), self.expected)
+    self.assertEqual(self.query_method.call_args[0][0]['query'],
+      'WHERE customTargetingKeyId = :keyId LIMIT 500 OFFSET 0')
+
+    with patch('settings.DFP_PAGINATION', 'keyset', create=True):
+      self.assertEqual(list(fetch_all(self.query_method,
+        'customTargetingKeyId = :keyId', {'keyId': 1})), self.expected)
+    self.assertIn('ORDER BY id ASC',
+      self.query_method.call_args[0][0]['query'])
+
+    with patch('settings.DFP_PAGINATION', 'cursor', create=True):
+      with self.assertRaises(BadSettingException):
+        fetch_all(self.query_method)
@@ -0,0 +1,166 @@
+
+from unittest import TestCase
+
+from googleads.errors import GoogleAdsServerFault
+from mock import MagicMock, patch
+
+import dfp.client
+import dfp.pql
+from dfp.lookup import get_objects_by_name
+from dfp.memory_backend import MemoryNetwork, MemoryService
+from dfp.pql import Selection, parse_result_set, select_objects
+
+
+def fault(error_string):
+  return GoogleAdsServerFault(None,
+    errors=[{'errorString': error_string, 'fieldPath': '', 'trigger': ''}])
+
+
+class ParseResultSetTests(TestCase):
+
+  def test_parse_result_set(self):
+    """
+    Ensure rows become dicts keyed by field, with Python values.
+    """
+    result_set = {
+      'columnTypes': [{'labelName': 'Id'}, {'labelName': 'Name'},
+        {'labelName': 'ParentId'}, {'labelName': 'TargetPlatforms'}],
+      'rows': [{'values': [
+        {'xsi_type': 'NumberValue', 'value': '123'},
+        {'xsi_type': 'TextValue', 'value': 'Leaderboard'},
+        None,
+        {'xsi_type': 'SetValue', 'values': [
+          {'xsi_type': 'TextValue', 'value': 'WEB'}]},
+      ]}],
+    }
+    self.assertEqual(parse_result_set(result_set), [{
+      'id': 123,
+      'name': 'Leaderboard',
+      'parentId': None,
+      'targetPlatforms': ['WEB'],
+    }])
+
+  def test_parse_empty_result_set(self):
+    """
+    Ensure a result set without rows has no objects.
+    """
+    self.assertEqual(parse_result_set({'columnTypes': [{'labelName': 'Id'}]}),
+      [])
+
+
+@patch.multiple('settings', DFP_PQL_LOOKUPS=True, create=True)
+class SelectionTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+    self.network = MemoryNetwork()
+    self.network.create('AdUnits', [{'name': 'unit-{0}'.format(index),
+      'adUnitCode': 'code-{0}'.format(index)} for index in range(5)])
+    self.network.create('Placements', [{'name': 'placement', 'status':
+      'ACTIVE'}])
+    self.pql_service = MemoryService(self.network,
+      'PublisherQueryLanguageService')
+    self.pql_service.select = MagicMock(wraps=self.pql_service.select)
+    patcher = patch('dfp.pql.get_service', return_value=self.pql_service)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def query_method(self, entity):
+    return MagicMock(side_effect=lambda statement:
+      self.network.query(entity, statement))
+
+  def test_select(self):
+    """
+    Ensure supported types are selected with PQL, with only their columns.
+    """
+    query_method = self.query_method('AdUnits')
+    selection = Selection('AdUnits', ['id', 'name'], query_method,
+      'name IN (:names)', {'names': ['unit-1', 'unit-3']})
+
+    self.assertEqual([obj['name'] for obj in selection], ['unit-1', 'unit-3'])
+    self.assertTrue(selection.used_pql)
+    self.assertEqual(selection.requests, 1)
+    query_method.assert_not_called()
+    self.assertEqual(self.pql_service.select.call_args[0][0]['query'],
+      'SELECT Id, Name FROM Ad_Unit WHERE name IN (:names) LIMIT 500 '
+      'OFFSET 0')
+
+  @patch('settings.DFP_PAGE_SIZE', 2, create=True)
+  def test_select_pages(self):
+    """
+    Ensure selects page until a short page.
+    """
+    objects = select_objects('AdUnits', ['id', 'adUnitCode'],
+      self.query_method('AdUnits'))
+
+    self.assertEqual([obj['adUnitCode'] for obj in objects],
+      ['code-{0}'.format(index) for index in range(5)])
+    self.assertEqual(self.pql_service.select.call_count, 3)
+
+  def test_unsupported_type(self):
+    """
+    Ensure types without a PQL table are fetched whole and cut down.
+    """
+    query_method = self.query_method('Placements')
+    objects = select_objects('Placements', ['id', 'name'], query_method)
+
+    self.assertEqual(objects, [{'id': 1000006, 'name': 'placement'}])
+    query_method.assert_called_once()
+    self.pql_service.select.assert_not_called()
+
+  def test_disabled(self):
+    """
+    Ensure PQL is not used unless enabled.
+    """
+    query_method = self.query_method('AdUnits')
+    with patch('settings.DFP_PQL_LOOKUPS', False):
+      self.assertEqual(len(select_objects('AdUnits', ['id'], query_method)),
+        5)
+    query_method.assert_called_once()
+    self.pql_service.select.assert_not_called()
+
+  @patch('dfp.pql.logger')
+  def test_fallback(self, mock_logger):
+    """
+    Ensure a select DFP rejects falls back to *ByStatement, and is not
+    tried again this run.
+    """
+    self.pql_service.select.side_effect = fault(
+      'PublisherQueryLanguageContextError.UNEXECUTABLE')
+    query_method = self.query_method('AdUnits')
+
+    selection = Selection('AdUnits', ['id', 'name'], query_method,
+      'name = :name', {'name': 'unit-2'})
+    self.assertEqual([obj['name'] for obj in selection], ['unit-2'])
+    self.assertFalse(selection.used_pql)
+    self.assertEqual(selection.requests, 2)
+    mock_logger.warning.assert_called_once()
+
+    select_objects('AdUnits', ['id'], query_method)
+    self.pql_service.select.assert_called_once()
+
+    dfp.client.reset_clients()
+    select_objects('AdUnits', ['id'], query_method)
+    self.assertEqual(self.pql_service.select.call_count, 2)
+
+  def test_other_faults(self):
+    """
+    Ensure faults unrelated to PQL are raised.
+    """
+    self.pql_service.select.side_effect = fault('QuotaError.EXCEEDED_QUOTA')
+    with self.assertRaises(GoogleAdsServerFault):
+      select_objects('AdUnits', ['id'], self.query_method('AdUnits'))
+
+  @patch('dfp.lookup.get_snapshot', return_value=None)
+  def test_lookup(self, mock_get_snapshot):
+    """
+    Ensure name lookups select ids and names for supported types.
+    """
+    query_method = self.query_method('AdUnits')
+    ad_units = get_objects_by_name(query_method, ['unit-4', 'unit-0'],
+      'ad unit', snapshot_entity='AdUnits')
+
+    self.assertEqual(ad_units, [{'id': 1000005, 'name': 'unit-4'},
+      {'id': 1000001, 'name': 'unit-0'}])
+    query_method.assert_not_called()
+    self.pql_service.select.assert_called_once()
@@ -0,0 +1,108 @@
+
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+import dfp.client
+import dfp.rate_limit
+from dfp.rate_limit import RateLimitedService, TokenBucket
+
+
+class FakeClock(object):
+
+  def __init__(self):
+    self.now = 100.0
+
+  def monotonic(self):
+    return self.now
+
+  def sleep(self, seconds):
+    self.now += seconds
+
+
+class TokenBucketTests(TestCase):
+
+  def setUp(self):
+    self.clock = FakeClock()
+    patcher = patch.multiple('time', monotonic=self.clock.monotonic,
+      sleep=self.clock.sleep)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def test_burst_then_rate(self):
+    """
+    Ensure a burst goes through at once and later calls wait for the rate.
+    """
+    bucket = TokenBucket(rate=2, burst=3)
+    waits = [bucket.acquire() for _ in range(5)]
+    self.assertEqual(waits, [0, 0, 0, 0.5, 0.5])
+    self.assertEqual(bucket.calls, 5)
+    self.assertEqual(bucket.waited_calls, 2)
+    self.assertEqual(bucket.total_wait, 1.0)
+    self.assertEqual(bucket.max_wait, 0.5)
+
+  def test_refill(self):
+    """
+    Ensure tokens come back over time, up to the burst.
+    """
+    bucket = TokenBucket(rate=2, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+    self.clock.now += 10
+    self.assertEqual([bucket.acquire() for _ in range(3)], [0, 0, 0.5])
+
+  def test_no_limit(self):
+    """
+    Ensure calls never wait without a rate, but are still counted.
+    """
+    bucket = TokenBucket()
+    self.assertEqual([bucket.acquire() for _ in range(50)], [0] * 50)
+    self.assertEqual(bucket.calls, 50)
+    self.assertIn('50 DFP calls, 0 of them rate limited', bucket.summary())
+
+
+class RateLimitedServiceTests(TestCase):
+
+  def test_calls_wait_for_bucket(self):
+    """
+    Ensure service methods take a token and return the service's response.
+    """
+    bucket = MagicMock()
+    service = MagicMock()
+    service.getOrdersByStatement.return_value = {'results': []}
+
+    limited = RateLimitedService(service, bucket)
+
+    self.assertEqual(limited.getOrdersByStatement('statement'),
+      {'results': []})
+    service.getOrdersByStatement.assert_called_once_with('statement')
+    bucket.acquire.assert_called_once_with()
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+class ClientRateLimitTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+
+  @patch.multiple('settings', DFP_REQUESTS_PER_SECOND=5, DFP_REQUESTS_BURST=10,
+    create=True)
+  def test_services_share_network_bucket(self, mock_load_from_storage):
+    """
+    Ensure every service of a network shares one configured bucket.
+    """
+    mock_load_from_storage.return_value.network_code = '1234'
+    order_service = dfp.client.get_service('OrderService')
+    line_item_service = dfp.client.get_service('LineItemService')
+
+    bucket = dfp.rate_limit.get_buckets()['1234']
+    self.assertIs(order_service.bucket, bucket)
+    self.assertIs(line_item_service.bucket, bucket)
+    self.assertEqual((bucket.rate, bucket.burst), (5, 10))
+
+    order_service.getOrdersByStatement({})
+    line_item_service.createLineItems([])
+    self.assertEqual(bucket.calls, 2)
+
+    dfp.client.reset_clients()
+    self.assertEqual(dfp.rate_limit.get_buckets(), {})
@@ -0,0 +1,119 @@
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from googleads.errors import GoogleAdsServerFault
+from mock import MagicMock, patch
+
+import dfp.client
+
+from dfp.recording import (Recording, RecordingClient, RecordingNotFound,
+  ReplayClient)
+
+
+class RecordingTests(TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, 'recording.json')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def record(self):
+    """
+    Records two order lookups and a failed creation.
+    """
+    client = MagicMock()
+    order_service = client.GetService.return_value
+    order_service.getOrdersByStatement.side_effect = [
+      {'totalResultSetSize': 0, 'results': []},
+      {'totalResultSetSize': 1, 'results': [{'id': 5, 'name': 'Prebid'}]},
+    ]
+    order_service.createOrders.side_effect = GoogleAdsServerFault(None,
+      errors=[MagicMock(errorString='QuotaError.EXCEEDED_QUOTA')],
+      message='Too many requests')
+
+    service = RecordingClient(client, Recording(self.path)).GetService(
+      'OrderService', version='v202508')
+    statement = {'query': 'WHERE name = :name', 'values': []}
+    service.getOrdersByStatement(statement)
+    service.getOrdersByStatement(statement)
+    with self.assertRaises(GoogleAdsServerFault):
+      service.createOrders([{'name': 'Prebid'}])
+    client.GetService.assert_called_once_with('OrderService',
+      version='v202508')
+
+  def test_record_and_replay(self):
+    """
+    Ensure replayed calls return the recorded responses in order.
+    """
+    self.record()
+    recording = Recording(self.path)
+    recording.load()
+    self.assertEqual(len(recording.interactions), 3)
+
+    service = ReplayClient(recording).GetService('OrderService')
+    statement = {'query': 'WHERE name = :name', 'values': []}
+    self.assertEqual(service.getOrdersByStatement(statement)['results'], [])
+    self.assertEqual(service.getOrdersByStatement(statement)['results'],
+      [{'id': 5, 'name': 'Prebid'}])
+    # The last response repeats.
+    self.assertEqual(
+      service.getOrdersByStatement(statement)['totalResultSetSize'], 1)
+
+  def test_replay_fault(self):
+    """
+    Ensure recorded faults are raised again.
+    """
+    self.record()
+    recording = Recording(self.path)
+    recording.load()
+    service = ReplayClient(recording).GetService('OrderService')
+
+    with self.assertRaises(GoogleAdsServerFault) as context:
+      service.createOrders([{'name': 'Prebid'}])
+    self.assertEqual(context.exception.errors,
+      [{'errorString': 'QuotaError.EXCEEDED_QUOTA'}])
+
+  def test_replay_through_get_service(self):
+    """
+    Ensure the replay backend serves calls made through `get_service`.
+    """
+    self.record()
+    dfp.client.reset_clients()
+    self.addCleanup(dfp.client.reset_clients)
+
+    with patch.multiple('settings', DFP_BACKEND='replay',
+      DFP_RECORDING_FILE=self.path, create=True):
+      service = dfp.client.get_service('OrderService')
+      statement = {'query': 'WHERE name = :name', 'values': []}
+      self.assertEqual(service.getOrdersByStatement(statement)['results'], [])
+
+  def test_replay_unrecorded_call(self):
+    """
+    Ensure calls that were not recorded fail loudly.
+    """
+    self.record()
+    recording = Recording(self.path)
+    recording.load()
+    service = ReplayClient(recording).GetService('OrderService')
+
+    with self.assertRaises(RecordingNotFound):
+      service.getOrdersByStatement({'query': 'WHERE id = 1', 'values': []})
+    with self.assertRaises(AttributeError):
+      service.getLineItemsByStatement
+
+  def test_one_line_per_call(self):
+    """
+    Ensure each call adds a line, and a new recording replaces the old one.
+    """
+    self.record()
+    with open(self.path) as recording_file:
+      self.assertEqual(len(recording_file.readlines()), 3)
+
+    self.record()
+    with open(self.path) as recording_file:
+      self.assertEqual(len(recording_file.readlines()), 3)
@@ -0,0 +1,172 @@
+
+from unittest import TestCase
+
+from googleads.errors import GoogleAdsServerFault
+from mock import MagicMock, patch
+import requests.exceptions
+import zeep.exceptions
+
+import dfp.client
+import dfp.retry
+from dfp.retry import RetryPolicy, RetryingService, is_transient
+
+
+def fault(*error_strings):
+  return GoogleAdsServerFault(None, errors=[MagicMock(errorString=error_string)
+    for error_string in error_strings])
+
+
+class TransientErrorTests(TestCase):
+
+  def test_faults(self):
+    """
+    Ensure faults are transient only when every error is.
+    """
+    self.assertTrue(is_transient(fault('QuotaError.EXCEEDED_QUOTA'), True))
+    self.assertTrue(is_transient(GoogleAdsServerFault(None,
+      errors=[{'errorString': 'ServerError.SERVER_ERROR'}]), False))
+    self.assertFalse(is_transient(fault('ServerError.SERVER_ERROR',
+      'UniqueError.NOT_UNIQUE'), True))
+    self.assertFalse(is_transient(fault(), False))
+
+  def test_write_faults(self):
+    """
+    Ensure writes are only retried after quota faults, since a server error
+    may have saved part of the batch.
+    """
+    self.assertTrue(is_transient(fault('QuotaError.EXCEEDED_QUOTA'), True))
+    self.assertFalse(is_transient(fault('ServerError.SERVER_ERROR'), True))
+    self.assertFalse(is_transient(
+      fault('InternalApiError.UNEXPECTED_INTERNAL_API_ERROR'), True))
+
+  def test_connection_errors(self):
+    """
+    Ensure lost connections are only retried for reads.
+    """
+    read_timeout = requests.exceptions.ReadTimeout()
+    self.assertTrue(is_transient(read_timeout, False))
+    self.assertFalse(is_transient(read_timeout, True))
+    self.assertFalse(is_transient(requests.exceptions.ConnectionError(), True))
+    self.assertTrue(is_transient(requests.exceptions.ConnectTimeout(), True))
+    self.assertTrue(is_transient(
+      zeep.exceptions.TransportError(status_code=503), False))
+    self.assertFalse(is_transient(
+      zeep.exceptions.TransportError(status_code=404), False))
+    self.assertFalse(is_transient(ValueError(), False))
+
+
+@patch('time.sleep')
+class RetryPolicyTests(TestCase):
+
+  def test_retries_transient_fault(self, mock_sleep):
+    """
+    Ensure transient faults are retried and logged until the call works.
+    """
+    func = MagicMock(side_effect=[fault('QuotaError.EXCEEDED_QUOTA'),
+      fault('QuotaError.EXCEEDED_QUOTA'), ['created']])
+    policy = RetryPolicy(max_attempts=5, base_delay=1, max_delay=60)
+
+    result = policy.call(func, 'LineItemService', 'createLineItems', [1])
+
+    self.assertEqual(result, ['created'])
+    self.assertEqual(func.call_count, 3)
+    self.assertEqual([(record.method, record.attempt) for record in
+      policy.retries], [('createLineItems', 1), ('createLineItems', 2)])
+    self.assertEqual(mock_sleep.call_count, 2)
+    self.assertEqual(policy.summary(),
+      u'2 DFP calls retried: LineItemService.createLineItems x2.')
+
+  def test_does_not_retry_permanent_fault(self, mock_sleep):
+    """
+    Ensure faults caused by the request are raised at once.
+    """
+    func = MagicMock(side_effect=fault('UniqueError.NOT_UNIQUE'))
+    policy = RetryPolicy()
+
+    with self.assertRaises(GoogleAdsServerFault):
+      policy.call(func, 'OrderService', 'createOrders', [])
+    func.assert_called_once()
+    mock_sleep.assert_not_called()
+
+  def test_does_not_retry_write_server_error(self, mock_sleep):
+    """
+    Ensure a write that hit a server error is not retried.
+    """
+    func = MagicMock(side_effect=fault('ServerError.SERVER_ERROR'))
+    policy = RetryPolicy()
+
+    with self.assertRaises(GoogleAdsServerFault):
+      policy.call(func, 'CreativeService', 'createCreatives', [])
+    func.assert_called_once()
+    mock_sleep.assert_not_called()
+
+  def test_does_not_retry_ambiguous_write(self, mock_sleep):
+    """
+    Ensure a write whose outcome is unknown is not retried.
+    """
+    func = MagicMock(side_effect=requests.exceptions.ReadTimeout())
+    policy = RetryPolicy()
+
+    with self.assertRaises(requests.exceptions.ReadTimeout):
+      policy.call(func, 'LineItemCreativeAssociationService',
+        'createLineItemCreativeAssociations', [])
+    func.assert_called_once()
+
+  def test_max_attempts(self, mock_sleep):
+    """
+    Ensure a call is tried at most `max_attempts` times.
+    """
+    func = MagicMock(side_effect=requests.exceptions.ReadTimeout())
+    policy = RetryPolicy(max_attempts=3)
+
+    with self.assertRaises(requests.exceptions.ReadTimeout):
+      policy.call(func, 'OrderService', 'getOrdersByStatement', {})
+    self.assertEqual(func.call_count, 3)
+
+  def test_budget(self, mock_sleep):
+    """
+    Ensure retries stop for every call once the budget is spent.
+    """
+    func = MagicMock(side_effect=fault('ServerError.SERVER_ERROR'))
+    policy = RetryPolicy(max_attempts=10, budget=3)
+
+    with self.assertRaises(GoogleAdsServerFault):
+      policy.call(func, 'OrderService', 'getOrdersByStatement', {})
+    self.assertEqual(func.call_count, 4)
+
+    func.reset_mock()
+    with self.assertRaises(GoogleAdsServerFault):
+      policy.call(func, 'OrderService', 'getOrdersByStatement', {})
+    func.assert_called_once()
+
+  @patch('random.uniform')
+  def test_capped_backoff(self, mock_uniform, mock_sleep):
+    """
+    Ensure delays double per attempt up to the cap, with full jitter.
+    """
+    mock_uniform.side_effect = lambda low, high: high
+    policy = RetryPolicy(base_delay=2, max_delay=10)
+    self.assertEqual([policy.get_delay(attempt) for attempt in range(1, 6)],
+      [2, 4, 8, 10, 10])
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+class ClientRetryTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+
+  @patch('time.sleep')
+  def test_services_retry(self, mock_sleep, mock_load_from_storage):
+    """
+    Ensure service proxies retry transient faults.
+    """
+    service = mock_load_from_storage.return_value.GetService.return_value
+    service.createCreatives.side_effect = [
+      fault('QuotaError.EXCEEDED_QUOTA'), [{'id': 1}]]
+
+    creative_service = dfp.client.get_service('CreativeService')
+
+    self.assertIsInstance(creative_service, RetryingService)
+    self.assertEqual(creative_service.createCreatives([{}]), [{'id': 1}])
+    self.assertEqual(len(dfp.retry.get_policy().retries), 1)
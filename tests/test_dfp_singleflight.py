@@ -0,0 +1,91 @@
+
+import threading
+from unittest import TestCase
+
+from mock import MagicMock
+
+from dfp.singleflight import SingleFlight
+
+
+class SingleFlightTests(TestCase):
+
+  def setUp(self):
+    self.flights = SingleFlight()
+    self.started = threading.Event()
+    self.release = threading.Event()
+
+  def slow_call(self, result=None, error=None):
+    def call():
+      self.started.set()
+      self.release.wait(5)
+      if error is not None:
+        raise error
+      return result
+    return MagicMock(side_effect=call)
+
+  def run_followers(self, key, func, count):
+    """
+    Starts a leader call for `key`, then `count` identical calls while it is
+    in progress. Returns what every call returned or raised.
+    """
+    outcomes = []
+    lock = threading.Lock()
+
+    def run():
+      try:
+        outcome = self.flights.call(key, func)
+      except Exception as error:
+        outcome = error
+      with lock:
+        outcomes.append(outcome)
+
+    leader = threading.Thread(target=run)
+    leader.start()
+    self.started.wait(5)
+    followers = [threading.Thread(target=run) for _ in range(count)]
+    for follower in followers:
+      follower.start()
+    # Wait until every follower is waiting on the leader's call.
+    while self.flights.shared < count:
+      threading.Event().wait(0.001)
+    self.release.set()
+    for thread in [leader] + followers:
+      thread.join(5)
+    return outcomes
+
+  def test_shares_result(self):
+    """
+    Ensure identical concurrent calls make one call and share its result.
+    """
+    func = self.slow_call(result=42)
+    outcomes = self.run_followers('hb_pb', func, 3)
+
+    self.assertEqual(outcomes, [42] * 4)
+    func.assert_called_once_with()
+    self.assertEqual((self.flights.calls, self.flights.shared), (1, 3))
+
+  def test_shares_error(self):
+    """
+    Ensure every waiting caller gets the call's exception.
+    """
+    error = ValueError('nope')
+    outcomes = self.run_followers('hb_pb', self.slow_call(error=error), 2)
+    self.assertEqual(outcomes, [error] * 3)
+
+  def test_sequential_calls(self):
+    """
+    Ensure a call made after another finished is made again.
+    """
+    func = MagicMock(return_value=1)
+    self.flights.call('hb_pb', func)
+    self.flights.call('hb_pb', func)
+    self.assertEqual(func.call_count, 2)
+
+  def test_different_keys(self):
+    """
+    Ensure calls with different keys are not shared.
+    """
+    func = MagicMock(side_effect=lambda: self.flights.call('hb_bidder',
+      lambda: 'inner'))
+    self.assertEqual(self.flights.call('hb_pb', func), 'inner')
+    self.assertEqual(self.flights.shared, 0)
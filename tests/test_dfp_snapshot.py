@@ -0,0 +1,124 @@
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import patch
+
+import dfp.client
+import dfp.get_placements
+import dfp.get_users
+import dfp.memory_backend
+import dfp.snapshot
+from dfp.snapshot import Snapshot
+
+
+class SnapshotTests(TestCase):
+
+  def setUp(self):
+    # The simulated network is seeded from settings when it is created.
+    for patcher in [
+      patch.dict('os.environ', {'DFP_BACKEND': 'memory'}),
+      patch.multiple('settings', DFP_USER_EMAIL_ADDRESS='me@example.com',
+        DFP_TARGETED_PLACEMENT_NAMES=['Placement One', 'Placement Two'],
+        DFP_TARGETED_AD_UNIT_NAMES=[], create=True),
+    ]:
+      patcher.start()
+      self.addCleanup(patcher.stop)
+
+    dfp.client.reset_clients()
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, 'snapshot.sqlite')
+    self.network = dfp.memory_backend.get_network(None)
+    self.queries = []
+    self.network.query = self.record_query(self.network.query)
+
+  def tearDown(self):
+    dfp.client.reset_clients()
+    shutil.rmtree(self.directory)
+
+  def record_query(self, query):
+    def recorded(entity, statement):
+      self.queries.append((entity, statement['query']))
+      return query(entity, statement)
+    return recorded
+
+  def test_full_then_incremental_refresh(self):
+    """
+    Ensure the first refresh is full and later ones only fetch changes.
+    """
+    snapshot = Snapshot(self.path)
+    self.assertEqual(len(snapshot.find('None', 'Placements', 'name',
+      'Placement One')), 1)
+    self.assertEqual(self.queries,
+      [('Placements', 'ORDER BY id ASC LIMIT 500 OFFSET 0')])
+
+    self.network.create('Placements', [{'name': 'Placement Three'}])
+    snapshot.refresh('None', 'Placements')
+    self.assertEqual(self.queries[-1], ('Placements',
+      'WHERE lastModifiedDateTime >= :since ORDER BY id ASC LIMIT 500 '
+      'OFFSET 0'))
+    self.assertEqual(len(snapshot.find('None', 'Placements', 'name',
+      'Placement Three')), 1)
+    self.assertEqual(len(snapshot.find('None', 'Placements', 'name',
+      'Placement One')), 1)
+
+  def test_full_refresh_without_modified_filter(self):
+    """
+    Ensure types DFP can't filter by modification time are fetched in full.
+    """
+    snapshot = Snapshot(self.path)
+    snapshot.refresh('None', 'Users')
+    snapshot.refresh('None', 'Users')
+    self.assertEqual([query for entity, query in self.queries],
+      ['ORDER BY id ASC LIMIT 500 OFFSET 0'] * 2)
+
+  @patch('time.time')
+  def test_freshness_bound(self, mock_time):
+    """
+    Ensure a copy is only refreshed once it is older than the maximum age.
+    """
+    mock_time.return_value = 1000.0
+    snapshot = Snapshot(self.path, max_age=60)
+    snapshot.find('None', 'Users', 'email', 'me@example.com')
+    mock_time.return_value = 1059.0
+    snapshot.find('None', 'Users', 'email', 'me@example.com')
+    self.assertEqual(len(self.queries), 1)
+
+    mock_time.return_value = 1061.0
+    snapshot.find('None', 'Users', 'email', 'me@example.com')
+    self.assertEqual(len(self.queries), 2)
+
+  def test_persists_across_runs(self):
+    """
+    Ensure a later run answers from the file without fetching.
+    """
+    Snapshot(self.path).ensure_fresh('None', 'Users')
+    self.queries[:] = []
+    users = Snapshot(self.path).find('None', 'Users', 'email',
+      'me@example.com')
+    self.assertEqual(users[0]['email'], 'me@example.com')
+    self.assertEqual(self.queries, [])
+
+  def test_lookups_use_snapshot(self):
+    """
+    Ensure lookups by name answer from the snapshot when it is enabled, and
+    ask DFP for names it doesn't have.
+    """
+    with patch('settings.DFP_SNAPSHOT_FILE', self.path, create=True):
+      user_id = dfp.get_users.get_user_id_by_email('me@example.com')
+      dfp.get_placements.get_placement_ids_by_name(['Placement One'])
+      self.network.create('Placements', [{'name': 'New Placement'}])
+      placement_ids = dfp.get_placements.get_placement_ids_by_name(
+        ['Placement Two', 'New Placement'])
+
+    self.assertEqual(user_id,
+      self.network.objects['Users'][0]['id'])
+    self.assertEqual(placement_ids, [
+      self.network.objects['Placements'][1]['id'],
+      self.network.objects['Placements'][2]['id'],
+    ])
+    self.assertEqual([entity for entity, query in self.queries],
+      ['Users', 'Placements', 'Placements'])
+    self.assertIn('name IN (:names)', self.queries[-1][1])
@@ -0,0 +1,151 @@
+
+import datetime
+import os
+import shutil
+import stat
+import tempfile
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+import dfp.client
+import dfp.token_cache
+from dfp.token_cache import CachedServiceAccountClient, TokenCache
+
+
+def in_minutes(minutes):
+  return (datetime.datetime.utcnow() +
+    datetime.timedelta(minutes=minutes)).replace(microsecond=0)
+
+
+class TokenCacheTests(TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, 'tokens', 'oauth-token.json')
+    self.cache = TokenCache(self.path)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def test_set_and_get(self):
+    """
+    Ensure a stored token is returned with its expiry.
+    """
+    expiry = in_minutes(60)
+    self.cache.set('my-key', 'a-token', expiry)
+    self.assertEqual(self.cache.get('my-key'), ('a-token', expiry))
+    self.assertIsNone(self.cache.get('another-key'))
+
+  def test_file_permissions(self):
+    """
+    Ensure only the owner can access the cache file.
+    """
+    self.cache.set('my-key', 'a-token', in_minutes(60))
+    mode = stat.S_IMODE(os.stat(self.path).st_mode)
+    self.assertEqual(mode, 0o600)
+
+  def test_open_permissions_ignored(self):
+    """
+    Ensure we don't trust a cache file other users can access.
+    """
+    self.cache.set('my-key', 'a-token', in_minutes(60))
+    os.chmod(self.path, 0o644)
+    self.assertIsNone(self.cache.get('my-key'))
+
+  def test_expiring_token(self):
+    """
+    Ensure we don't return tokens expiring within the safety margin.
+    """
+    self.cache.set('expired', 'a-token', in_minutes(-1))
+    self.cache.set('expiring', 'a-token', in_minutes(2))
+    self.assertIsNone(self.cache.get('expired'))
+    self.assertIsNone(self.cache.get('expiring'))
+
+  def test_corrupt_file(self):
+    """
+    Ensure a corrupt cache file is treated as empty and then overwritten.
+    """
+    os.makedirs(os.path.dirname(self.path))
+    with open(self.path, 'w') as cache_file:
+      cache_file.write('{"my-key": {"token": ')
+    os.chmod(self.path, 0o600)
+    self.assertIsNone(self.cache.get('my-key'))
+
+    expiry = in_minutes(60)
+    self.cache.set('my-key', 'a-token', expiry)
+    self.assertEqual(self.cache.get('my-key'), ('a-token', expiry))
+
+
+@patch('google.oauth2.service_account.Credentials.from_service_account_file')
+@patch('googleads.oauth2.GoogleServiceAccountClient.Refresh')
+class CachedServiceAccountClientTests(TestCase):
+
+  def test_uses_cached_token(self, mock_refresh, mock_from_file):
+    """
+    Ensure we don't mint a token when a fresh one is cached.
+    """
+    expiry = in_minutes(60)
+    mock_from_file.return_value.service_account_email = 'sa@example.com'
+    token_cache = MagicMock()
+    token_cache.get.return_value = ('cached-token', expiry)
+
+    client = CachedServiceAccountClient('key.json', 'a-scope',
+      token_cache=token_cache)
+
+    mock_refresh.assert_not_called()
+    token_cache.get.assert_called_once_with('sa@example.com|a-scope|')
+    self.assertEqual(client.creds.token, 'cached-token')
+    self.assertEqual(client.creds.expiry, expiry)
+
+  def test_mints_and_stores_token(self, mock_refresh, mock_from_file):
+    """
+    Ensure we mint and store a new token when none is cached.
+    """
+    expiry = in_minutes(60)
+    creds = mock_from_file.return_value
+    creds.service_account_email = 'sa@example.com'
+    creds.token = 'new-token'
+    creds.expiry = expiry
+    token_cache = MagicMock()
+    token_cache.get.return_value = None
+
+    CachedServiceAccountClient('key.json', 'a-scope', sub='me@example.com',
+      token_cache=token_cache)
+
+    mock_refresh.assert_called_once()
+    token_cache.set.assert_called_once_with(
+      'sa@example.com|a-scope|me@example.com', 'new-token', expiry)
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+class ClientTokenCacheTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+
+  @patch('settings.DFP_OAUTH_TOKEN_CACHE_FILE', '/tmp/tokens.json',
+    create=True)
+  @patch('dfp.token_cache.load_client')
+  def test_client_uses_token_cache(self, mock_load_client,
+    mock_load_from_storage):
+    """
+    Ensure the client is loaded with the token cache when it is enabled.
+    """
+    client = dfp.client.get_client()
+
+    self.assertIs(client, mock_load_client.return_value)
+    args, kwargs = mock_load_client.call_args
+    self.assertEqual(args[1].path, '/tmp/tokens.json')
+    mock_load_from_storage.assert_not_called()
+
+  @patch('settings.DFP_OAUTH_TOKEN_CACHE_FILE', None, create=True)
+  @patch('dfp.token_cache.load_client')
+  def test_client_without_token_cache(self, mock_load_client,
+    mock_load_from_storage):
+    """
+    Ensure the token cache is opt-in.
+    """
+    dfp.client.get_client()
+    mock_load_client.assert_not_called()
+    mock_load_from_storage.assert_called_once()
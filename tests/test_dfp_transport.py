@@ -0,0 +1,160 @@
+
+import gzip
+from unittest import TestCase
+
+import requests
+from mock import MagicMock, patch
+
+import dfp.client
+import dfp.transport
+
+
+class DFPTransportTests(TestCase):
+
+  @patch.multiple('settings', DFP_MAX_CONCURRENCY=8, create=True)
+  def test_create_session_pool_size(self):
+    """
+    Ensure the connection pool matches the configured concurrency.
+    """
+    session = dfp.transport.create_session()
+    adapter = session.get_adapter('https://ads.google.com/apis/ads/')
+    self.assertEqual(adapter._pool_maxsize, 8)
+    self.assertTrue(adapter._pool_block)
+
+  def test_create_session_proxy_config(self):
+    """
+    Ensure the session uses the client's proxy settings.
+    """
+    proxy_config = MagicMock(proxies={'https': 'https://proxy:8443'},
+      cafile='/etc/ssl/my-ca.pem', disable_certificate_validation=False)
+    session = dfp.transport.create_session(proxy_config)
+    self.assertEqual(session.proxies, {'https': 'https://proxy:8443'})
+    self.assertEqual(session.verify, '/etc/ssl/my-ca.pem')
+
+  @patch.multiple('settings', DFP_HTTP_CONNECT_TIMEOUT=3,
+    DFP_HTTP_READ_TIMEOUT=120, create=True)
+  def test_attach_session(self):
+    """
+    Ensure a service sends its calls through the shared session with the
+    configured timeouts, and never closes it.
+    """
+    own_session = MagicMock(headers={'User-Agent': 'Zeep'})
+    service = MagicMock()
+    service.zeep_client.transport.session = own_session
+    service.zeep_client.transport._close_session = True
+    session = requests.Session()
+
+    dfp.transport.attach_session(service, session)
+
+    transport = service.zeep_client.transport
+    self.assertIs(transport.session, session)
+    self.assertEqual(transport.operation_timeout, (3, 120))
+    self.assertFalse(transport._close_session)
+    self.assertEqual(session.headers['User-Agent'], 'Zeep')
+    own_session.close.assert_called_once_with()
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+class ClientTransportTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+
+  @patch('dfp.transport.attach_session')
+  def test_services_share_session(self, mock_attach_session,
+    mock_load_from_storage):
+    """
+    Ensure every service of a client uses the same session.
+    """
+    dfp.client.get_service('LineItemService')
+    dfp.client.get_service('OrderService')
+
+    sessions = [args[1] for args, kwargs in
+      mock_attach_session.call_args_list]
+    self.assertEqual(len(sessions), 2)
+    self.assertIs(sessions[0], sessions[1])
+    self.assertIs(sessions[0], dfp.client.get_session())
+
+  @patch.multiple('settings', DFP_GZIP_RESPONSES=True, create=True)
+  def test_response_compression(self, mock_load_from_storage):
+    """
+    Ensure clients ask DFP for gzipped responses when enabled.
+    """
+    client = mock_load_from_storage.return_value
+    client._header_handler.enable_compression = False
+    client.application_name = 'dfp-prebid-setup'
+
+    dfp.client.get_client()
+    dfp.client.reload_client()
+
+    self.assertTrue(client._header_handler.enable_compression)
+    self.assertEqual(client.application_name, 'dfp-prebid-setup (gzip)')
+
+
+class DFPSessionTests(TestCase):
+
+  def make_response(self, content, wire_bytes):
+    response = MagicMock(content=content)
+    response.raw.tell.return_value = wire_bytes
+    return response
+
+  @patch('requests.Session.request')
+  def test_compress_request(self, mock_request):
+    """
+    Ensure request bodies are gzipped and the bytes saved are counted.
+    """
+    body = u'<soap:Envelope>{0}</soap:Envelope>'.format('<name>a</name>' * 100)
+    mock_request.return_value = self.make_response(b'<ok/>' * 100, 60)
+    session = dfp.transport.DFPSession(compress_requests=True)
+
+    session.post('https://ads.google.com/', data=body,
+      headers={'SOAPAction': '""'})
+
+    args, kwargs = mock_request.call_args
+    self.assertEqual(kwargs['headers']['Content-Encoding'], 'gzip')
+    self.assertEqual(kwargs['headers']['SOAPAction'], '""')
+    self.assertEqual(gzip.decompress(kwargs['data']), body.encode('utf-8'))
+
+    stats = session.stats
+    self.assertEqual(stats.requests, 1)
+    self.assertEqual(stats.request_body_bytes, len(body))
+    self.assertEqual(stats.request_wire_bytes, len(kwargs['data']))
+    self.assertLess(stats.request_wire_bytes, stats.request_body_bytes)
+    self.assertEqual(stats.response_body_bytes, 500)
+    self.assertEqual(stats.response_wire_bytes, 60)
+
+  @patch('requests.Session.request')
+  def test_uncompressed_request(self, mock_request):
+    """
+    Ensure request bodies are sent as is when compression is off.
+    """
+    mock_request.return_value = self.make_response(b'<ok/>', 5)
+    session = dfp.transport.DFPSession()
+
+    session.post('https://ads.google.com/', data=b'<soap:Envelope/>')
+
+    args, kwargs = mock_request.call_args
+    self.assertEqual(kwargs['data'], b'<soap:Envelope/>')
+    self.assertIsNone(kwargs.get('headers'))
+    self.assertEqual(session.stats.request_wire_bytes, 16)
+
+  @patch.multiple('settings', DFP_GZIP_REQUESTS=True, create=True)
+  def test_create_session_compression(self):
+    """
+    Ensure the setting turns on request compression.
+    """
+    session = dfp.transport.create_session()
+    self.assertTrue(session.compress_requests)
+
+  def test_stats_summary(self):
+    """
+    Ensure the summary adds up the stats of several sessions.
+    """
+    stats = dfp.transport.TransferStats()
+    stats.record(1000, 200, 3000, 600)
+    total = dfp.transport.TransferStats()
+    total.add(stats)
+    total.add(stats)
+    self.assertEqual(total.requests, 2)
+    self.assertEqual(total.summary(), u'2 DFP requests: sent 400 of 2000 '
+      'bytes, received 1200 of 6000 bytes (80% saved by compression).')
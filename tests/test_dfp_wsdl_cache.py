@@ -0,0 +1,110 @@
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+import dfp.client
+import dfp.wsdl_cache
+from dfp.wsdl_cache import WsdlCache
+
+
+LINE_ITEM_WSDL_URL = (
+  'https://ads.google.com/apis/ads/publisher/v202508/LineItemService?wsdl')
+ORDER_WSDL_URL = (
+  'https://ads.google.com/apis/ads/publisher/v202505/OrderService?wsdl')
+XSD_URL = 'https://schemas.xmlsoap.org/soap/encoding/'
+
+
+class WsdlCacheTests(TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.cache = WsdlCache(self.directory)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory, ignore_errors=True)
+
+  def test_add_and_get(self):
+    """
+    Ensure documents are stored per API version and returned as bytes.
+    """
+    self.cache.add(LINE_ITEM_WSDL_URL, '<definitions/>')
+    self.cache.add(ORDER_WSDL_URL, b'<definitions name="order"/>')
+
+    self.assertEqual(self.cache.get(LINE_ITEM_WSDL_URL), b'<definitions/>')
+    self.assertEqual(self.cache.get(ORDER_WSDL_URL),
+      b'<definitions name="order"/>')
+    self.assertIsNone(self.cache.get(
+      'https://ads.google.com/apis/ads/publisher/v202508/UserService?wsdl'))
+
+    self.assertEqual(sorted(os.listdir(self.directory)),
+      ['v202505', 'v202508'])
+    self.assertTrue(os.listdir(os.path.join(self.directory, 'v202508'))[0]
+      .startswith('LineItemService-'))
+
+  def test_clear_version(self):
+    """
+    Ensure clearing a version keeps documents of other versions, but not
+    documents outside any service.
+    """
+    self.cache.add(LINE_ITEM_WSDL_URL, '<definitions/>')
+    self.cache.add(ORDER_WSDL_URL, '<definitions/>')
+    self.cache.add(XSD_URL, '<schema/>')
+
+    self.cache.clear('v202508')
+    self.assertIsNone(self.cache.get(LINE_ITEM_WSDL_URL))
+    self.assertIsNone(self.cache.get(XSD_URL))
+    self.assertIsNotNone(self.cache.get(ORDER_WSDL_URL))
+
+    self.cache.clear()
+    self.assertFalse(os.path.exists(self.directory))
+
+  @patch('zeep.Client')
+  def test_warm(self, mock_zeep_client):
+    """
+    Ensure warming loads each service's WSDL through the cache.
+    """
+    self.cache.warm(['LineItemService', 'OrderService'], 'v202505')
+
+    self.assertEqual(mock_zeep_client.call_count, 2)
+    args, kwargs = mock_zeep_client.call_args_list[0]
+    self.assertEqual(args[0],
+      'https://ads.google.com/apis/ads/publisher/v202505/LineItemService?wsdl')
+    self.assertIs(kwargs['transport'].cache, self.cache)
+
+  def test_main_clear(self):
+    """
+    Ensure the command line clears the configured cache.
+    """
+    self.cache.add(LINE_ITEM_WSDL_URL, '<definitions/>')
+    with patch('settings.DFP_WSDL_CACHE_DIR', self.directory, create=True):
+      dfp.wsdl_cache.main(['clear'])
+    self.assertIsNone(self.cache.get(LINE_ITEM_WSDL_URL))
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+class ClientWsdlCacheTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_clients()
+
+  @patch('settings.DFP_WSDL_CACHE_DIR', '/tmp/wsdl', create=True)
+  def test_client_uses_wsdl_cache(self, mock_load_from_storage):
+    """
+    Ensure loaded clients create their services with the WSDL cache.
+    """
+    client = dfp.client.get_client()
+    self.assertIsInstance(client.cache, WsdlCache)
+    self.assertEqual(client.cache.directory, '/tmp/wsdl')
+
+  @patch('settings.DFP_WSDL_CACHE_DIR', None, create=True)
+  def test_client_without_wsdl_cache(self, mock_load_from_storage):
+    """
+    Ensure the googleads default cache is kept when ours is disabled.
+    """
+    mock_load_from_storage.return_value = MagicMock(cache=None)
+    client = dfp.client.get_client()
+    self.assertIsNone(client.cache)
@@ -4,7 +4,7 @@ import logging
 
 from googleads import ad_manager
 
-from dfp.client import get_client
+from dfp.client import get_service
 # from tests_integration.helpers.get_order_by_name import get_order_by_name
 
 def archive_order_by_name(order_name):
@@ -16,8 +16,7 @@ def archive_order_by_name(order_name):
   Returns:
     None
   """
-  client = get_client()
-  order_service = client.GetService('OrderService', version='v202208')
+  order_service = get_service('OrderService')
 
   statement = (ad_manager.StatementBuilder()
     .Where('name = :name')
@@ -4,7 +4,7 @@ import logging
 
 from googleads import ad_manager
 
-from dfp.client import get_client
+from dfp.client import get_service
 
 def get_advertiser_by_name(advertiser_name):
   """
@@ -16,9 +16,7 @@ def get_advertiser_by_name(advertiser_name):
     an integer: the advertiser's DFP ID
   """
 
-  client = get_client()
-  company_service = client.GetService('CompanyService',
-    version='v202208')
+  company_service = get_service('CompanyService')
 
   statement = (ad_manager.StatementBuilder()
     .Where('name = :name')
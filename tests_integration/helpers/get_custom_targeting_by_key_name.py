@@ -4,7 +4,8 @@ import logging
 
 from googleads import ad_manager
 
-from dfp.client import get_client
+from dfp.client import get_service
+from dfp.paginator import fetch_all
 
 def get_key_by_name(key_name):
   """
@@ -16,9 +17,7 @@ def get_key_by_name(key_name):
     the key object
   """
 
-  client = get_client()
-  custom_targeting_service = client.GetService('CustomTargetingService',
-    version='v202208')
+  custom_targeting_service = get_service('CustomTargetingService')
 
   statement = (ad_manager.StatementBuilder()
     .Where('name = :name')
@@ -44,23 +43,9 @@ def get_custom_targeting_by_key_name(key_name):
 
   key_id = get_key_by_name(key_name)['id']
 
-  client = get_client()
-  custom_targeting_service = client.GetService('CustomTargetingService',
-    version='v202208')
+  custom_targeting_service = get_service('CustomTargetingService')
 
-  statement = (ad_manager.StatementBuilder()
-    .Where('customTargetingKeyId = :customTargetingKeyId')
-    .WithBindVariable('customTargetingKeyId', key_id))
-  response = custom_targeting_service.getCustomTargetingValuesByStatement(
-    statement.ToStatement())
-
-  vals = []
-  while True:
-    response = custom_targeting_service.getCustomTargetingValuesByStatement(
-        statement.ToStatement())
-    if 'results' in response and len(response['results']) > 0:
-      vals = vals + response['results']
-      statement.offset += statement.limit
-    else:
-      break
-  return vals
+  return list(fetch_all(
+    custom_targeting_service.getCustomTargetingValuesByStatement,
+    'customTargetingKeyId = :customTargetingKeyId',
+    {'customTargetingKeyId': key_id}))
@@ -2,9 +2,8 @@
 
 import logging
 
-from googleads import ad_manager
-
-from dfp.client import get_client
+from dfp.client import get_service
+from dfp.paginator import fetch_all
 
 def get_line_items_for_order(order_id):
   """
@@ -16,21 +15,9 @@ def get_line_items_for_order(order_id):
     an array of line items
   """
   print('Getting line items for order ID {0}...'.format(order_id))
-  client = get_client()
-  line_item_service = client.GetService('LineItemService', version='v202208')
-  statement = (ad_manager.StatementBuilder()
-    .Where('OrderId = :order_id')
-    .WithBindVariable('order_id', order_id))
-
-  line_items = []
-  while True:
-    response = line_item_service.getLineItemsByStatement(
-      statement.ToStatement())
-    if 'results' in response and len(response['results']) > 0:
-      line_items = line_items + response['results']
-      statement.offset += statement.limit
-    else:
-      break
+  line_item_service = get_service('LineItemService')
+  line_items = list(fetch_all(line_item_service.getLineItemsByStatement,
+    'OrderId = :order_id', {'order_id': order_id}))
 
   print('Finished fetching line items.')
 
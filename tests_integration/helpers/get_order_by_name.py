@@ -4,7 +4,7 @@ import logging
 
 from googleads import ad_manager
 
-from dfp.client import get_client
+from dfp.client import get_service
 
 
 def get_order_by_name(order_name):
@@ -19,8 +19,7 @@ def get_order_by_name(order_name):
 
   print('Getting order with order name {0}...'.format(order_name))
 
-  client = get_client()
-  order_service = client.GetService('OrderService', version='v202208')
+  order_service = get_service('OrderService')
 
   statement = (ad_manager.StatementBuilder()
     .Where('name = :name')
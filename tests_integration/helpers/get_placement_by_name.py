@@ -4,7 +4,7 @@ import logging
 
 from googleads import ad_manager
 
-from dfp.client import get_client
+from dfp.client import get_service
 
 def get_placement_by_name(placement_name):
   """
@@ -16,9 +16,7 @@ def get_placement_by_name(placement_name):
     a DFP placement object
   """
 
-  client = get_client()
-  placement_service = client.GetService('PlacementService',
-    version='v202208')
+  placement_service = get_service('PlacementService')
 
   statement = (ad_manager.StatementBuilder()
     .Where('name = :name')